@@ -1,2 +1,2 @@
-from .parser import ChecklistParser
+from .parser import ChecklistParser, ChecklistParseError, ParseDiagnostic
 from .checklist_creator import PDFChecklistCreator
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+
+from os import path as osp
+from typing import Dict, List, Optional, Union
+
+from pilot_utils.checklist_creator.checklist import Checklist, ChecklistConfiguration, LayoutPlan, SectionItem, CenteredText
+
+CACHE_NAME = '.checklist_cache.json'
+# Bumped whenever the rendering changes, invalidating all cached outputs
+CACHE_VERSION = 1
+
+
+def get_source_hash(fpath: str) -> str:
+    """Returns the sha256 hex digest of the checklist text file."""
+    with open(fpath, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_options_hash(print_mode: bool,
+                     config_overrides: Optional[Dict] = None) -> str:
+    """
+        Returns a hash of everything besides the source text that determines the
+        output. The effective configuration of a checklist only depends on its
+        source, the configuration defaults and the overrides given on the
+        command line, so hashing the defaults and overrides suffices.
+    """
+    options = {'version': CACHE_VERSION,
+               'print_mode': print_mode,
+               'defaults': vars(ChecklistConfiguration()),
+               'overrides': config_overrides or {}}
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _serialize_item(item: Union[SectionItem, CenteredText]) -> List:
+    if item.is_centered:
+        return ['centered', item.text, item.is_bold]
+    return ['item', item.text_left, item.text_right, item.is_left_bold, item.is_right_bold,
+            item.number_in_sequence, item.ignore_in_sequence, [_serialize_item(subitem) for subitem in item.subitems]]
+
+
+def get_page_keys(checklist: Checklist,
+                  plan: LayoutPlan,
+                  print_mode: bool) -> List[str]:
+    """
+        Returns one key per page of the layout plan, which changes whenever the
+        rendered page would change: the sections placed on the page and their
+        positions, the page number and the checklist wide settings (effective
+        configuration, header and footer texts, print mode).
+
+        Params
+        ------
+            checklist (Checklist):
+                The checklist the plan was created for
+            plan (LayoutPlan):
+                The layout plan
+            print_mode (bool):
+                Whether the checklist is rendered in print mode
+
+        Returns
+        -------
+            List[str]:
+                Hex digest of every page
+    """
+    settings = json.dumps({'version': CACHE_VERSION,
+                           'print_mode': print_mode,
+                           'config': vars(checklist.checklist_config),
+                           'header_footer': [checklist.aircraft_type, checklist.checklist_type,
+                                             checklist.checklist_version, checklist.real_world_clearance],
+                           'background_coloring': checklist.background_coloring},
+                          sort_keys=True, default=str)
+    keys = []
+    for page_idx, page in enumerate(plan.pages):
+        content = [[placed.y_position, placed.section.name, [_serialize_item(item) for item in placed.section.items]]
+                   for placed in page]
+        sha = hashlib.sha256(settings.encode())
+        sha.update(json.dumps([page_idx + 1, content]).encode())
+        keys.append(sha.hexdigest())
+    return keys
+
+
+def fingerprint_output(fpath: str) -> Optional[Dict]:
+    """Returns size and modification time of an output or None if it does not exist."""
+    if not osp.isfile(fpath):
+        return None
+    stat = os.stat(fpath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class ChecklistBuildCache:
+    def __init__(self,
+                 output_dir: str
+                 ):
+        """
+            Cache of previous builds whose outputs are located in output_dir.
+            Entries are keyed by output file name and contain the hashes of the
+            source and the options, the fingerprint of the output and the keys
+            of its pages (see get_page_keys).
+
+            Params
+            ------
+                output_dir (str):
+                    Output directory in which the cache file is stored
+        """
+        self.fpath = osp.join(output_dir, CACHE_NAME)
+        self.entries = {}
+        if osp.isfile(self.fpath):
+            try:
+                with open(self.fpath, 'r') as file:
+                    content = json.load(file)
+            except (OSError, ValueError):
+                print(f"Ignoring unreadable checklist cache {self.fpath}")
+                content = {}
+            if content.get('version') == CACHE_VERSION:
+                self.entries = content.get('outputs', {})
+
+
+    def get_entry(self,
+                  output_name: str
+                  ) -> Optional[Dict]:
+        return self.entries.get(output_name)
+
+
+    def set_entry(self,
+                  output_name: str,
+                  entry: Dict
+                  ):
+        self.entries[output_name] = entry
+
+
+    def save(self):
+        """Writes the cache, replacing the previous file atomically."""
+        os.makedirs(osp.dirname(self.fpath) or '.', exist_ok=True)
+        tmp_path = self.fpath + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': CACHE_VERSION, 'outputs': self.entries}, file, indent=1)
+        os.replace(tmp_path, self.fpath)
+
+
+def get_valid_pages(entry: Optional[Dict],
+                    output_path: str) -> Optional[List[str]]:
+    """
+        Returns the page keys of the previous build if its output still exists
+        unmodified, such that its pages can be reused, otherwise None.
+    """
+    if entry is None or fingerprint_output(output_path) != entry.get('output'):
+        return None
+    return entry.get('pages')
+
+
+def is_up_to_date(entry: Optional[Dict],
+                  source_hash: str,
+                  options_hash: str,
+                  output_path: str) -> bool:
+    """Returns whether the output was built from the same source and options and was not modified since."""
+    if get_valid_pages(entry, output_path) is None:
+        return False
+    return entry.get('source') == source_hash and entry.get('options') == options_hash
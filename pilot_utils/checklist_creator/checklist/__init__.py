@@ -3,4 +3,6 @@ from .item import SectionItem
 from .section import ChecklistSection
 from .configuration import ChecklistConfiguration
 from .checklist import Checklist
+from .layout import LayoutEngine, LayoutPlan, PlacedSection, SectionLayout, get_vertical_limits
+from .text_widths import TextWidthService
 from .pdf_manager import PDFManager
@@ -1,4 +1,9 @@
 class CenteredText:
+    __slots__ = ('text', 'is_bold')
+    # lets traversals tell items apart without isinstance checks
+    is_centered = True
+    subitems = ()
+
     def __init__(self,
                  text: str,
                  is_bold: bool
@@ -1,6 +1,10 @@
-from pilot_utils.checklist_creator.checklist import ChecklistSection, ChecklistConfiguration
+from typing import Iterator, Tuple, Union
+from pilot_utils.checklist_creator.checklist import CenteredText, ChecklistSection, ChecklistConfiguration, SectionItem
 
 class Checklist:
+    __slots__ = ('aircraft_type', 'checklist_type', 'checklist_version', 'real_world_clearance',
+                 'background_coloring', 'sections', 'sections_sequence_head', 'checklist_config')
+
     def __init__(self,
                  aircraft_type: str = None,
                  checklist_type: str = None,
@@ -60,3 +64,23 @@ class Checklist:
         for idx in range(index + 1, len(self.sections)):
             self.sections[idx].number_in_sequence = idx + 1
         self.sections_sequence_head = len(self.sections)
+
+
+    def __iter__(self) -> Iterator[ChecklistSection]:
+        """Iterates over the sections of this checklist."""
+        return iter(self.sections)
+
+
+    def iter_items(self) -> Iterator[Tuple[ChecklistSection, Union[CenteredText, SectionItem], int]]:
+        """
+            Iterates depth-first over all items of all sections, see
+            ChecklistSection.iter_items
+
+            Returns
+            -------
+                Iterator[Tuple[ChecklistSection, SectionItem or CenteredText, int]]:
+                    The section, the item and its depth
+        """
+        for section in self.sections:
+            for item, depth in section.iter_items():
+                yield section, item, depth
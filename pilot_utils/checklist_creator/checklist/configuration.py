@@ -38,6 +38,13 @@ class ChecklistConfiguration:
         self.rect_background_color = 211.0
         # For digital use, do not change page layout
         self.adaptive_layout = False
+        # Page breaking, greedy by default. The optimal page breaks minimize the
+        # sum of the penalties of all pages, continued sections and widowed items,
+        # i.e. sections that are split such that a single item is left on one page
+        self.optimal_page_breaks = False
+        self.penalty_new_page = 1000
+        self.penalty_continued_section = 100
+        self.penalty_widowed_item = 50
         # Setting specific to print mode
         self.rect_background_color_printing = 180.0
 
@@ -71,6 +78,8 @@ class ChecklistConfiguration:
                         self.real_world_clearance = False
                     else:
                         self.real_world_clearance = True
+                elif isinstance(getattr(self, key), bool):
+                    setattr(self, key, value.lower() == "true")
                 else:
                     try:
                         value = int(value)
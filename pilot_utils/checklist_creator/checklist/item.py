@@ -1,7 +1,11 @@
-from typing import Union
+from typing import Iterator, Union
 from pilot_utils.checklist_creator.checklist import CenteredText
 
 class SectionItem:
+    __slots__ = ('text_left', 'is_left_bold', 'text_right', 'is_right_bold', 'number_in_sequence',
+                 'ignore_in_sequence', 'subitems', 'subitems_sequence_head')
+    is_centered = False
+
     def __init__(self,
                  text_left: str = None,
                  text_right: str = None,
@@ -50,10 +54,15 @@ class SectionItem:
             subitem (SectionItem or CenteredText):
                 The subitem that should be appended to this item
         """
-        if isinstance(subitem, CenteredText):
+        if subitem.is_centered:
             self.subitems.append(subitem)
             return
         if not subitem.ignore_in_sequence:
             subitem.number_in_sequence = self.subitems_sequence_head
             self.subitems_sequence_head += 1
         self.subitems.append(subitem)
+
+
+    def __iter__(self) -> Iterator[Union['SectionItem', CenteredText]]:
+        """Iterates over the subitems of this item."""
+        return iter(self.subitems)
@@ -0,0 +1,412 @@
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import List, Tuple, Union
+from pilot_utils.checklist_creator.checklist import CenteredText, Checklist, ChecklistSection, ChecklistConfiguration, SectionItem
+
+CONTINUED_SUFFIX = ' - CONTINUED'
+
+
+def get_vertical_limits(config: ChecklistConfiguration) -> Tuple[float, float]:
+    """
+        Returns the y coordinates between which sections can be placed on a page
+
+        Params
+        ------
+            config (ChecklistConfiguration):
+                Checklist configuration
+
+        Returns
+        -------
+            Tuple[float, float]:
+                y coordinate at which the first section of a page starts and
+                y coordinate which must not be reached by the last item of a page
+    """
+    page_height = config.page_size[1]
+    y_limit_top = page_height - config.border_top - config.space_after_header
+    y_limit_bottom = config.border_bottom + config.font_size_header_footer + config.space_before_footer
+    return y_limit_top, y_limit_bottom
+
+
+def get_item_height(item: Union[SectionItem, CenteredText],
+                    config: ChecklistConfiguration
+                    ) -> float:
+    """Returns the vertical space taken by an item including its subitems."""
+    return (1 + len(item.subitems)) * config.space_between_items
+
+
+class SectionLayout:
+    def __init__(self,
+                 section: ChecklistSection,
+                 prefix_heights: array,
+                 start: int,
+                 base_height: float
+                 ):
+        """
+            Precomputed heights of a section, such that fit checks are O(1) and
+            split points are found in O(log n) without walking the items again.
+
+            Params
+            ------
+                section (ChecklistSection):
+                    The measured section
+                prefix_heights (array):
+                    Cumulative heights of the items, the entry at index i is the
+                    height of the items 0 to i. Shared with sections that continue
+                    this section after a split
+                start (int):
+                    Index in prefix_heights of the first item of section
+                base_height (float):
+                    Height of the section without its items
+        """
+        self.section = section
+        self.prefix_heights = prefix_heights
+        self.start = start
+        self.base_height = base_height
+
+
+    def _get_items_height(self,
+                          n_items: int
+                          ) -> float:
+        """Returns the height of the first n_items items of the section."""
+        if n_items == 0:
+            return 0
+        offset = self.prefix_heights[self.start - 1] if self.start > 0 else 0
+        return self.prefix_heights[self.start + n_items - 1] - offset
+
+
+    def get_height(self) -> float:
+        """Returns the vertical space from the section name to the bottom of the last item."""
+        return self.base_height + self._get_items_height(len(self.section.items))
+
+
+    def fits(self,
+             y_start: float,
+             y_end: float
+             ) -> bool:
+        """
+            Determines whether the section fits between the given y coordinates
+
+            Params
+            ------
+                y_start (float):
+                    Height at which the section name is written
+                y_end (float):
+                    Height which should not be reached by items
+        """
+        return y_start - self.get_height() > y_end
+
+
+    def get_split_index(self,
+                        y_start: float,
+                        y_end: float
+                        ) -> int:
+        """
+            Returns the index at which the section has to be split in order for
+            it to fit between y_start and y_end. If all items fit, the number of
+            items is returned.
+
+            Params
+            ------
+                y_start (float):
+                    Height at which the section name is written
+                y_end (float):
+                    Height which should not be overflown by items
+
+            Returns
+            -------
+                int: Index of the first item that does not fit
+        """
+        offset = self.prefix_heights[self.start - 1] if self.start > 0 else 0
+        # first item whose bottom lies below y_end
+        return bisect_right(self.prefix_heights, y_start - y_end - self.base_height + offset,
+                            self.start, self.start + len(self.section.items)) - self.start
+
+
+    def split(self,
+              split_index: int
+              ) -> 'SectionLayout':
+        """
+            Moves the items starting at split_index into a new " - CONTINUED"
+            section and returns its layout, which shares the precomputed heights.
+        """
+        section = self.section
+        items_new_section = section.items[split_index:]
+        section.items = section.items[:split_index]
+        section.items_sequence_head = len(section.items) + 1
+        if section.name.endswith(CONTINUED_SUFFIX):
+            new_name = section.name
+        else:
+            new_name = section.name + CONTINUED_SUFFIX
+        new_section = ChecklistSection(new_name, None, len(section.items) + section.item_numbering_offset)
+        for item in items_new_section:
+            new_section.append_item(item)
+        return SectionLayout(new_section, self.prefix_heights, self.start + split_index, self.base_height)
+
+
+class PlacedSection:
+    def __init__(self,
+                 section: ChecklistSection,
+                 y_position: float
+                 ):
+        """
+            A section together with the height at which its name is written
+        """
+        self.section = section
+        self.y_position = y_position
+
+
+class LayoutPlan:
+    def __init__(self):
+        """
+            Result of the layout pass: the sections of every page, in order.
+            Contains everything needed to draw the checklist.
+        """
+        self.pages: List[List[PlacedSection]] = [[]]
+
+
+    def get_page_count(self) -> int:
+        return len(self.pages)
+
+
+class LayoutEngine:
+    def __init__(self,
+                 config: ChecklistConfiguration
+                 ):
+        """
+            Distributes the sections of a checklist onto pages before anything
+            is drawn. Heights are computed once per section.
+
+            Params
+            ------
+                config (ChecklistConfiguration):
+                    Configuration of the checklist
+        """
+        self.config = config
+        self.y_limit_top, self.y_limit_bottom = get_vertical_limits(config)
+
+
+    def measure_section(self,
+                        section: ChecklistSection
+                        ) -> SectionLayout:
+        """Computes the cumulative item heights of the given section."""
+        if section.description is not None:
+            raise NotImplementedError("Section descriptions are currently not supported!")
+        prefix_heights = array('d')
+        height = 0
+        for item in section.items:
+            height += get_item_height(item, self.config)
+            prefix_heights.append(height)
+        # The last element does not need spacing between items
+        base_height = self.config.space_section_to_item - self.config.space_between_items
+        return SectionLayout(section, prefix_heights, 0, base_height)
+
+
+    def plan(self,
+             checklist: Checklist
+             ) -> LayoutPlan:
+        """
+            Places the sections of the checklist onto pages, either greedily or,
+            if optimal_page_breaks is set in the configuration, with the
+            fewest pages and penalties (see _plan_optimal).
+
+            Params
+            ------
+                checklist (Checklist):
+                    The checklist, which is modified if sections have to be split
+
+            Returns
+            -------
+                LayoutPlan:
+                    The sections of every page
+        """
+        if self.config.optimal_page_breaks:
+            return self._plan_optimal(checklist)
+        return self._plan_greedy(checklist)
+
+
+    def _plan_greedy(self,
+                     checklist: Checklist
+                     ) -> LayoutPlan:
+        """
+            A section that does not fit onto the current page is moved to a new
+            page; if it does not fit onto an empty page either, it is split and
+            the remainder is added to the checklist as " - CONTINUED" section.
+        """
+        plan = LayoutPlan()
+        y_position = self.y_limit_top
+        section_id = 0
+        layout = None
+        while section_id < len(checklist.sections):
+            section = checklist.sections[section_id]
+            # continued sections reuse the heights measured for the split section
+            if layout is None or layout.section is not section:
+                layout = self.measure_section(section)
+            next_layout = None
+            if not layout.fits(y_position, self.y_limit_bottom):
+                plan.pages.append([])
+                y_position = self.y_limit_top
+            if not layout.fits(y_position, self.y_limit_bottom):
+                split_index = layout.get_split_index(y_position, self.y_limit_bottom)
+                if split_index < len(section.items):
+                    next_layout = layout.split(split_index)
+                    checklist.add_section_at_index(section.number_in_sequence, next_layout.section)
+            plan.pages[-1].append(PlacedSection(section, y_position))
+            y_position -= layout.get_height() + self.config.space_between_sections
+            layout = next_layout
+            section_id += 1
+        return plan
+
+
+    def _find_optimal_breaks(self,
+                             layouts: List[SectionLayout]
+                             ) -> List[Tuple[int, int]]:
+        """
+            Finds the page breaks with the lowest total cost, in the manner of
+            the Knuth-Plass line breaking algorithm. Every item is a possible
+            break: before the first item of a section it costs nothing, inside a
+            section it creates a continued section. Each page costs
+            penalty_new_page, and every piece of a split section that consists
+            of a single item, including middle pieces of sections spread over
+            three or more pages, costs penalty_widowed_item.
+
+            As item heights are positive, the possible starts of a page ending
+            before a given item form a window that only moves forward, so the
+            cheapest start is kept in a monotonic queue, which makes this linear
+            in the number of items.
+
+            Params
+            ------
+                layouts (List[SectionLayout]):
+                    Layouts of all sections of the checklist
+
+            Returns
+            -------
+                List[Tuple[int, int]]:
+                    (section index, item index) of the first item of every page
+                    but the first
+        """
+        # Every item is a unit, sections without items are a unit of height 0
+        unit_sections = []
+        unit_items = []
+        prefix_heights = [0.0]
+        for section_idx, layout in enumerate(layouts):
+            offset = prefix_heights[-1]
+            n_items = len(layout.section.items)
+            for item_idx in range(max(n_items, 1)):
+                unit_sections.append(section_idx)
+                unit_items.append(item_idx)
+                prefix_heights.append(offset + layout._get_items_height(min(item_idx + 1, n_items)))
+        n_units = len(unit_sections)
+        available_height = self.y_limit_top - self.y_limit_bottom
+        base_height = self.config.space_section_to_item - self.config.space_between_items
+        space_between_sections = self.config.space_between_sections
+
+        def fits(start: int,
+                 end: int) -> bool:
+            n_pieces = unit_sections[end - 1] - unit_sections[start] + 1
+            height = (prefix_heights[end] - prefix_heights[start] + n_pieces * base_height
+                      + (n_pieces - 1) * space_between_sections)
+            return height < available_height
+
+        penalty_continued = self.config.penalty_continued_section
+        penalty_widowed = self.config.penalty_widowed_item
+
+        def is_inside_section(unit: int) -> bool:
+            """Whether a page break before unit splits a section."""
+            return 0 < unit < n_units and unit_items[unit] > 0
+
+        def get_start_penalty(start: int) -> float:
+            """Penalty of the start of a page of at least two items."""
+            if not is_inside_section(start):
+                return 0
+            n_items = len(layouts[unit_sections[start]].section.items)
+            # the continued section only has its last item on this page
+            return penalty_continued + (penalty_widowed if n_items - unit_items[start] == 1 else 0)
+
+        def get_end_penalty(end: int) -> float:
+            """Penalty of the end of a page of at least two items."""
+            # the split section only has its first item on this page
+            return penalty_widowed if is_inside_section(end) and unit_items[end] == 1 else 0
+
+        costs = [0.0] * (n_units + 1)
+        previous = [0] * (n_units + 1)
+        # candidate page starts, with increasing cost from front to back
+        candidates = deque()
+        window_start = 0
+        for end in range(1, n_units + 1):
+            # an item that is too high for an empty page gets a page of its own
+            while window_start < end - 1 and not fits(window_start, end):
+                window_start += 1
+            # The penalties of a page of at least two items only depend on either its
+            # start or its end, so the cheapest start can be kept in the queue. A page
+            # of a single item is evaluated separately, its item may be widowed from
+            # both sides while it is only penalized once.
+            if end >= 2:
+                start = end - 2
+                cost = costs[start] + get_start_penalty(start)
+                # on ties, the later start wins, such that earlier pages are filled first
+                while candidates and candidates[-1][1] >= cost:
+                    candidates.pop()
+                candidates.append((start, cost))
+            while candidates and candidates[0][0] < window_start:
+                candidates.popleft()
+            best_start = end - 1
+            best_cost = costs[best_start]
+            if is_inside_section(best_start):
+                best_cost += penalty_continued
+            if is_inside_section(best_start) or is_inside_section(end):
+                best_cost += penalty_widowed
+            if candidates and candidates[0][1] + get_end_penalty(end) < best_cost:
+                best_start, best_cost = candidates[0][0], candidates[0][1] + get_end_penalty(end)
+            costs[end] = best_cost + self.config.penalty_new_page
+            previous[end] = best_start
+
+        breaks = []
+        end = n_units
+        while end > 0:
+            end = previous[end]
+            if end > 0:
+                breaks.append((unit_sections[end], unit_items[end]))
+        return breaks[::-1]
+
+
+    def _plan_optimal(self,
+                      checklist: Checklist
+                      ) -> LayoutPlan:
+        """
+            Places the sections at the page breaks found by _find_optimal_breaks,
+            splitting sections into " - CONTINUED" sections where a break falls
+            inside of them.
+        """
+        layouts = [self.measure_section(section) for section in checklist.sections]
+        breaks = set(self._find_optimal_breaks(layouts))
+        plan = LayoutPlan()
+        # continued sections are collected and numbered at the end instead of
+        # being inserted one by one, which would renumber all following sections
+        sections = []
+        y_position = self.y_limit_top
+        for section_idx, layout in enumerate(layouts):
+            n_items = len(layout.section.items)
+            if (section_idx, 0) in breaks:
+                plan.pages.append([])
+                y_position = self.y_limit_top
+            n_placed = 0
+            for item_idx in range(1, n_items):
+                if (section_idx, item_idx) not in breaks:
+                    continue
+                section = layout.section
+                layout = layout.split(item_idx - n_placed)
+                n_placed = item_idx
+                sections.append(section)
+                plan.pages[-1].append(PlacedSection(section, y_position))
+                plan.pages.append([])
+                y_position = self.y_limit_top
+            sections.append(layout.section)
+            plan.pages[-1].append(PlacedSection(layout.section, y_position))
+            y_position -= layout.get_height() + self.config.space_between_sections
+        for section_idx, section in enumerate(sections):
+            section.number_in_sequence = section_idx + 1
+        checklist.sections = sections
+        checklist.sections_sequence_head = len(sections) + 1
+        return plan
@@ -1,10 +1,10 @@
 from reportlab.lib.pagesizes import A5
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from pilot_utils.checklist_creator.checklist import ChecklistSection, ChecklistConfiguration, SectionItem, CenteredText
+from pilot_utils.checklist_creator.checklist import ChecklistSection, ChecklistConfiguration, SectionItem, CenteredText, TextWidthService, get_vertical_limits
 import os
 from os import path as osp
-from typing import Union
+from typing import Optional, Union
 
 class PDFManager:
     def __init__(self,
@@ -17,7 +17,10 @@ class PDFManager:
                  real_world_clearance: bool,
                  print_mode: bool,
                  show_page_numbers: bool = True,
-                 perform_background_coloring: bool = False
+                 perform_background_coloring: bool = False,
+                 text_widths: Optional[TextWidthService] = None,
+                 first_page_number: int = 1,
+                 use_header_footer_forms: bool = False
                  ):
         """
             Class that manages the pdf document.
@@ -45,13 +48,23 @@ class PDFManager:
                 perform_background_coloring (bool):
                     Whether consecutive items should have different background colors.
                     Defaults to False
+                text_widths (TextWidthService):
+                    Service used to measure texts, can be shared between checklists.
+                    Defaults to None, which creates a new one
+                first_page_number (int):
+                    Number of the first page, e.g. if only some pages of a checklist
+                    are rendered. Defaults to 1
+                use_header_footer_forms (bool):
+                    Whether the static parts of header and footer should be drawn
+                    once into form XObjects that are referenced by every page. The
+                    forms add a constant overhead to the file, such that they only
+                    make it smaller for longer checklists. Defaults to False
         """
         self.page_width, self.page_height = config.page_size
         self.current_page = 0
         self.y_header = self.page_height - config.border_top
         self.y_footer = config.border_bottom
-        self.y_limit_bottom = config.border_bottom + config.font_size_header_footer + config.space_before_footer
-        self.y_limit_top = self.page_height - config.border_top - config.space_after_header
+        self.y_limit_top, self.y_limit_bottom = get_vertical_limits(config)
         self.x_limit_left = config.border_left
         self.x_limit_right = self.page_width - config.border_right
         self.usable_width = self.page_width - config.border_left - config.border_right
@@ -67,25 +80,20 @@ class PDFManager:
         bg_color = config.rect_background_color_printing if self.print_mode else config.rect_background_color
         self.background_color = colors.Color(red=(bg_color/255), green=(bg_color/255), blue=(bg_color/255))
         self.config = config
-
-        if not osp.isdir(output_dir):
-            os.makedirs(output_dir)
+        self.text_widths = text_widths if text_widths is not None else TextWidthService()
+        self.dot_width = self.text_widths.get_width('.', config.font_name_item, config.font_size_item)
+        self.use_header_footer_forms = use_header_footer_forms
+        # names of the form XObjects with the static parts of header and footer, see _get_header_footer_form
+        self.header_footer_forms = {}
+
+        # several worker processes may create the same output directory at once
+        os.makedirs(output_dir, exist_ok=True)
         if osp.splitext(output_name)[1] != '.pdf':
             output_name += '.pdf'
 
         self.canvas = canvas.Canvas(osp.join(output_dir, output_name),
                                     pagesize=config.page_size)
-        self.add_page()
-
-
-    def finish_section(self):
-        """
-            Performs clean up after a section has been finished.
-            After last element of section, current_y_position is at position for next item,
-            but we want it to be at position for next section
-        """
-        self.current_y_position += self.config.space_between_items
-        self.current_y_position -= self.config.space_between_sections
+        self.add_page(page_number=first_page_number)
 
 
     def save_pdf(self):
@@ -94,23 +102,30 @@ class PDFManager:
 
 
     def print_section_to_current_page(self,
-                                      section: ChecklistSection
+                                      section: ChecklistSection,
+                                      check_fit: bool = True
                                       ) -> bool:
         """
-            Prints the given section onto the current page.
+            Prints the given section onto the current page, starting at
+            current_y_position. The position of the next section is not
+            updated, sections are positioned by the LayoutPlan.
 
             Params
             ------
                 section (ChecklistSection):
                     The section that should be printed onto the page
+                check_fit (bool):
+                    Whether it should be checked that the section fits onto the page,
+                    can be disabled for sections placed by the LayoutEngine.
+                    Defaults to True
 
             Returns
             -------
                 bool:
-                    Whether operation was successful. If False,
-                    consider adding a new page and trying again.
+                    Whether the section was printed, False if check_fit is
+                    set and it does not fit onto the page.
         """
-        if not self.section_fits_page(section):
+        if check_fit and not self.section_fits_page(section):
             return False
         # Draw section name
         self.canvas.setFont(self.config.font_name_section_name, self.config.font_size_section_name)
@@ -138,12 +153,12 @@ class PDFManager:
                     Offset to the left border at which printing should take place.
         """
         # Handle case of CenteredText
-        if isinstance(item, CenteredText):
+        if item.is_centered:
             self.canvas.setFont(self.config.font_name_bold_item if item.is_bold else self.config.font_name_item,
                                 self.config.font_size_item)
-            text_width = self.canvas.stringWidth(item.text,
-                                                 self.config.font_name_bold_item if item.is_bold else self.config.font_name_item,
-                                                 self.config.font_size_item)
+            text_width = self.text_widths.get_width(item.text,
+                                                    self.config.font_name_bold_item if item.is_bold else self.config.font_name_item,
+                                                    self.config.font_size_item)
             centered_text_start_x = self._get_centered_text_x(text_width)
             self.canvas.drawString(centered_text_start_x, self.current_y_position, item.text)
             # Draw rectangle around text
@@ -170,12 +185,12 @@ class PDFManager:
         self.canvas.drawString(current_x_position, self.current_y_position, enum)
         current_x_position += self.config.space_for_enumerations
         # Calculate sizes of text
-        text_left_width = self.canvas.stringWidth(item.text_left,
-                                                  self.config.font_name_bold_item if item.is_left_bold else self.config.font_name_item,
-                                                  self.config.font_size_item) if item.text_left is not None else 0
-        text_right_width = self.canvas.stringWidth(item.text_right,
-                                                   self.config.font_name_bold_item if item.is_right_bold else self.config.font_name_item,
-                                                   self.config.font_size_item) if item.text_right is not None else 0
+        text_left_width = self.text_widths.get_width(item.text_left,
+                                                     self.config.font_name_bold_item if item.is_left_bold else self.config.font_name_item,
+                                                     self.config.font_size_item) if item.text_left is not None else 0
+        text_right_width = self.text_widths.get_width(item.text_right,
+                                                      self.config.font_name_bold_item if item.is_right_bold else self.config.font_name_item,
+                                                      self.config.font_size_item) if item.text_right is not None else 0
         # Draw left text
         if item.text_left is not None:
             self.canvas.setFont(self.config.font_name_bold_item if item.is_left_bold else self.config.font_name_item,
@@ -190,7 +205,7 @@ class PDFManager:
         # Draw connecting dots
         if item.text_left is not None and item.text_right is not None:
             text_dots_width = self.x_limit_right - text_right_width - current_x_position
-            text_dots = '.' * int(text_dots_width / self.canvas.stringWidth('.', self.config.font_name_item, self.config.font_size_item))
+            text_dots = '.' * int(text_dots_width / self.dot_width)
             # Replace first and last dot with space if we have non-empty text so that we have a small separation
             if item.text_left != "":
                 text_dots = " " + text_dots[1:]
@@ -207,7 +222,8 @@ class PDFManager:
 
     def add_page(self,
                  draw_header: bool = True,
-                 draw_footer: bool = True
+                 draw_footer: bool = True,
+                 page_number: Optional[int] = None
                  ):
         """
             Adds a new page to the pdf
@@ -218,21 +234,67 @@ class PDFManager:
                     Whether a header should be drawn onto the page. Defaults to True
                 draw_footer (bool):
                     Whether a footer should be drawn onto the page. Defaults to True
+                page_number (int):
+                    Number of the new page. Defaults to None, which uses the
+                    number following the current page
         """
         if self.current_page != 0:
             self.canvas.showPage()
-        self.current_page += 1
+        self.current_page = page_number if page_number is not None else self.current_page + 1
         self._adapt_border_spacing()
-        if draw_header:
-            self._draw_header(self.aircraft_type,
-                              self.checklist_type)
-        if draw_footer:
-            self._draw_footer(self.checklist_version,
-                              self.real_world_clearance,
-                              self.show_page_numbers)
+        if self.use_header_footer_forms and (draw_header or draw_footer):
+            self.canvas.doForm(self._get_header_footer_form(draw_header, draw_footer))
+        else:
+            if draw_header:
+                self._draw_header(self.aircraft_type,
+                                  self.checklist_type)
+            if draw_footer:
+                self._draw_footer(self.checklist_version,
+                                  self.real_world_clearance)
+        if draw_footer and self.show_page_numbers:
+            self._draw_page_number()
         self.current_y_position = self.y_limit_top
 
 
+    def _get_header_footer_form(self,
+                                draw_header: bool,
+                                draw_footer: bool
+                                ) -> str:
+        """
+            Returns the name of the form XObject that contains everything of
+            header and footer but the page number for the current page. The
+            forms are drawn once and then referenced by every page, there is one
+            per combination of header, footer and, in print mode, odd and even
+            page borders.
+
+            Params
+            ------
+                draw_header (bool):
+                    Whether the form contains the header
+                draw_footer (bool):
+                    Whether the form contains the footer
+
+            Returns
+            -------
+                str:
+                    Name of the form, to be used with canvas.doForm
+        """
+        key = (draw_header, draw_footer, self.x_limit_left, self.x_limit_right)
+        name = self.header_footer_forms.get(key)
+        if name is None:
+            name = f"HeaderFooter{len(self.header_footer_forms)}"
+            self.canvas.beginForm(name)
+            if draw_header:
+                self._draw_header(self.aircraft_type,
+                                  self.checklist_type)
+            if draw_footer:
+                self._draw_footer(self.checklist_version,
+                                  self.real_world_clearance)
+            self.canvas.endForm()
+            self.header_footer_forms[key] = name
+        return name
+
+
     def _draw_header(self,
                      aircraft_type: str,
                      checklist_type: str
@@ -254,11 +316,10 @@ class PDFManager:
 
     def _draw_footer(self,
                      version: str,
-                     real_world_clearance: bool,
-                     show_page_number: bool = True
+                     real_world_clearance: bool
                      ):
         """
-            Draws a footer onto the current page
+            Draws a footer without page number onto the current page
 
             Params
             ------
@@ -266,20 +327,21 @@ class PDFManager:
                     Version of the Checklist
                 real_world_clearance (bool):
                     Whether the checklist is meant for real-world usage
-                show_page_number (bool):
-                    Whether the page number should be shown in the bottom right corner.
-                    Defaults to True.
         """
         self.canvas.setFont(self.config.font_name_header_footer, self.config.font_size_header_footer)
         self.canvas.drawString(self.x_limit_left, self.y_footer, f"Version {version}")
-        if show_page_number:
-            self.canvas.drawRightString(self.x_limit_right, self.y_footer, f"Page {self.current_page}")
         if not real_world_clearance:
             text = "----- For Simulator Use Only -----"
-            text_width = self.canvas.stringWidth(text, self.config.font_name_header_footer, self.config.font_size_header_footer)
+            text_width = self.text_widths.get_width(text, self.config.font_name_header_footer, self.config.font_size_header_footer)
             self.canvas.drawString(self._get_centered_text_x(text_width), self.y_footer, text)
 
 
+    def _draw_page_number(self):
+        """Draws the number of the current page in the bottom right corner."""
+        self.canvas.setFont(self.config.font_name_header_footer, self.config.font_size_header_footer)
+        self.canvas.drawRightString(self.x_limit_right, self.y_footer, f"Page {self.current_page}")
+
+
     def _get_centered_text_x(self,
                              text_width: int
                              ) -> int:
@@ -397,9 +459,7 @@ class PDFManager:
         if section.description is not None:
             raise NotImplementedError("Section descriptions are currently not supported!")
         for item in section.items:
-            final_y_position -= self.config.space_between_items
-            if isinstance(item, SectionItem):
-                final_y_position -= (len(item.subitems) * self.config.space_between_items)
+            final_y_position -= (1 + len(item.subitems)) * self.config.space_between_items
         # The last element does not need spacing between items, so remove it
         final_y_position += self.config.space_between_items
         return final_y_position > self.y_limit_bottom
@@ -1,7 +1,9 @@
-from typing import Union
+from typing import Iterator, Tuple, Union
 from pilot_utils.checklist_creator.checklist import CenteredText, SectionItem
 
 class ChecklistSection:
+    __slots__ = ('name', 'description', 'items', 'items_sequence_head', 'item_numbering_offset', 'number_in_sequence')
+
     def __init__(self,
                  section_name: str,
                  section_description: str,
@@ -29,10 +31,31 @@ class ChecklistSection:
                 item (SectionItem or CenteredText):
                     The element that should be appended to this section
         """
-        if isinstance(item, CenteredText):
+        if item.is_centered:
             self.items.append(item)
             return
         if not item.ignore_in_sequence:
             item.number_in_sequence = self.item_numbering_offset + self.items_sequence_head
             self.items_sequence_head += 1
         self.items.append(item)
+
+
+    def __iter__(self) -> Iterator[Union[CenteredText, SectionItem]]:
+        """Iterates over the top-level items of this section."""
+        return iter(self.items)
+
+
+    def iter_items(self) -> Iterator[Tuple[Union[CenteredText, SectionItem], int]]:
+        """
+            Iterates depth-first over all items of this section including
+            subitems, in the order in which they are rendered.
+
+            Returns
+            -------
+                Iterator[Tuple[SectionItem or CenteredText, int]]:
+                    The items and their depth, 0 for top-level items and 1 for subitems
+        """
+        for item in self.items:
+            yield item, 0
+            for subitem in item.subitems:
+                yield subitem, 1
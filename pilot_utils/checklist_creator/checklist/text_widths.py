@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Dict
+from reportlab.pdfbase import pdfmetrics
+
+
+class TextWidthService:
+    def __init__(self,
+                 cache_size: int = 4096
+                 ):
+        """
+            Measures the width of strings as reportlab's stringWidth does, but
+            with an LRU cache keyed by (text, font name, font size) and a glyph
+            width table per font, from which widths of new strings are summed.
+            Checklists repeat the same texts (e.g. "CHECK", "ON", the dot used
+            for connecting dots) many times, so most measurements are cache hits.
+
+            Params
+            ------
+                cache_size (int):
+                    Maximum number of cached widths. Defaults to 4096
+        """
+        self.cache_size = cache_size
+        # font name -> character -> width at font size 1000
+        self._glyph_widths: Dict[str, Dict[str, float]] = {}
+        self._cached_width = lru_cache(maxsize=cache_size)(self._compute_width)
+
+
+    def get_width(self,
+                  text: str,
+                  font_name: str,
+                  font_size: float
+                  ) -> float:
+        """
+            Returns the width of the given text
+
+            Params
+            ------
+                text (str):
+                    The text that should be measured
+                font_name (str):
+                    Name of a registered reportlab font
+                font_size (float):
+                    Font size in points
+
+            Returns
+            -------
+                float:
+                    Width of the text in points
+        """
+        return self._cached_width(text, font_name, font_size)
+
+
+    def _compute_width(self,
+                       text: str,
+                       font_name: str,
+                       font_size: float
+                       ) -> float:
+        glyph_widths = self._glyph_widths.setdefault(font_name, {})
+        width = 0
+        for character in text:
+            character_width = glyph_widths.get(character)
+            if character_width is None:
+                # measured by reportlab once, which includes the fallback to substitution fonts
+                character_width = pdfmetrics.stringWidth(character, font_name, 1000)
+                glyph_widths[character] = character_width
+            width += character_width
+        return width * 0.001 * font_size
+
+
+    def get_statistics(self) -> Dict:
+        """Returns the number of cache hits and misses together with the size of the caches."""
+        info = self._cached_width.cache_info()
+        n_requests = info.hits + info.misses
+        return {'hits': info.hits,
+                'misses': info.misses,
+                'hit_rate': info.hits / n_requests if n_requests > 0 else 0.0,
+                'cached_widths': info.currsize,
+                'glyphs': {font_name: len(widths) for font_name, widths in self._glyph_widths.items()}}
+
+
+    def clear(self):
+        """Empties the caches and resets the statistics."""
+        self._cached_width.cache_clear()
+        self._glyph_widths.clear()
@@ -1,25 +1,57 @@
 import os
+import sys
+import glob
+import time
 import argparse
 
 from os import path as osp
 from reportlab.pdfgen import canvas
-from typing import Dict, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 from reportlab.lib.pagesizes import A5
 
+try:
+    from pypdf import PdfReader, PdfWriter
+    pypdf_imported = True
+except ImportError:
+    pypdf_imported = False
+
 from pilot_utils.checklist_creator import ChecklistParser
-from pilot_utils.checklist_creator.checklist import Checklist, ChecklistSection, SectionItem, CenteredText, ChecklistConfiguration, PDFManager
+from pilot_utils.checklist_creator.build_cache import (ChecklistBuildCache, get_options_hash, get_page_keys,
+                                                       get_source_hash, get_valid_pages, fingerprint_output,
+                                                       is_up_to_date)
+from pilot_utils.checklist_creator.compiled import get_compiled_name, load_checklist
+from pilot_utils.checklist_creator.checklist import Checklist, LayoutEngine, LayoutPlan, PDFManager, TextWidthService
+
+# Header and footer are only drawn as shared form XObjects if a PDF has at least this many pages per form (one
+# form, or two for the odd and even pages in print mode), below that the overhead of the forms makes the PDF larger
+HEADER_FOOTER_FORM_MIN_PAGES = 50
 
 
 class PDFChecklistCreator:
     """
         Class that creates a formatted PDF checklist from a text file.
     """
+    def __init__(self,
+                 text_widths: Optional[TextWidthService] = None
+                 ):
+        """
+            Params
+            ------
+                text_widths (TextWidthService):
+                    Service used to measure texts, shared by all checklists formatted
+                    by this instance. Defaults to None, which creates a new one
+        """
+        self.text_widths = text_widths if text_widths is not None else TextWidthService()
+
+
     def format_checklist(self,
                          checklist: Checklist,
                          output_dir: str,
                          output_name: str,
-                         print_mode: bool = False
-                         ):
+                         print_mode: bool = False,
+                         previous_pages: Optional[List[str]] = None
+                         ) -> List[str]:
         """
             Formats the given checklist into a PDF at the desired location.
 
@@ -34,10 +66,136 @@ class PDFChecklistCreator:
             print_mode (bool):
                 Whether checklist should be created in print mode.
                 Defaults to False
+            previous_pages (List[str]):
+                Page keys (see get_page_keys) of the pdf that currently exists at
+                the output location. Its pages whose key did not change are reused,
+                only the other pages are rendered. Defaults to None, which renders
+                all pages
+
+        Returns
+        -------
+            List[str]:
+                The page keys of the created pdf
+        """
+        return self.format_checklist_targets(checklist, [(output_dir, output_name, print_mode)], [previous_pages])[0]
+
+
+    def format_checklist_targets(self,
+                                 checklist: Checklist,
+                                 targets: List[Tuple[str, str, bool]],
+                                 previous_pages: Optional[List[Optional[List[str]]]] = None
+                                 ) -> List[List[str]]:
+        """
+            Formats the given checklist into several PDFs, e.g. the normal and
+            the print version. The print mode only changes the horizontal
+            borders and the background color, so all targets are drawn from the
+            same layout plan and the checklist is laid out only once.
+
+        Params
+        ------
+            checklist (Checklist):
+                The checklist object as created by the CheckListParser class
+            targets (List[Tuple[str, str, bool]]):
+                Output directory, output filename and print mode of every PDF
+            previous_pages (List[List[str]]):
+                Page keys of the pdf that currently exists at the location of
+                each target, or None, see format_checklist. Defaults to None,
+                which renders all pages of all targets
+
+        Returns
+        -------
+            List[List[str]]:
+                The page keys of every created pdf
         """
         config = checklist.checklist_config
+        # All sections are placed before anything is drawn
+        plan = LayoutEngine(config).plan(checklist)
+        if previous_pages is None:
+            previous_pages = [None] * len(targets)
+        return [self._format_target(checklist, plan, output_dir, output_name, print_mode, target_pages)
+                for (output_dir, output_name, print_mode), target_pages in zip(targets, previous_pages)]
+
+
+    def _format_target(self,
+                       checklist: Checklist,
+                       plan: LayoutPlan,
+                       output_dir: str,
+                       output_name: str,
+                       print_mode: bool,
+                       previous_pages: Optional[List[str]]
+                       ) -> List[str]:
+        """Draws the layout plan into one PDF, reusing unchanged pages of previous_pages."""
+        page_keys = get_page_keys(checklist, plan, print_mode)
+        if previous_pages is None or not pypdf_imported:
+            self._render_pages(checklist, plan, list(range(len(plan.pages))), output_dir, output_name, print_mode)
+            return page_keys
+
+        changed_pages = [page_idx for page_idx, key in enumerate(page_keys)
+                         if page_idx >= len(previous_pages) or previous_pages[page_idx] != key]
+        if len(changed_pages) == len(page_keys):
+            self._render_pages(checklist, plan, changed_pages, output_dir, output_name, print_mode)
+        elif len(changed_pages) > 0 or len(previous_pages) != len(page_keys):
+            # Only the changed pages are rendered, the others are copied from the previous pdf
+            fragment_name = output_name + '.changed_pages'
+            if len(changed_pages) > 0:
+                self._render_pages(checklist, plan, changed_pages, output_dir, fragment_name, print_mode)
+            self._replace_pages(osp.join(output_dir, output_name), osp.join(output_dir, fragment_name + '.pdf'),
+                                changed_pages, len(page_keys))
+        return page_keys
+
+
+    def impose_checklist(self,
+                         input_path: str,
+                         output_dir: str,
+                         output_name: str,
+                         sheet_size: str = 'A4'
+                         ) -> int:
+        """
+            Places the pages of a checklist PDF, usually the print version, two
+            per sheet onto a new PDF (see pdf_merger's ImpositionEngine), such
+            that it can be printed directly. Requires pypdf.
+
+        Params
+        ------
+            input_path (str):
+                Path of the checklist PDF
+            output_dir (str):
+                Output directory of the imposed PDF
+            output_name (str):
+                Filename of the imposed PDF
+            sheet_size (str):
+                Size of the sheets, see parse_sheet_size. Defaults to 'A4'
+
+        Returns
+        -------
+            int:
+                Number of sheets of the imposed PDF
+        """
+        if not pypdf_imported:
+            raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf' to create imposed checklists")
+        # imported here, as importing the pdf_merger package takes longer than creating a checklist
+        from pilot_utils.pdf_merger.imposition import ImpositionEngine, parse_sheet_size
+        # the last page must not be dropped if the checklist has an odd number of pages
+        engine = ImpositionEngine('2up', parse_sheet_size(sheet_size), pad_blank_pages=True, verbose=False)
+        writer = PdfWriter()
+        n_sheets = engine.impose(PdfReader(input_path).pages, writer, use_xobjects=True)
+        output_path = osp.join(output_dir, output_name)
+        tmp_path = output_path + '.tmp'
+        writer.write(tmp_path)
+        os.replace(tmp_path, output_path)
+        return n_sheets
 
-        pdf = PDFManager(config,
+
+    def _render_pages(self,
+                      checklist: Checklist,
+                      plan: LayoutPlan,
+                      page_indices: List[int],
+                      output_dir: str,
+                      output_name: str,
+                      print_mode: bool
+                      ):
+        """Draws the given pages of the layout plan into a new pdf."""
+        pdf = PDFManager(checklist.checklist_config,
                          output_dir,
                          output_name,
                          checklist.aircraft_type,
@@ -45,137 +203,297 @@ class PDFChecklistCreator:
                          checklist.checklist_version,
                          checklist.real_world_clearance,
                          print_mode,
-                         perform_background_coloring=checklist.background_coloring)
-
-        section_id: int = 0
-        while (section_id < len(checklist.sections)):
-            section: ChecklistSection = checklist.sections[section_id]
-            # Check whether section fits onto current page
-            if not pdf.section_fits_page(section):
-                # Create new page
-                pdf.add_page()
-            if not pdf.section_fits_page(section):
-                # Splits current section and returns it, puts new section into checklist after current section
-                section = self._split_section_to_fit_on_page(checklist,
-                                                             section_id,
-                                                             pdf)
-            # Write section onto page starting at current_y_position
-            pdf.print_section_to_current_page(section)
-            # After last element of section, current_y_position is at position for next item,
-            # but we want it to be at position for next section
-            pdf.finish_section()
-            section_id += 1
+                         perform_background_coloring=checklist.background_coloring,
+                         text_widths=self.text_widths,
+                         first_page_number=page_indices[0] + 1,
+                         use_header_footer_forms=len(page_indices) >= HEADER_FOOTER_FORM_MIN_PAGES * (2 if print_mode else 1))
+
+        for n, page_idx in enumerate(page_indices):
+            if n > 0:
+                pdf.add_page(page_number=page_idx + 1)
+            for placed_section in plan.pages[page_idx]:
+                pdf.current_y_position = placed_section.y_position
+                # Write section onto page starting at current_y_position, the plan guarantees that it fits
+                pdf.print_section_to_current_page(placed_section.section, check_fit=False)
         # Save PDF
         pdf.save_pdf()
 
 
-    def _split_section_to_fit_on_page(self,
-                                      checklist: Checklist,
-                                      section_id: int,
-                                      pdf: PDFManager
-                                      ) -> ChecklistSection:
+    def _replace_pages(self,
+                       output_path: str,
+                       fragment_path: str,
+                       changed_pages: List[int],
+                       n_pages: int
+                       ):
         """
-            Splits the section with the given ID such that it fits onto a page.
-            Potentially split sections are added to the checklist directly after the
-            split section
-
-            Params
-            ------
-                checklist (Checklist):
-                    The overall checklist where newly split sections are to be added
-                section_id (int):
-                    ID of the section to potentially split
-                pdf (PDFManager):
-                    The PDF manager instance
-
-            Returns
-            -------
-                ChecklistSection:
-                    The current section split such that it fits onto the page
+            Replaces the changed pages of the pdf at output_path with the pages
+            of the fragment pdf, in order, and truncates it to n_pages pages.
         """
-        current_section: ChecklistSection = checklist.sections[section_id]
-        section_name: str = current_section.name
-        config = checklist.checklist_config
-        split_y_position = pdf.current_y_position
-        y_end: int = pdf.y_limit_bottom
-
-        # 1. Find out the index on which the section has to be split in order to still fit onto the page
-        split_index = self._get_section_splitting_point(current_section, config, split_y_position, y_end)
-
-        # 2. Split items and put remainder in new section
-        items_new_section = current_section.items[split_index:]
-        if len(items_new_section) > 0:
-            current_section.items = current_section.items[:split_index]
-            current_section.items_sequence_head = len(current_section.items) + 1
-            if section_name[-12:] == ' - CONTINUED':
-                new_name = section_name
+        previous = PdfReader(output_path)
+        fragment = PdfReader(fragment_path) if len(changed_pages) > 0 else None
+        fragment_indices = {page_idx: n for n, page_idx in enumerate(changed_pages)}
+        writer = PdfWriter()
+        for page_idx in range(n_pages):
+            if page_idx in fragment_indices:
+                writer.add_page(fragment.pages[fragment_indices[page_idx]])
             else:
-                new_name = section_name + " - CONTINUED"
-            new_section = ChecklistSection(new_name, None, len(current_section.items) + current_section.item_numbering_offset)
-            for item in items_new_section:
-                new_section.append_item(item)
-
-            # 3. Add new section to checklist
-            checklist.add_section_at_index(current_section.number_in_sequence, new_section)
-        return current_section
-
-
-    def _get_section_splitting_point(self,
-                                     section: ChecklistSection,
-                                     config: ChecklistConfiguration,
-                                     y_start: int,
-                                     y_end: int
-                                     ) -> int:
-        """
-            Returns the index at which the provided section has be to split
-            in order for it to fit onto the page determined by y_start and y_end.
-            If all items fit on page, the length of the item list is returned.
+                writer.add_page(previous.pages[page_idx])
+        tmp_path = output_path + '.tmp'
+        writer.write(tmp_path)
+        os.replace(tmp_path, output_path)
+        if fragment is not None:
+            os.remove(fragment_path)
 
-            Params
-            ------
-                section (ChecklistSection):
-                    Section from which the items should be taken
-                config (ChecklistConfiguration):
-                    Checklist configuration
-                y_start (int):
-                    Height at which first item should start
-                y_end (int):
-                    Height which should not be overflown by items
-
-            Returns
-            -------
-                int: Index of the last item that fits onto the page
-        """
-        current_y = y_start
-        for item_idx in range(len(section.items)):
-            if item_idx == 0:
-                current_y -= config.space_section_to_item
+
+def _collect_inputs(inputs: List[str]) -> List[str]:
+    """
+        Returns the checklist text files given by paths of files, directories
+        (all .txt files in them) or glob patterns, without duplicates.
+    """
+    files = []
+    for element in inputs:
+        if osp.isdir(element):
+            matches = sorted(glob.glob(osp.join(element, '*.txt')))
+        elif osp.isfile(element):
+            matches = [element]
+        else:
+            matches = sorted(glob.glob(element))
+            if len(matches) == 0:
+                raise ValueError(f"-i/--input {element} is neither a file nor a directory and does not match any file!")
+        for match in matches:
+            if osp.isfile(match) and match not in files:
+                files.append(match)
+    return files
+
+
+def compile_checklist(job: Dict) -> Dict:
+    """
+        Parses a checklist text file once and creates one pdf per requested
+        variant from it. Errors are returned instead of raised, such that one faulty checklist
+        does not abort a batch.
+
+        Params
+        ------
+            job (Dict):
+                'input': path of the text file, 'outputs': list of
+                (output directory, output name, print mode) tuples and optionally
+                'cache_entries': output name -> build cache entry of the previous
+                run (None if there is none). If given, up-to-date outputs are
+                skipped and only the changed pages of other outputs are rendered.
+                Optionally 'compiled_path': path of the compiled checklist, which
+                is loaded instead of parsing the text file while it is valid,
+                'config_overrides': configuration values that take precedence
+                over the ones of the checklist and 'imposed': list of (output
+                directory, name of a print mode output, name of the imposed pdf)
+                tuples, see PDFChecklistCreator.impose_checklist
+
+        Returns
+        -------
+            Dict:
+                'input', the 'outputs' that were written, the up-to-date outputs
+                that were 'skipped', 'seconds' spent in total and 'parse_seconds'
+                spent parsing, 'error' (None if successful),
+                text width cache statistics and the new 'cache_entries' as list
+                of (output directory, output name, entry) tuples
+    """
+    start = time.perf_counter()
+    checklist_creator = PDFChecklistCreator()
+    use_cache = 'cache_entries' in job
+    config_overrides = job.get('config_overrides', {})
+    written = []
+    skipped = []
+    cache_entries = []
+    parse_seconds = 0.0
+    error = None
+    try:
+        source_hash = get_source_hash(job['input']) if use_cache else None
+        targets = []
+        previous_pages = []
+        options_hashes = []
+        for output_dir, output_name, print_mode in job['outputs']:
+            output_path = osp.join(output_dir, output_name)
+            target_pages = None
+            options_hash = None
+            if use_cache:
+                entry = job['cache_entries'].get(output_name)
+                options_hash = get_options_hash(print_mode, config_overrides)
+                if is_up_to_date(entry, source_hash, options_hash, output_path):
+                    skipped.append(output_path)
+                    cache_entries.append((output_dir, output_name, entry))
+                    continue
+                target_pages = get_valid_pages(entry, output_path)
+            targets.append((output_dir, output_name, print_mode))
+            previous_pages.append(target_pages)
+            options_hashes.append(options_hash)
+
+        if len(targets) > 0:
+            # all variants are drawn from a single parse and layout
+            if job.get('compiled_path') is not None:
+                parse_start = time.perf_counter()
+                checklist = load_checklist(job['input'], job['compiled_path'])
+                parse_seconds += time.perf_counter() - parse_start
             else:
-                current_y -= config.space_between_items
-            if isinstance(section.items[item_idx], SectionItem):
-                current_y -= (len(section.items[item_idx].subitems) * config.space_between_items)
-            if current_y < y_end:
-                return item_idx
-        return len(section.items)
+                checklist_parser = ChecklistParser(job['input'])
+                checklist = checklist_parser.parse()
+                parse_seconds += checklist_parser.parse_seconds
+            for key, value in config_overrides.items():
+                setattr(checklist.checklist_config, key, value)
+            all_page_keys = checklist_creator.format_checklist_targets(checklist, targets, previous_pages)
+            for (output_dir, output_name, _), options_hash, page_keys in zip(targets, options_hashes, all_page_keys):
+                output_path = osp.join(output_dir, output_name)
+                written.append(output_path)
+                if use_cache:
+                    cache_entries.append((output_dir, output_name, {'source': source_hash,
+                                                                    'options': options_hash,
+                                                                    'pages': page_keys,
+                                                                    'output': fingerprint_output(output_path)}))
+
+        for output_dir, print_name, imposed_name in job.get('imposed', []):
+            print_path = osp.join(output_dir, print_name)
+            imposed_path = osp.join(output_dir, imposed_name)
+            if print_path in written or not osp.isfile(imposed_path):
+                checklist_creator.impose_checklist(print_path, output_dir, imposed_name)
+                written.append(imposed_path)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {'input': job['input'],
+            'outputs': written,
+            'skipped': skipped,
+            'seconds': time.perf_counter() - start,
+            'parse_seconds': parse_seconds,
+            'error': error,
+            'text_widths': checklist_creator.text_widths.get_statistics(),
+            'cache_entries': cache_entries}
 
 
+def compile_checklists(jobs: List[Dict],
+                       n_jobs: int = 1) -> List[Dict]:
+    """
+        Runs compile_checklist for every job, optionally spread over a pool of
+        worker processes, which saves the interpreter startup and reportlab
+        import of one invocation per checklist.
+
+        Params
+        ------
+            jobs (List[Dict]):
+                Jobs as expected by compile_checklist
+            n_jobs (int):
+                Number of worker processes. With 1, checklists are compiled one
+                after another in the current process. Defaults to 1
+
+        Returns
+        -------
+            List[Dict]:
+                The result of compile_checklist for each job, in the order of jobs
+    """
+    if n_jobs <= 1 or len(jobs) <= 1:
+        return [compile_checklist(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(jobs))) as executor:
+        return list(executor.map(compile_checklist, jobs))
+
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Create a PDF checklist from a .txt file")
-    parser.add_argument('-i', '--input', type=str, required=True, help="Path to the input txt file that should be converted to a pdf checklist")
-    parser.add_argument('-o', '--output', type=str, required=True, help="Output path. If no filename is provided, uses the same filename as the input file.")
+    parser = argparse.ArgumentParser(description="Create PDF checklists from .txt files")
+    parser.add_argument('-i', '--input', type=str, nargs='+', required=True, help="Paths to the input txt files that should be converted to pdf checklists. Directories (all .txt files in them) and glob patterns are accepted as well.")
+    parser.add_argument('-o', '--output', type=str, required=True, help="Output path. If no filename is provided, uses the same filename as the input file. With several input files or --both, the output directory.")
     parser.add_argument('-p', '--print', action='store_true', help="Create checklist with print layout and settings.")
+    parser.add_argument('--both', action='store_true', help="Create the normal checklist and the print version (suffix '_print') in the same run.")
+    parser.add_argument('--imposed', action='store_true', help="Additionally place the pages of the print version two per A4 sheet (suffix '_2up'), ready for printing. Requires --print or --both and pypdf.")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="Number of worker processes when several checklists are created. Defaults to the number of CPUs.")
+    parser.add_argument('--incremental', action='store_true', help="Keep a build cache in the output directory. Outputs whose source and options did not change are skipped, of other outputs only the changed pages are rendered.")
+    parser.add_argument('--force', action='store_true', help="In combination with --incremental, rebuild all outputs regardless of the build cache.")
+    parser.add_argument('--optimal-page-breaks', action='store_true', help="Choose page breaks that minimize the number of pages and split sections instead of filling pages greedily. The penalties can be configured in the checklist (see checklist/configuration.py).")
+    parser.add_argument('--compiled-dir', type=str, default=None, help="Directory in which the parsed checklists are stored in a compiled binary format. Later runs load them instead of parsing the text files, as long as the text files did not change.")
+    parser.add_argument('--stats', action='store_true', help="Print cache statistics of the text width measurements.")
+    parser.add_argument('--validate', action='store_true', help="Only parse the checklists and report all errors and warnings with line numbers, without creating pdfs.")
     args = parser.parse_args()
-    if not osp.isfile(args.input):
-        raise ValueError(f"-i/--input option is not a valid file!")
-    input_fname = osp.splitext(osp.basename(args.input))[0]
-    output_path, output_file = osp.split(args.output)
-    if output_file == "":
-        output_file = input_fname + ".pdf"
-    elif osp.splitext(output_file)[1] != '.pdf':
-        output_file = output_file + '.pdf'
-    p = ChecklistParser(args.input)
-    cl = p.parse()
+    if args.imposed and not (args.print or args.both):
+        parser.error("--imposed requires --print or --both")
+    input_files = _collect_inputs(args.input)
+    if len(input_files) == 0:
+        raise ValueError(f"-i/--input does not contain any txt file!")
+    if args.validate:
+        n_invalid = 0
+        parse_seconds = 0.0
+        for input_file in input_files:
+            checklist_parser = ChecklistParser(input_file, strict=False, verbose=False)
+            try:
+                checklist_parser.parse()
+            except (OSError, UnicodeDecodeError) as e:
+                n_invalid += 1
+                print(f"{input_file}: error: {e}")
+                continue
+            parse_seconds += checklist_parser.parse_seconds
+            n_invalid += checklist_parser.has_errors()
+            for diagnostic in checklist_parser.diagnostics:
+                print(f"{input_file}: {diagnostic}")
+        print(f"{len(input_files) - n_invalid} of {len(input_files)} checklists are valid, parsed in {parse_seconds:.3f} s")
+        sys.exit(1 if n_invalid > 0 else 0)
+    jobs = []
+    if len(input_files) == 1 and not args.both and osp.isfile(args.input[0]):
+        input_fname = osp.splitext(osp.basename(input_files[0]))[0]
+        output_path, output_file = osp.split(args.output)
+        if output_file == "":
+            output_file = input_fname + ".pdf"
+        elif osp.splitext(output_file)[1] != '.pdf':
+            output_file = output_file + '.pdf'
+        jobs.append({'input': input_files[0], 'outputs': [(output_path, output_file, args.print)]})
+    else:
+        # outputs are named after the input files, so files with the same name would overwrite each other
+        input_fnames = [osp.splitext(osp.basename(input_file))[0] for input_file in input_files]
+        duplicates = sorted({fname for fname in input_fnames if input_fnames.count(fname) > 1})
+        if len(duplicates) > 0:
+            raise ValueError(f"Several input files are named {duplicates}, their outputs would overwrite each other. "
+                             "Create them in separate runs with different output directories.")
+        for input_file in input_files:
+            input_fname = osp.splitext(osp.basename(input_file))[0]
+            if args.both:
+                outputs = [(args.output, input_fname + '.pdf', False), (args.output, input_fname + '_print.pdf', True)]
+            else:
+                outputs = [(args.output, input_fname + '.pdf', args.print)]
+            jobs.append({'input': input_file, 'outputs': outputs})
+    if args.imposed:
+        for job in jobs:
+            job['imposed'] = [(output_dir, output_name, osp.splitext(output_name)[0] + '_2up.pdf')
+                              for output_dir, output_name, print_mode in job['outputs'] if print_mode]
+    if args.optimal_page_breaks:
+        for job in jobs:
+            job['config_overrides'] = {'optimal_page_breaks': True}
+    if args.compiled_dir is not None:
+        for job in jobs:
+            job['compiled_path'] = osp.join(args.compiled_dir, get_compiled_name(job['input']))
 
-    checklist_creator = PDFChecklistCreator()
-    checklist_creator.format_checklist(cl, output_path, output_file, args.print)
+    caches = {}
+    if args.incremental:
+        for job in jobs:
+            job['cache_entries'] = {}
+            for output_dir, output_name, _ in job['outputs']:
+                if output_dir not in caches:
+                    caches[output_dir] = ChecklistBuildCache(output_dir)
+                job['cache_entries'][output_name] = None if args.force else caches[output_dir].get_entry(output_name)
+
+    start = time.perf_counter()
+    results = compile_checklists(jobs, args.jobs)
+    total_seconds = time.perf_counter() - start
+    for result in results:
+        for output_dir, output_name, entry in result['cache_entries']:
+            caches[output_dir].set_entry(output_name, entry)
+    for cache in caches.values():
+        cache.save()
+    n_errors = sum(result['error'] is not None for result in results)
+    if len(results) > 1 or n_errors > 0 or args.incremental:
+        for result in results:
+            status = "OK" if result['error'] is None else f"FAILED: {result['error']}"
+            print(f"{result['input']:<50} {len(result['outputs'])} pdfs {len(result['skipped'])} up to date "
+                  f"{result['seconds']:>8.3f} s  {status}")
+        print(f"Created {sum(len(result['outputs']) for result in results)} pdfs from {len(results) - n_errors} of "
+              f"{len(results)} checklists in {total_seconds:.3f} s "
+              f"({sum(result['seconds'] for result in results):.3f} s summed over all checklists, "
+              f"{sum(result['parse_seconds'] for result in results):.3f} s of it parsing)")
+    if args.stats:
+        hits = sum(result['text_widths']['hits'] for result in results)
+        misses = sum(result['text_widths']['misses'] for result in results)
+        print(f"Text widths: {hits} cache hits, {misses} misses "
+              f"({hits / max(hits + misses, 1):.1%} hit rate)")
+    if n_errors > 0:
+        sys.exit(1)
@@ -0,0 +1,255 @@
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+from os import path as osp
+from typing import Dict, List, Optional, Tuple, Union
+
+from pilot_utils.checklist_creator.parser import ChecklistParser
+from pilot_utils.checklist_creator.checklist import Checklist, ChecklistConfiguration, ChecklistSection, SectionItem, CenteredText
+
+COMPILED_EXTENSION = '.clc'
+MAGIC = b'CLC\x00'
+# Bumped whenever the layout of the records or the model changes
+FORMAT_VERSION = 1
+
+# magic, format version, key of the source (see get_compiled_key)
+_HEADER = struct.Struct('<4sH32s')
+_COUNT = struct.Struct('<I')
+# aircraft type, checklist type, checklist version, configuration (json), flags, number of sections
+_CHECKLIST = struct.Struct('<IIIIBI')
+# name, description, number in sequence, items sequence head, item numbering offset, number of items
+_SECTION = struct.Struct('<IIiIII')
+# kind, left text, right text, flags, number in sequence, subitems sequence head, number of subitems
+_ITEM = struct.Struct('<BIIBiII')
+
+_KIND_ITEM = 0
+_KIND_CENTERED = 1
+_FLAG_REAL_WORLD_CLEARANCE = 1
+_FLAG_BACKGROUND_COLORING = 2
+_FLAG_LEFT_BOLD = 1
+_FLAG_RIGHT_BOLD = 2
+_FLAG_IGNORE_IN_SEQUENCE = 4
+# string index of None
+_NONE = 0
+
+
+def get_compiled_name(source_path: str) -> str:
+    """
+        Returns a file name for the compiled version of the given source, which
+        contains a hash of the absolute source path, such that sources with the
+        same name in different directories can share a directory of compiled
+        checklists.
+    """
+    source_name = osp.splitext(osp.basename(source_path))[0]
+    path_hash = hashlib.sha256(osp.abspath(source_path).encode()).hexdigest()[:12]
+    return f"{source_name}-{path_hash}{COMPILED_EXTENSION}"
+
+
+def get_compiled_key(source_path: str) -> bytes:
+    """
+        Returns the sha256 digest that a compiled checklist must contain to be
+        valid for the given source: it covers the source text and the
+        configuration defaults, which together determine the parsed checklist.
+    """
+    sha = hashlib.sha256(struct.pack('<H', FORMAT_VERSION))
+    sha.update(json.dumps(vars(ChecklistConfiguration()), sort_keys=True, default=str).encode())
+    with open(source_path, 'rb') as file:
+        sha.update(file.read())
+    return sha.digest()
+
+
+class _StringTable:
+    def __init__(self):
+        """Deduplicated strings of a compiled checklist, index 0 stands for None."""
+        self.indices: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+
+    def add(self,
+            text: Optional[str]) -> int:
+        if text is None:
+            return _NONE
+        index = self.indices.get(text)
+        if index is None:
+            self.strings.append(text)
+            index = len(self.strings)
+            self.indices[text] = index
+        return index
+
+
+def _write_item(item: Union[SectionItem, CenteredText],
+                strings: _StringTable,
+                records: List[bytes]):
+    if item.is_centered:
+        records.append(_ITEM.pack(_KIND_CENTERED, strings.add(item.text), _NONE,
+                                  _FLAG_LEFT_BOLD if item.is_bold else 0, -1, 0, 0))
+        return
+    flags = ((_FLAG_LEFT_BOLD if item.is_left_bold else 0) | (_FLAG_RIGHT_BOLD if item.is_right_bold else 0)
+             | (_FLAG_IGNORE_IN_SEQUENCE if item.ignore_in_sequence else 0))
+    number = item.number_in_sequence if item.number_in_sequence is not None else -1
+    records.append(_ITEM.pack(_KIND_ITEM, strings.add(item.text_left), strings.add(item.text_right), flags,
+                              number, item.subitems_sequence_head, len(item.subitems)))
+    for subitem in item.subitems:
+        _write_item(subitem, strings, records)
+
+
+def save_compiled_checklist(checklist: Checklist,
+                            fpath: str,
+                            key: bytes):
+    """
+        Writes the checklist and its resolved configuration in the compiled
+        binary format: a header, a table of deduplicated strings and fixed
+        size records of the sections and (sub)items in depth-first order.
+
+        Params
+        ------
+            checklist (Checklist):
+                The parsed checklist, before it was formatted
+            fpath (str):
+                Path of the compiled checklist
+            key (bytes):
+                Key of the source, see get_compiled_key
+    """
+    strings = _StringTable()
+    records = []
+    flags = ((_FLAG_REAL_WORLD_CLEARANCE if checklist.real_world_clearance else 0)
+             | (_FLAG_BACKGROUND_COLORING if checklist.background_coloring else 0))
+    config = json.dumps(vars(checklist.checklist_config))
+    records.append(_CHECKLIST.pack(strings.add(checklist.aircraft_type), strings.add(checklist.checklist_type),
+                                   strings.add(checklist.checklist_version), strings.add(config), flags,
+                                   len(checklist.sections)))
+    for section in checklist.sections:
+        number = section.number_in_sequence if section.number_in_sequence is not None else -1
+        records.append(_SECTION.pack(strings.add(section.name), strings.add(section.description), number,
+                                     section.items_sequence_head, section.item_numbering_offset, len(section.items)))
+        for item in section.items:
+            _write_item(item, strings, records)
+
+    content = [_HEADER.pack(MAGIC, FORMAT_VERSION, key), _COUNT.pack(len(strings.strings))]
+    for text in strings.strings:
+        encoded = text.encode('utf-8')
+        content.append(_COUNT.pack(len(encoded)))
+        content.append(encoded)
+    content += records
+    # unique temporary file, as several processes may compile the same checklist at once
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=osp.basename(fpath), dir=osp.dirname(fpath) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(b''.join(content))
+        os.replace(tmp_path, fpath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_item(data: bytes,
+               offset: int,
+               strings: List[Optional[str]]) -> Tuple[Union[SectionItem, CenteredText], int]:
+    kind, text_left, text_right, flags, number, subitems_sequence_head, n_subitems = _ITEM.unpack_from(data, offset)
+    offset += _ITEM.size
+    if kind == _KIND_CENTERED:
+        return CenteredText(strings[text_left], bool(flags & _FLAG_LEFT_BOLD)), offset
+    item = SectionItem(strings[text_left], strings[text_right], bool(flags & _FLAG_LEFT_BOLD),
+                       bool(flags & _FLAG_RIGHT_BOLD), bool(flags & _FLAG_IGNORE_IN_SEQUENCE))
+    item.number_in_sequence = number if number >= 0 else None
+    item.subitems_sequence_head = subitems_sequence_head
+    for _ in range(n_subitems):
+        subitem, offset = _read_item(data, offset, strings)
+        item.subitems.append(subitem)
+    return item, offset
+
+
+def load_compiled_checklist(fpath: str,
+                            key: Optional[bytes] = None) -> Optional[Checklist]:
+    """
+        Loads a compiled checklist
+
+        Params
+        ------
+            fpath (str):
+                Path of the compiled checklist
+            key (bytes):
+                Key of the source (see get_compiled_key). If given, None is
+                returned if the compiled checklist belongs to a different
+                version of the source. Defaults to None
+
+        Returns
+        -------
+            Checklist:
+                The checklist, or None if the file does not exist or is outdated
+    """
+    if not osp.isfile(fpath):
+        return None
+    with open(fpath, 'rb') as file:
+        data = file.read()
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, file_key = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or (key is not None and file_key != key):
+        return None
+    offset = _HEADER.size
+    (n_strings,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    strings = [None]
+    for _ in range(n_strings):
+        (length,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+
+    aircraft_type, checklist_type, checklist_version, config, flags, n_sections = _CHECKLIST.unpack_from(data, offset)
+    offset += _CHECKLIST.size
+    checklist = Checklist(strings[aircraft_type], strings[checklist_type], strings[checklist_version],
+                          bool(flags & _FLAG_REAL_WORLD_CLEARANCE), bool(flags & _FLAG_BACKGROUND_COLORING))
+    for key_, value in json.loads(strings[config]).items():
+        setattr(checklist.checklist_config, key_, tuple(value) if key_ == 'page_size' else value)
+    for _ in range(n_sections):
+        name, description, number, items_sequence_head, item_numbering_offset, n_items = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        section = ChecklistSection(strings[name], strings[description], item_numbering_offset)
+        section.number_in_sequence = number if number >= 0 else None
+        section.items_sequence_head = items_sequence_head
+        for _ in range(n_items):
+            item, offset = _read_item(data, offset, strings)
+            section.items.append(item)
+        checklist.sections.append(section)
+    checklist.sections_sequence_head = len(checklist.sections) + 1
+    return checklist
+
+
+def load_checklist(source_path: str,
+                   compiled_path: Optional[str] = None,
+                   verbose: bool = True) -> Checklist:
+    """
+        Returns the checklist of the given source, loaded from its compiled
+        version if that is still valid. Otherwise the source is parsed and
+        compiled again.
+
+        Params
+        ------
+            source_path (str):
+                Path of the checklist text file
+            compiled_path (str):
+                Path of the compiled checklist. Defaults to None, which uses the
+                source path with the extension COMPILED_EXTENSION
+            verbose (bool):
+                Whether parser warnings should be printed. Defaults to True
+
+        Returns
+        -------
+            Checklist:
+                The checklist
+    """
+    if compiled_path is None:
+        compiled_path = osp.splitext(source_path)[0] + COMPILED_EXTENSION
+    key = get_compiled_key(source_path)
+    checklist = load_compiled_checklist(compiled_path, key)
+    if checklist is None:
+        checklist = ChecklistParser(source_path, verbose=verbose).parse()
+        if osp.dirname(compiled_path):
+            os.makedirs(osp.dirname(compiled_path), exist_ok=True)
+        save_compiled_checklist(checklist, compiled_path, key)
+    return checklist
@@ -1,185 +1,346 @@
-import os
+import io
+import time
 
-from typing import Dict
 from os import path as osp
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from pilot_utils.checklist_creator.checklist import Checklist, ChecklistSection, SectionItem, CenteredText
 
+# Token kinds, one per line syntax of the checklist text format
+TOKEN_CONFIG = 'config'
+TOKEN_SECTION = 'section'
+TOKEN_ITEM = 'item'
+TOKEN_SUBITEM = 'subitem'
+TOKEN_BOLD_SUBITEM = 'bold_subitem'
+TOKEN_ENUMERATED_BOLD_SUBITEM = 'enumerated_bold_subitem'
+TOKEN_CENTERED = 'centered'
+TOKEN_UNKNOWN = 'unknown'
+
+# Line prefix -> token kind, in the order in which prefixes are checked
+LINE_PREFIXES = (('//', TOKEN_CONFIG),
+                 ('#', TOKEN_SECTION),
+                 ('-', TOKEN_ITEM),
+                 ('+', TOKEN_SUBITEM),
+                 ('**', TOKEN_BOLD_SUBITEM),
+                 ('*', TOKEN_ENUMERATED_BOLD_SUBITEM),
+                 ('=', TOKEN_CENTERED))
+
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+
+
+class ChecklistToken:
+    def __init__(self,
+                 line_number: int,
+                 kind: str,
+                 text: str
+                 ):
+        """
+            One line of a checklist text file
+
+            Params
+            ------
+                line_number (int):
+                    Number of the line, starting at 1
+                kind (str):
+                    One of the TOKEN_* constants
+                text (str):
+                    Content of the line without prefix and surrounding whitespace
+        """
+        self.line_number = line_number
+        self.kind = kind
+        self.text = text
+
+
+    def split_left_right(self) -> List[Optional[str]]:
+        """Returns left and right text of an item line, separated by '..'."""
+        if '..' not in self.text:
+            return [self.text, None]
+        return [text.strip() for text in self.text.split('..', 1)]
+
+
+class ParseDiagnostic:
+    def __init__(self,
+                 line_number: int,
+                 severity: str,
+                 message: str
+                 ):
+        """
+            A problem found while parsing a checklist
+
+            Params
+            ------
+                line_number (int):
+                    Number of the line, starting at 1
+                severity (str):
+                    SEVERITY_ERROR or SEVERITY_WARNING
+                message (str):
+                    Description of the problem
+        """
+        self.line_number = line_number
+        self.severity = severity
+        self.message = message
+
+
+    def __str__(self) -> str:
+        return f"Line {self.line_number}: {self.severity}: {self.message}"
+
+
+class ChecklistParseError(ValueError):
+    def __init__(self,
+                 diagnostics: List[ParseDiagnostic]
+                 ):
+        """Raised for checklists with errors, contains all diagnostics of the parse."""
+        self.diagnostics = diagnostics
+        errors = [str(diagnostic) for diagnostic in diagnostics if diagnostic.severity == SEVERITY_ERROR]
+        super().__init__(f"Found {len(errors)} errors in checklist:\n" + "\n".join(errors))
+
+
+def tokenize_checklist(lines: Iterable[str]) -> Iterator[ChecklistToken]:
+    """
+        Yields one token per non-empty line of the given lines, reading them
+        one at a time.
+
+        Params
+        ------
+            lines (Iterable[str]):
+                Lines of a checklist, e.g. an open text file
+
+        Returns
+        -------
+            Iterator[ChecklistToken]:
+                The tokens in line order
+    """
+    for line_nbr, line in enumerate(lines):
+        kind = TOKEN_UNKNOWN
+        text = line
+        for prefix, prefix_kind in LINE_PREFIXES:
+            if line.startswith(prefix):
+                kind = prefix_kind
+                text = line[len(prefix):]
+                break
+        text = text.strip()
+        if kind == TOKEN_UNKNOWN and text == "":
+            continue
+        yield ChecklistToken(line_nbr + 1, kind, text)
+
+
+class ChecklistBuilder:
+    def __init__(self):
+        """
+            Builds a Checklist from tokens, one token at a time. Problems are
+            collected as diagnostics instead of aborting, such that all of them
+            are found in a single pass.
+        """
+        self.checklist = Checklist()
+        self.checklist_config: Dict[str, str] = {}
+        # configuration key -> number of the line that set it
+        self.config_line_numbers: Dict[str, int] = {}
+        self.diagnostics: List[ParseDiagnostic] = []
+        self.current_section = None
+        self.current_item = None
+        self.current_subitem = None
+
+
+    def _add_diagnostic(self,
+                        token: ChecklistToken,
+                        severity: str,
+                        message: str):
+        self.diagnostics.append(ParseDiagnostic(token.line_number, severity, message))
+
+
+    def _close_subitem(self):
+        """Closes a previous subitem"""
+        if self.current_subitem is not None:
+            self.current_item.append_subitem(self.current_subitem)
+            self.current_subitem = None
+
+
+    def _close_item(self):
+        """Closes a previous item and its subitems"""
+        self._close_subitem()
+        if self.current_item is not None:
+            self.current_section.append_item(self.current_item)
+            self.current_item = None
+
+
+    def add_token(self,
+                  token: ChecklistToken):
+        """Adds the element described by the given token to the checklist."""
+        if token.kind == TOKEN_CONFIG:
+            try:
+                config_key, config_value = token.text.split('=', 1)
+            except ValueError:
+                self._add_diagnostic(token, SEVERITY_WARNING, "Invalid checklist configuration instruction, ignoring it")
+                return
+            self.checklist_config[config_key.strip()] = config_value.strip()
+            self.config_line_numbers[config_key.strip()] = token.line_number
+
+        elif token.kind == TOKEN_SECTION:
+            self._close_item()
+            # Check whether we have to "close" a previous section
+            if self.current_section is not None:
+                self.checklist.append_section(self.current_section)
+            # we do not support section descriptions at the moment
+            self.current_section = ChecklistSection(token.text, None)
+
+        elif token.kind == TOKEN_ITEM:
+            if self.current_section is None:
+                self._add_diagnostic(token, SEVERITY_ERROR, "Found item definition before section definition!")
+                return
+            self._close_item()
+            text_left, text_right = token.split_left_right()
+            self.current_item = SectionItem(text_left, text_right, False, True, False)
+
+        elif token.kind == TOKEN_UNKNOWN:
+            self._add_diagnostic(token, SEVERITY_WARNING, "Line does not start with a known command, ignoring it")
+
+        elif self.current_item is None:
+            if token.kind == TOKEN_CENTERED:
+                self._add_diagnostic(token, SEVERITY_ERROR, "Found centered text before item definition!")
+            else:
+                self._add_diagnostic(token, SEVERITY_ERROR, "Found sub-item definition before item definition!")
+
+        else:
+            self._close_subitem()
+            if token.kind == TOKEN_SUBITEM:
+                text_left, text_right = token.split_left_right()
+                self.current_subitem = SectionItem(text_left, text_right, False, True, False)
+            # sub-item with left only in bold, not enumerated
+            elif token.kind == TOKEN_BOLD_SUBITEM:
+                self.current_subitem = SectionItem(token.text, None, True, False, True)
+            # sub-item with left only in bold, enumerated
+            elif token.kind == TOKEN_ENUMERATED_BOLD_SUBITEM:
+                self.current_subitem = SectionItem(token.text, None, True, False, False)
+            # centered text is treated as subitem
+            elif token.kind == TOKEN_CENTERED:
+                self.current_subitem = CenteredText(token.text, True)
+
+
+    def finish(self) -> Checklist:
+        """
+            Closes all remaining elements, applies the configuration and returns
+            the checklist. Unknown configuration settings are reported as
+            warnings and invalid values as errors.
+        """
+        self._close_item()
+        if self.current_section is not None:
+            self.checklist.append_section(self.current_section)
+            self.current_section = None
+
+        checklist_config = self.checklist_config
+        # Read out aircraft and checklist type from config
+        if "Aircraft Type" in checklist_config.keys():
+            self.checklist.aircraft_type = checklist_config.pop("Aircraft Type")
+        if "Checklist Type" in checklist_config.keys():
+            self.checklist.checklist_type = checklist_config.pop("Checklist Type")
+        if "Checklist Version" in checklist_config.keys():
+            self.checklist.checklist_version = checklist_config.pop("Checklist Version")
+        if "Real World Clearance" in checklist_config.keys():
+            self.checklist.real_world_clearance = checklist_config.pop("Real World Clearance").lower() == "true"
+        if "Background Coloring" in checklist_config.keys():
+            self.checklist.background_coloring = checklist_config.pop("Background Coloring").lower() == "true"
+        # Update checklist configuration with remaining settings, one at a time such that
+        # every problem is reported with the line of the setting
+        config = self.checklist.checklist_config
+        for config_key, config_value in checklist_config.items():
+            line_number = self.config_line_numbers[config_key]
+            if not hasattr(config, config_key):
+                self.diagnostics.append(ParseDiagnostic(line_number, SEVERITY_WARNING,
+                                                        f"Unknown configuration setting '{config_key}', ignoring it"))
+                continue
+            try:
+                config.update_configuration({config_key: config_value})
+            except ValueError as e:
+                self.diagnostics.append(ParseDiagnostic(line_number, SEVERITY_ERROR, str(e)))
+        self.diagnostics.sort(key=lambda diagnostic: diagnostic.line_number)
+        return self.checklist
+
+
 class ChecklistParser:
-    def __init__(self, fpath: str):
+    def __init__(self,
+                 fpath: Optional[str] = None,
+                 strict: bool = True,
+                 verbose: bool = True
+                 ):
         """
             Parses the given checklist to a Checklist object
 
         Params
         ------
             fpath (str):
-                Path to the checklist that should be parsed
+                Path to the checklist that should be parsed. Defaults to None,
+                in which case only parse_stream and parse_string can be used
+            strict (bool):
+                Whether a ChecklistParseError with all errors should be raised
+                if the checklist contains errors. Otherwise the checklist is built
+                from all valid lines. Defaults to True
+            verbose (bool):
+                Whether warnings should be printed. Defaults to True
         """
-        if not osp.isfile(fpath):
+        if fpath is not None and not osp.isfile(fpath):
             raise ValueError(f"The provided path is not a valid file: {fpath}")
         self.fpath = fpath
+        self.strict = strict
+        self.verbose = verbose
         self.checklist = None
+        self.diagnostics: List[ParseDiagnostic] = []
+        self.parse_seconds = 0.0
 
 
     def parse(self) -> Checklist:
         """
-            Parses the checklist file
+            Parses the checklist file line by line
 
         Returns
         -------
             Checklist:
                 The parsed checklist object.
         """
+        if self.fpath is None:
+            raise ValueError("No checklist file was provided, use parse_stream or parse_string instead")
         with open(self.fpath, 'r') as file:
-            content = file.readlines()
+            return self.parse_stream(file)
 
-        self.checklist = Checklist()
-        checklist_config = {}
-
-        current_section = None
-        current_item = None
-        current_subitem = None
-
-        for line_nbr, line in enumerate(content):
-            # Check for checklist configuration item
-            if line.startswith("//"):
-                line = line[2:].strip()
-                try:
-                    config_key, config_value = line.split('=', 1)
-                except ValueError:
-                    print(f"Encountered an invalid checklist configuration instruction in line {line_nbr+1}, ignoring it")
-                    continue
-                config_key = config_key.strip()
-                config_value = config_value.strip()
-                checklist_config[config_key] = config_value
-
-            # Check for new section
-            elif line.startswith("#"):
-                line = line[1:].strip()
-                # Check whether we have to "close" a previous subitem
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Check whether we have to "close" a previous item
-                if current_item is not None:
-                    current_section.append_item(current_item)
-                # Check whether we have to "close" a previous section
-                if current_section is not None:
-                    self.checklist.append_section(current_section)
-                # Create new section
-                sectrion_description = None # we do not support section descriptions at the moment
-                current_section = ChecklistSection(line, sectrion_description)
-                current_item = None
-                current_subitem = None
-
-            # Check for new item
-            elif line.startswith("-"):
-                line = line[1:].strip()
-
-                if current_section is None:
-                    raise ValueError(f"Line {line_nbr+1}: Found item definition before section definition!")
-
-                # Check whether we have to "close" a previous subitem
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Check whether we have to "close" a previous item
-                if current_item is not None:
-                    current_section.append_item(current_item)
-                # Parse the item
-                if '..' not in line:
-                    text_left = line
-                    text_right = None
-                else:
-                    text_left, text_right = line.split('..', 1)
-                    text_left = text_left.strip()
-                    text_right = text_right.strip()
-                # Create new item with parsed information
-                current_item = SectionItem(text_left, text_right, False, True, False)
-                current_subitem = None
-
-            # Check for new sub-item
-            elif line.startswith('+'):
-                line = line[1:].strip()
-
-                if current_item is None:
-                    raise ValueError(f"Line {line_nbr+1}: Found sub-item definition before item definition!")
-
-                # Check whether we have to "close" a previous sub-item
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Parse the subitem
-                if '..' not in line:
-                    text_left = line
-                    text_right = None
-                else:
-                    text_left, text_right = line.split('..', 1)
-                    text_left = text_left.strip()
-                    text_right = text_right.strip()
-                # Create new subitem with parsed information
-                current_subitem = SectionItem(text_left, text_right, False, True, False)
-
-            # Check for new sub-item with left only in bold, not enumerated
-            elif line.startswith('**'):
-                line = line[2:].strip()
-
-                if current_item is None:
-                    raise ValueError(f"Line {line_nbr+1}: Found sub-item definition before item definition!")
-
-                # Check whether we have to "close" a previous sub-item
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Create new subitem
-                current_subitem = SectionItem(line, None, True, False, True)
-
-            # Check for new sub-item with left only in bold, enumerated
-            elif line.startswith('*'):
-                line = line[1:].strip()
-
-                if current_item is None:
-                    raise ValueError(f"Line {line_nbr+1}: Found sub-item definition before item definition!")
-
-                # Check whether we have to "close" a previous sub-item
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Create new subitem
-                current_subitem = SectionItem(line, None, True, False, False)
-
-            # Check for centered line
-            elif line.startswith('='):
-                line = line[1:].strip()
-
-                # Check whether we have to "close" a previous sub-item
-                if current_subitem is not None:
-                    current_item.append_subitem(current_subitem)
-                # Create new centered text and treat it as subitem
-                current_subitem = CenteredText(line, True)
-
-        # We've iterated all lines, "close" all remaining elements
-        if current_subitem is not None:
-            current_item.append_subitem(current_subitem)
-            current_subitem = None
-        if current_item is not None:
-            current_section.append_item(current_item)
-            current_item = None
-        if current_section is not None:
-            self.checklist.append_section(current_section)
-            current_section = None
 
-        # Read out aircraft and checklist type from config
-        if "Aircraft Type" in checklist_config.keys():
-            self.checklist.aircraft_type = checklist_config["Aircraft Type"]
-            del checklist_config["Aircraft Type"]
-        if "Checklist Type" in checklist_config.keys():
-            self.checklist.checklist_type = checklist_config["Checklist Type"]
-            del checklist_config["Checklist Type"]
-        if "Checklist Version" in checklist_config.keys():
-            self.checklist.checklist_version = checklist_config["Checklist Version"]
-            del checklist_config["Checklist Version"]
-        if "Real World Clearance" in checklist_config.keys():
-            self.checklist.real_world_clearance = True if checklist_config["Real World Clearance"].lower() == "true" else False
-            del checklist_config["Real World Clearance"]
-        if "Background Coloring" in checklist_config.keys():
-            self.checklist.background_coloring = True if checklist_config["Background Coloring"].lower() == "true" else False
-            del checklist_config["Background Coloring"]
-        # Update checklist configuration with remaining settings
-        self.checklist.checklist_config.update_configuration(checklist_config, True)
+    def parse_string(self,
+                     text: str) -> Checklist:
+        """Parses a checklist given as string, see parse_stream."""
+        return self.parse_stream(io.StringIO(text))
+
+
+    def parse_stream(self,
+                     stream: Iterable[str]) -> Checklist:
+        """
+            Parses a checklist in a single pass over the given lines. All
+            problems are collected in self.diagnostics, and the time spent
+            parsing in self.parse_seconds.
+
+        Params
+        ------
+            stream (Iterable[str]):
+                Lines of the checklist, e.g. an open text file
+
+        Returns
+        -------
+            Checklist:
+                The parsed checklist object.
+        """
+        start = time.perf_counter()
+        builder = ChecklistBuilder()
+        for token in tokenize_checklist(stream):
+            builder.add_token(token)
+        self.checklist = builder.finish()
+        self.diagnostics = builder.diagnostics
+        self.parse_seconds = time.perf_counter() - start
+
+        if self.strict and self.has_errors():
+            raise ChecklistParseError(self.diagnostics)
+        if self.verbose:
+            for diagnostic in self.diagnostics:
+                print(diagnostic)
         return self.checklist
+
+
+    def has_errors(self) -> bool:
+        return any(diagnostic.severity == SEVERITY_ERROR for diagnostic in self.diagnostics)
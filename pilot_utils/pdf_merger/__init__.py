@@ -0,0 +1,3 @@
+from .instrumentation import BuildStatistics, write_report
+from .pdf_merger import (merge, arrange, merge_and_arrange, process_directory, process_directories, DirectoryResult,
+                         STATUS_BUILT, STATUS_SKIPPED, STATUS_EMPTY, STATUS_FAILED)
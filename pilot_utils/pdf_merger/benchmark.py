@@ -0,0 +1,157 @@
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+
+from os import path as osp
+from typing import Dict, List
+
+from pilot_utils.pdf_merger.pdf_merger import arrange
+
+SAMPLE_CORPUS_DIR = osp.join(osp.dirname(osp.dirname(osp.abspath(__file__))), 'checklist_creator', 'documents')
+LARGE_DOCUMENT_PAGES = 2000
+
+
+def create_large_document(fpath: str,
+                          num_pages: int = LARGE_DOCUMENT_PAGES):
+    """Writes a synthetic pdf with num_pages A5 text pages to fpath."""
+    # reportlab is only needed for the synthetic document
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A5
+
+    pdf = canvas.Canvas(fpath, pagesize=A5)
+    for page in range(num_pages):
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(40, A5[1] - 50, f"Page {page + 1}")
+        pdf.setFont('Helvetica', 9)
+        for line in range(40):
+            pdf.drawString(40, A5[1] - 80 - 12 * line, f"Item {line + 1} " + '.' * 60 + " CHECKED")
+        pdf.showPage()
+    pdf.save()
+
+
+def _time_arrange(input_file: str,
+                  output_dir: str,
+                  use_xobjects: bool,
+                  repeat: int) -> Dict:
+    """Returns the best wall time and output size of arranging input_file."""
+    output_name = 'xobjects.pdf' if use_xobjects else 'merged_pages.pdf'
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # arrange() reports its progress through print, which would clutter the table
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            arrange(input_file, output_dir, output_name, True, use_xobjects)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return {'seconds': best, 'size': osp.getsize(osp.join(output_dir, output_name))}
+
+
+def _time_arrange_first_sheet(input_file: str,
+                              output_dir: str,
+                              lazy: bool) -> Dict:
+    """
+        Returns the time until the first sheet is written, the total wall time
+        and the output size of arranging input_file. Without lazy, the output
+        is only written at the very end, so the first sheet is available once
+        arrange() returns.
+    """
+    output_name = 'lazy.pdf' if lazy else 'eager.pdf'
+    first_sheet = []
+
+    def on_progress(phase: str, done: int, total: int):
+        if not first_sheet:
+            first_sheet.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # the eager writer reports progress while imposing, before anything is written
+        arrange(input_file, output_dir, output_name, True, True, lazy=lazy,
+                progress_callback=on_progress if lazy else None)
+    duration = time.perf_counter() - start
+    return {'first_sheet': first_sheet[0] if lazy else duration,
+            'seconds': duration,
+            'size': osp.getsize(osp.join(output_dir, output_name))}
+
+
+def compare_lazy_arrange(num_pages: int = LARGE_DOCUMENT_PAGES) -> Dict:
+    """
+        Arranges a synthetic document with num_pages pages with the default
+        (eager) reader and writer and in lazy mode, both with form XObjects.
+
+        Returns
+        -------
+            Dict:
+                Dictionary with the keys 'pages', 'eager' and 'lazy', the latter
+                two containing 'first_sheet', 'seconds' and 'size'
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        input_file = osp.join(output_dir, 'large.pdf')
+        create_large_document(input_file, num_pages)
+        return {'pages': num_pages,
+                'eager': _time_arrange_first_sheet(input_file, output_dir, False),
+                'lazy': _time_arrange_first_sheet(input_file, output_dir, True)}
+
+
+def compare_arrange_modes(input_files: List[str],
+                          repeat: int = 3) -> List[Dict]:
+    """
+        Arranges each of the given files with and without form XObjects and
+        returns the best wall time (out of repeat runs) and output size of both.
+
+        Params
+        ------
+            input_files (List[str]):
+                Paths to the pdfs that should be arranged
+            repeat (int):
+                Number of runs per file and mode. Defaults to 3
+
+        Returns
+        -------
+            List[Dict]:
+                One dictionary per input file with the keys 'file', 'merge_transformed_page'
+                and 'xobjects', the latter two containing 'seconds' and 'size'
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for input_file in input_files:
+            results.append({
+                'file': osp.basename(input_file),
+                'merge_transformed_page': _time_arrange(input_file, output_dir, False, repeat),
+                'xobjects': _time_arrange(input_file, output_dir, True, repeat),
+            })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares time and output size of arrange() "
+                                     "with and without form XObjects or in lazy mode.")
+    parser.add_argument('-i', '--input', type=str, nargs='*', default=None,
+                        help="Pdf files to arrange. Defaults to the example pdfs "
+                        "of the checklist creator.")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Number of runs per file and mode. Defaults to 3")
+    parser.add_argument('--lazy', action='store_true',
+                        help="Instead, compare time to first sheet and total runtime "
+                        "of eager and lazy arranging on a synthetic "
+                        f"{LARGE_DOCUMENT_PAGES}-page document (requires reportlab).")
+    args = parser.parse_args()
+    if args.lazy:
+        result = compare_lazy_arrange()
+        print(f"{result['pages']} pages")
+        print(f"{'Mode':<10}{'first sheet [s]':>16}{'total [s]':>12}{'size [kB]':>12}")
+        for mode in ('eager', 'lazy'):
+            print(f"{mode:<10}{result[mode]['first_sheet']:>16.3f}{result[mode]['seconds']:>12.3f}"
+                  f"{result[mode]['size'] / 1024:>12.1f}")
+    else:
+        input_files = args.input
+        if not input_files:
+            input_files = sorted(osp.join(SAMPLE_CORPUS_DIR, f) for f in os.listdir(SAMPLE_CORPUS_DIR)
+                                 if osp.splitext(f)[1] == '.pdf')
+        print(f"{'File':<24}{'merge [s]':>12}{'xobject [s]':>12}{'merge [kB]':>12}{'xobject [kB]':>14}")
+        for result in compare_arrange_modes(input_files, args.repeat):
+            merged = result['merge_transformed_page']
+            xobjects = result['xobjects']
+            print(f"{result['file']:<24}{merged['seconds']:>12.3f}{xobjects['seconds']:>12.3f}"
+                  f"{merged['size'] / 1024:>12.1f}{xobjects['size'] / 1024:>14.1f}")
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+
+from os import path as osp
+from datetime import datetime
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import pypdf
+
+from pilot_utils.pdf_merger.instrumentation import BuildStatistics
+from pilot_utils.pdf_merger.pdf_merger import arrange, merge
+from pilot_utils.pdf_merger.streaming import get_peak_rss
+
+RESULTS_VERSION = 1
+
+# Corpus name -> (number of files, pages per file) at scale 1
+CORPORA = {
+    'many_small': (100, 2),
+    'few_huge': (3, 200),
+    'mixed_orientation': (30, 4),
+    'image_heavy': (10, 4),
+}
+
+# Case name -> keyword arguments of merge()
+MERGE_CASES = {
+    'merge': {},
+    'merge_streaming': {'streaming': True},
+}
+
+# Case name -> keyword arguments of arrange()
+ARRANGE_CASES = {
+    'arrange': {},
+    'arrange_xobjects': {'use_xobjects': True},
+    'arrange_lazy': {'lazy': True},
+}
+
+
+def _create_pdf(fpath: str,
+                num_pages: int,
+                corpus: str,
+                file_index: int):
+    """Writes one synthetic pdf of the given corpus."""
+    # reportlab and Pillow are only needed to generate the corpora
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A5, landscape
+    from reportlab.lib.utils import ImageReader
+
+    pdf = canvas.Canvas(fpath, pagesize=A5)
+    for page in range(num_pages):
+        page_size = A5
+        if corpus == 'mixed_orientation' and (file_index + page) % 2 == 1:
+            page_size = landscape(A5)
+        pdf.setPageSize(page_size)
+        width, height = page_size
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(40, height - 50, f"{corpus} {file_index + 1} / page {page + 1}")
+        if corpus == 'image_heavy':
+            from PIL import Image
+            # random pixels can hardly be compressed, like photos or scanned charts
+            image = Image.frombytes('RGB', (600, 600), os.urandom(600 * 600 * 3))
+            pdf.drawImage(ImageReader(image), 40, 80, width - 80, width - 80)
+        else:
+            pdf.setFont('Helvetica', 9)
+            for line in range(int((height - 120) / 12)):
+                pdf.drawString(40, height - 80 - 12 * line, f"Item {line + 1} " + '.' * 50 + " CHECKED")
+        pdf.showPage()
+    pdf.save()
+
+
+def create_corpus(corpus_dir: str,
+                  corpus: str,
+                  scale: float = 1.0) -> int:
+    """
+        Writes the synthetic pdfs of the given corpus (see CORPORA) to corpus_dir.
+
+        Params
+        ------
+            corpus_dir (str):
+                Directory to which the pdfs are written
+            corpus (str):
+                Name of the corpus
+            scale (float):
+                Factor applied to the number of files (many_small, mixed_orientation,
+                image_heavy) or pages per file (few_huge). Defaults to 1.0
+
+        Returns
+        -------
+            int:
+                Total number of pages
+    """
+    num_files, num_pages = CORPORA[corpus]
+    if corpus == 'few_huge':
+        num_pages = max(1, round(num_pages * scale))
+    else:
+        num_files = max(1, round(num_files * scale))
+    os.makedirs(corpus_dir, exist_ok=True)
+    for file_index in range(num_files):
+        _create_pdf(osp.join(corpus_dir, f"{file_index + 1:04d}.pdf"), num_pages, corpus, file_index)
+    return num_files * num_pages
+
+
+def _measure(function_name: str,
+             kwargs: Dict) -> Dict:
+    """
+        Runs merge() or arrange() and returns its measurements. Executed in a
+        fresh process, such that the peak memory usage only covers this run.
+    """
+    baseline_rss = get_peak_rss()
+    statistics = BuildStatistics()
+    function = merge if function_name == 'merge' else arrange
+    start = time.perf_counter()
+    function(**kwargs, overwrite_existing_pdf=True, verbose=False, statistics=statistics)
+    seconds = time.perf_counter() - start
+    peak_rss = get_peak_rss()
+    return {'seconds': seconds,
+            'pages': statistics.pages_in,
+            'pages_per_second': statistics.pages_in / seconds if seconds > 0 else None,
+            'peak_rss': peak_rss,
+            'peak_rss_increase': peak_rss - baseline_rss if peak_rss is not None else None,
+            'bytes_in': statistics.bytes_in,
+            'bytes_out': statistics.bytes_out,
+            'timings': statistics.timings}
+
+
+def _run_isolated(function_name: str,
+                  kwargs: Dict,
+                  repeat: int) -> Dict:
+    """Returns the fastest of repeat measurements, each in a new process."""
+    measurements = []
+    for _ in range(repeat):
+        # spawn instead of fork, a forked child would inherit the peak memory usage of this process
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            measurements.append(executor.submit(_measure, function_name, kwargs).result())
+    return min(measurements, key=lambda measurement: measurement['seconds'])
+
+
+def run_suite(corpora: Optional[List[str]] = None,
+              scale: float = 1.0,
+              repeat: int = 1,
+              progress: bool = True) -> Dict:
+    """
+        Generates the synthetic corpora and measures all merge and arrange
+        cases on each of them. The arrange cases use the output of the 'merge'
+        case as input.
+
+        Params
+        ------
+            corpora (List[str]):
+                Names of the corpora, see CORPORA. Defaults to None (all corpora)
+            scale (float):
+                Size factor of the corpora, see create_corpus. Defaults to 1.0
+            repeat (int):
+                Number of runs per case, the fastest run is reported. Defaults to 1
+            progress (bool):
+                Whether each measurement should be printed. Defaults to True
+
+        Returns
+        -------
+            Dict:
+                Json serializable results including information about the environment
+    """
+    results = {'version': RESULTS_VERSION,
+               'created': datetime.now().isoformat(timespec='seconds'),
+               'environment': {'python': platform.python_version(),
+                               'pypdf': pypdf.__version__,
+                               'platform': platform.platform()},
+               'scale': scale,
+               'repeat': repeat,
+               'corpora': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for corpus in corpora or list(CORPORA.keys()):
+            corpus_dir = osp.join(work_dir, corpus)
+            output_dir = osp.join(work_dir, corpus + '_out')
+            num_pages = create_corpus(corpus_dir, corpus, scale)
+            corpus_results = {'pages': num_pages, 'cases': {}}
+            for case, options in MERGE_CASES.items():
+                kwargs = dict(options, input_dir=corpus_dir, output_dir=output_dir,
+                              output_name=case + '.pdf', arranged_output_name='arranged.pdf')
+                corpus_results['cases'][case] = _run_isolated('merge', kwargs, repeat)
+                if progress:
+                    _print_measurement(corpus, case, corpus_results['cases'][case])
+            for case, options in ARRANGE_CASES.items():
+                kwargs = dict(options, input_file=osp.join(output_dir, 'merge.pdf'),
+                              output_dir=output_dir, output_name=case + '.pdf')
+                corpus_results['cases'][case] = _run_isolated('arrange', kwargs, repeat)
+                if progress:
+                    _print_measurement(corpus, case, corpus_results['cases'][case])
+            results['corpora'][corpus] = corpus_results
+    return results
+
+
+def _print_measurement(corpus: str,
+                       case: str,
+                       measurement: Dict):
+    peak_rss = measurement['peak_rss']
+    print(f"{corpus:<20}{case:<18}{measurement['pages']:>7}{measurement['seconds']:>10.3f}"
+          f"{measurement['pages_per_second']:>11.1f}"
+          f"{(peak_rss / 2**20 if peak_rss is not None else float('nan')):>11.1f}"
+          f"{measurement['bytes_out'] / 1024:>12.1f}")
+
+
+def compare_results(baseline: Dict,
+                    current: Dict) -> List[Dict]:
+    """
+        Compares two results of run_suite.
+
+        Returns
+        -------
+            List[Dict]:
+                One entry per corpus and case contained in both results, with
+                the relative change (current / baseline - 1) of pages_per_second,
+                peak_rss and bytes_out
+    """
+    comparison = []
+    for corpus, corpus_results in current['corpora'].items():
+        baseline_cases = baseline['corpora'].get(corpus, {}).get('cases', {})
+        for case, measurement in corpus_results['cases'].items():
+            if case not in baseline_cases:
+                continue
+            entry = {'corpus': corpus, 'case': case}
+            for key in ('pages_per_second', 'peak_rss', 'bytes_out'):
+                old, new = baseline_cases[case].get(key), measurement.get(key)
+                entry[key] = new / old - 1 if old and new is not None else None
+            comparison.append(entry)
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures pages per second, peak memory usage "
+                                     "and output size of merge() and arrange() on synthetic "
+                                     "corpora (requires reportlab and Pillow).")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="Json file to which the results are written.")
+    parser.add_argument('--compare', type=str, default=None,
+                        help="Json results of a previous run, relative changes "
+                        "are printed for all cases.")
+    parser.add_argument('--corpora', type=str, nargs='*', default=None, choices=list(CORPORA.keys()),
+                        help="Corpora to use. Defaults to all corpora.")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Size factor of the corpora, e.g. 0.1 for a quick run. Defaults to 1")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Number of runs per case, the fastest run is reported. Defaults to 1")
+    args = parser.parse_args()
+
+    print(f"{'Corpus':<20}{'Case':<18}{'pages':>7}{'time [s]':>10}{'pages/s':>11}"
+          f"{'peak [MB]':>11}{'output [kB]':>12}")
+    results = run_suite(args.corpora, args.scale, args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+        print(f"Results written to {args.output}")
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"\nChanges compared to {args.compare} ({baseline['environment']['pypdf']} -> "
+              f"{results['environment']['pypdf']}):")
+        print(f"{'Corpus':<20}{'Case':<18}{'pages/s':>10}{'peak':>10}{'output':>10}")
+        for entry in compare_results(baseline, results):
+            changes = [f"{entry[key]:>+10.1%}" if entry[key] is not None else f"{'-':>10}"
+                       for key in ('pages_per_second', 'peak_rss', 'bytes_out')]
+            print(f"{entry['corpus']:<20}{entry['case']:<18}{''.join(changes)}")
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+
+from os import path as osp
+from typing import Dict, List, Optional
+
+from pilot_utils.pdf_merger.ordering import InputFile
+
+MANIFEST_NAME = '.pdf_merger_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def _hash_file(fpath: str,
+               chunk_size: int = 1 << 20) -> str:
+    """Returns the sha256 hex digest of the given file."""
+    sha = hashlib.sha256()
+    with open(fpath, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def fingerprint_inputs(files: List[InputFile],
+                       previous_inputs: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+        Creates fingerprints (name, size, mtime and content hash) for the
+        given input files.
+
+        Params
+        ------
+            files (List[InputFile]):
+                The input files in merge order, as returned by scan_pdfs. Their
+                size and mtime are reused instead of calling stat again
+            previous_inputs (List[Dict]):
+                Fingerprints of a previous run. Files whose name, size and
+                mtime did not change reuse the previous content hash instead
+                of being read again. Defaults to None
+
+        Returns
+        -------
+            List[Dict]:
+                One fingerprint dictionary per input file
+    """
+    previous = {entry['name']: entry for entry in previous_inputs or []}
+    fingerprints = []
+    for file in files:
+        old = previous.get(file.name)
+        if old is not None and old['size'] == file.size and old['mtime'] == file.mtime_ns:
+            sha256 = old['sha256']
+        else:
+            sha256 = _hash_file(file.path)
+        fingerprints.append({'name': file.name,
+                             'size': file.size,
+                             'mtime': file.mtime_ns,
+                             'sha256': sha256})
+    return fingerprints
+
+
+def fingerprint_outputs(output_dir: str,
+                        output_names: List[str]) -> Optional[Dict[str, Dict]]:
+    """
+        Returns size and mtime of the given output files or None if one of
+        them does not exist.
+    """
+    fingerprints = {}
+    for name in output_names:
+        fpath = osp.join(output_dir, name)
+        if not osp.isfile(fpath):
+            return None
+        stat = os.stat(fpath)
+        fingerprints[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    return fingerprints
+
+
+def is_up_to_date(entry: Optional[Dict],
+                  inputs: List[Dict],
+                  options: Dict,
+                  output_dir: str,
+                  output_names: List[str]) -> bool:
+    """
+        Checks whether the outputs recorded in the given manifest entry are
+        still valid for the current inputs and options.
+
+        Params
+        ------
+            entry (Dict):
+                Manifest entry of the previous build, may be None
+            inputs (List[Dict]):
+                Fingerprints of the current inputs as created by fingerprint_inputs
+            options (Dict):
+                Options of the current run that influence the outputs
+            output_dir (str):
+                Directory in which the outputs are located
+            output_names (List[str]):
+                Names of the outputs that the current run would create
+
+        Returns
+        -------
+            bool:
+                True if the directory does not have to be rebuilt
+    """
+    if entry is None or entry.get('options') != options:
+        return False
+    # mtimes may change without the content changing (e.g. when re-downloading
+    # charts), so only name, size and content hash are compared
+    if [(i['name'], i['size'], i['sha256']) for i in inputs] != \
+       [(i['name'], i['size'], i['sha256']) for i in entry.get('inputs', [])]:
+        return False
+    outputs = fingerprint_outputs(output_dir, output_names)
+    return outputs is not None and outputs == entry.get('outputs')
+
+
+class BuildManifest:
+    def __init__(self,
+                 output_dir: str
+                 ):
+        """
+            Manifest of previous builds whose outputs are located in output_dir.
+            Entries are keyed by the absolute path of the input directory.
+
+            Params
+            ------
+                output_dir (str):
+                    Output directory in which the manifest file is stored
+        """
+        self.fpath = osp.join(output_dir, MANIFEST_NAME)
+        self.entries = {}
+        if osp.isfile(self.fpath):
+            try:
+                with open(self.fpath, 'r') as file:
+                    content = json.load(file)
+            except (OSError, ValueError):
+                print(f"Ignoring unreadable build manifest {self.fpath}")
+                content = {}
+            if content.get('version') == MANIFEST_VERSION:
+                self.entries = content.get('directories', {})
+
+
+    @staticmethod
+    def get_key(input_dir: str) -> str:
+        """Returns the key under which the given input directory is stored"""
+        return osp.normcase(osp.abspath(input_dir))
+
+
+    def get_entry(self,
+                  input_dir: str
+                  ) -> Optional[Dict]:
+        return self.entries.get(self.get_key(input_dir))
+
+
+    def set_entry(self,
+                  input_dir: str,
+                  entry: Dict
+                  ):
+        self.entries[self.get_key(input_dir)] = entry
+
+
+    def save(self):
+        """Writes the manifest, replacing the previous file atomically."""
+        os.makedirs(osp.dirname(self.fpath), exist_ok=True)
+        tmp_path = self.fpath + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': MANIFEST_VERSION, 'directories': self.entries}, file, indent=1)
+        os.replace(tmp_path, self.fpath)
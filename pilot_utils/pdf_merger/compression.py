@@ -0,0 +1,223 @@
+import os
+import shutil
+
+from io import BytesIO
+from os import path as osp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, PdfObject, StreamObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+try:
+    from PIL import Image
+    pil_imported = True
+except ImportError:
+    pil_imported = False
+
+from pilot_utils.pdf_merger.dedup import deduplicate_objects
+
+# Image modes that can be re-encoded as JPEG without losing information other than detail
+JPEG_MODES = ('RGB', 'L', 'CMYK')
+
+
+class CompressionResult:
+    def __init__(self,
+                 bytes_before: int,
+                 bytes_after: int,
+                 n_streams_compressed: int,
+                 n_images_downsampled: int,
+                 n_objects_deduplicated: int
+                 ):
+        """Size reduction achieved by compress_pdf."""
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+        self.n_streams_compressed = n_streams_compressed
+        self.n_images_downsampled = n_images_downsampled
+        self.n_objects_deduplicated = n_objects_deduplicated
+
+
+    def get_reduction(self) -> float:
+        """Returns the saved fraction of the original size."""
+        return 1 - self.bytes_after / self.bytes_before if self.bytes_before > 0 else 0.0
+
+
+    def to_dict(self) -> Dict:
+        return {'bytes_before': self.bytes_before,
+                'bytes_after': self.bytes_after,
+                'reduction': round(self.get_reduction(), 4),
+                'n_streams_compressed': self.n_streams_compressed,
+                'n_images_downsampled': self.n_images_downsampled,
+                'n_objects_deduplicated': self.n_objects_deduplicated}
+
+
+def _downsample_image(original: StreamObject,
+                      max_long_side: int,
+                      jpeg_quality: int) -> Optional[StreamObject]:
+    """
+        Returns a downsampled, JPEG encoded replacement of the given image
+        XObject or None if the image should be kept. Runs in a worker thread,
+        zlib, JPEG decoding and resizing release the GIL.
+    """
+    image = original.decode_as_image()
+    if image is None or image.mode not in JPEG_MODES or max(image.size) <= max_long_side:
+        return None
+    scale = max_long_side / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    stream = BytesIO()
+    image.resize(size, Image.LANCZOS).save(stream, 'PDF', quality=jpeg_quality)
+    # same approach as ImageFile.replace, but without modifying the writer
+    replacement = PdfReader(stream).pages[0].images[0].indirect_reference.get_object()
+    if len(replacement._data) >= len(original._data):
+        return None
+    return replacement
+
+
+def _collect_images(writer: PdfWriter) -> List[IndirectObject]:
+    """
+        Returns the references of all image XObjects used by the pages of the
+        writer, including those inside form XObjects, that can be replaced.
+        Images shared between pages or forms are only returned once.
+    """
+    images = {}
+    visited = set()
+    stack = [page for page in writer.pages]
+    while stack:
+        obj = stack.pop()
+        resources = obj.get('/Resources')
+        if resources is None or '/XObject' not in resources.get_object():
+            continue
+        for reference in resources.get_object()['/XObject'].get_object().values():
+            if not isinstance(reference, IndirectObject) or reference.idnum in visited:
+                continue
+            visited.add(reference.idnum)
+            xobject = reference.get_object()
+            if xobject.get('/Subtype') == '/Form':
+                stack.append(xobject)
+            # images with transparency or used as masks would lose them
+            elif xobject.get('/Subtype') == '/Image' and not ('/SMask' in xobject or '/Mask' in xobject
+                                                             or xobject.get('/ImageMask', False)):
+                images[reference.idnum] = reference
+    return list(images.values())
+
+
+def _collect_uncompressed_streams(writer: PdfWriter) -> List[IndirectObject]:
+    """
+        Returns the references of all streams reachable from the document
+        catalog that have no filter. Metadata streams are skipped, they stay
+        uncompressed, so they can be found by other tools.
+    """
+    streams = []
+    visited = set()
+    stack = [writer.root_object]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in visited:
+                continue
+            visited.add(obj.idnum)
+            reference, obj = obj, obj.get_object()
+            if isinstance(obj, StreamObject) and '/Filter' not in obj and obj.get('/Type') != '/Metadata':
+                streams.append(reference)
+        if isinstance(obj, DictionaryObject):
+            stack.extend(obj.values())
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+    return streams
+
+
+def _replace_object(writer: PdfWriter,
+                    reference: IndirectObject,
+                    obj: PdfObject):
+    """
+        Replaces the indirect object behind reference, such that all objects
+        referencing it use obj. pypdf has no public API for this, the list
+        PdfWriter._objects (indexed by idnum - 1) is the same in all versions
+        allowed by requirements.txt (pypdf>=4.2.0, checked up to 6.20).
+    """
+    writer._objects[reference.idnum - 1] = obj
+    obj.indirect_reference = reference
+
+
+def compress_pdf(input_file: str,
+                 output_file: str,
+                 max_display_size: Optional[Tuple[float, float]] = None,
+                 max_dpi: int = 150,
+                 jpeg_quality: int = 85,
+                 n_threads: Optional[int] = None) -> CompressionResult:
+    """
+        Reduces the size of a pdf: uncompressed streams are flate compressed,
+        images whose resolution exceeds max_dpi at the largest size at which
+        they can be displayed are downsampled and re-encoded as JPEG, and
+        identical objects (e.g. the same font embedded by several input pdfs)
+        are only kept once. Images and streams are processed in parallel
+        threads. Fonts are not subset, pypdf cannot do that. If the result
+        is not smaller than the input, the input is kept unchanged.
+
+        Params
+        ------
+            input_file (str):
+                The pdf that should be compressed
+            output_file (str):
+                Path of the compressed pdf, may be equal to input_file
+            max_display_size (Tuple[float, float]):
+                Largest size in points at which an image can be displayed, e.g.
+                the slot size of an arranged sheet. Defaults to None, which uses
+                the largest page of the pdf
+            max_dpi (int):
+                Target resolution of images. Defaults to 150
+            jpeg_quality (int):
+                Quality of re-encoded images (1 - 95). Defaults to 85
+            n_threads (int):
+                Number of worker threads. Defaults to None (chosen by Python)
+
+        Returns
+        -------
+            CompressionResult:
+                The achieved size reduction, with bytes_after equal to
+                bytes_before and no processed objects if the input was kept
+    """
+    bytes_before = osp.getsize(input_file)
+    writer = PdfWriter(clone_from=input_file)
+    if max_display_size is None:
+        max_display_size = max(((float(page.mediabox.width), float(page.mediabox.height)) for page in writer.pages),
+                               key=lambda size: size[0] * size[1])
+    max_long_side = round(max(max_display_size) / 72 * max_dpi)
+
+    n_images_downsampled = 0
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        if pil_imported:
+            images = _collect_images(writer)
+            replacements = executor.map(lambda reference: _downsample_image(reference.get_object(), max_long_side,
+                                                                            jpeg_quality),
+                                        images)
+            for reference, replacement in zip(images, replacements):
+                if replacement is not None:
+                    _replace_object(writer, reference, replacement)
+                    n_images_downsampled += 1
+        uncompressed = _collect_uncompressed_streams(writer)
+        compressed = executor.map(lambda reference: reference.get_object().flate_encode(level=9), uncompressed)
+        for reference, obj in zip(uncompressed, compressed):
+            _replace_object(writer, reference, obj)
+
+    n_objects_deduplicated, _ = deduplicate_objects(writer)
+    tmp_path = output_file + '.tmp'
+    try:
+        writer.write(tmp_path)
+        writer.close()
+        # pypdf writes neither object streams nor a cross-reference stream, so a pdf that already used them can
+        # grow, in that case the original is kept
+        if osp.getsize(tmp_path) >= bytes_before:
+            os.remove(tmp_path)
+            if osp.abspath(output_file) != osp.abspath(input_file):
+                shutil.copyfile(input_file, output_file)
+            return CompressionResult(bytes_before, bytes_before, 0, 0, 0)
+    except BaseException:
+        if osp.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_file)
+    return CompressionResult(bytes_before, osp.getsize(output_file), len(uncompressed),
+                             n_images_downsampled, n_objects_deduplicated)
@@ -0,0 +1,144 @@
+import hashlib
+
+from io import BytesIO
+from typing import Dict, Optional, Set, Tuple
+try:
+    from pypdf import PdfWriter
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NullObject, StreamObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+# Objects of these types are part of the document structure and never shared
+STRUCTURAL_TYPES = ('/Page', '/Pages', '/Catalog', '/Outlines')
+
+
+class _ObjectHasher:
+    def __init__(self,
+                 writer: PdfWriter
+                 ):
+        """
+            Computes content hashes of the indirect objects of a writer. The hash
+            of an object includes the hashes of all objects it references, so
+            e.g. two images are only equal if their soft masks are equal as well.
+            Objects that belong to the document structure (pages, outlines, ...)
+            or reference it are not hashed.
+        """
+        self.writer = writer
+        self._hashes: Dict[int, Optional[bytes]] = {}
+        self._in_progress: Set[int] = set()
+
+
+    def get_hash(self,
+                 idnum: int
+                 ) -> Optional[bytes]:
+        """Returns the hash of the object with the given number or None if it must not be shared."""
+        if idnum in self._hashes:
+            return self._hashes[idnum]
+        if idnum in self._in_progress:
+            # reference cycle
+            return None
+        self._in_progress.add(idnum)
+        digest = self._hash_direct(self.writer._objects[idnum - 1])
+        self._in_progress.discard(idnum)
+        self._hashes[idnum] = digest
+        return digest
+
+
+    def _hash_direct(self, obj) -> Optional[bytes]:
+        sha = hashlib.sha256()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is not self.writer:
+                return None
+            return self.get_hash(obj.idnum)
+        if isinstance(obj, DictionaryObject):
+            if '/Parent' in obj or obj.get('/Type') in STRUCTURAL_TYPES:
+                return None
+            sha.update(b'S' if isinstance(obj, StreamObject) else b'D')
+            for key in sorted(obj.keys()):
+                if key == '/Length':
+                    continue
+                value_hash = self._hash_direct(dict.__getitem__(obj, key))
+                if value_hash is None:
+                    return None
+                sha.update(key.encode())
+                sha.update(value_hash)
+            if isinstance(obj, StreamObject):
+                data = obj._data
+                sha.update(data if isinstance(data, bytes) else data.encode())
+            return sha.digest()
+        if isinstance(obj, ArrayObject):
+            sha.update(b'A')
+            for value in obj:
+                value_hash = self._hash_direct(value)
+                if value_hash is None:
+                    return None
+                sha.update(value_hash)
+            return sha.digest()
+        if obj is None:
+            return None
+        stream = BytesIO()
+        obj.write_to_stream(stream)
+        sha.update(type(obj).__name__.encode())
+        sha.update(stream.getvalue())
+        return sha.digest()
+
+
+def _replace_references(obj,
+                        replacements: Dict[int, IndirectObject]):
+    """Replaces references to duplicates within obj in place."""
+    if isinstance(obj, DictionaryObject):
+        for key, value in list(dict.items(obj)):
+            if isinstance(value, IndirectObject) and value.idnum in replacements:
+                dict.__setitem__(obj, key, replacements[value.idnum])
+            else:
+                _replace_references(value, replacements)
+    elif isinstance(obj, ArrayObject):
+        for idx, value in enumerate(obj):
+            if isinstance(value, IndirectObject) and value.idnum in replacements:
+                list.__setitem__(obj, idx, replacements[value.idnum])
+            else:
+                _replace_references(value, replacements)
+
+
+def deduplicate_objects(writer: PdfWriter) -> Tuple[int, int]:
+    """
+        Finds indirect objects of the writer with identical content (content
+        streams, images, fonts, ...), keeps only the first of them and lets all
+        references point to it. Pages themselves stay separate objects, but
+        identical pages share their content and resources afterwards.
+
+        Params
+        ------
+            writer (PdfWriter):
+                The writer that should be deduplicated, usually right before writing
+
+        Returns
+        -------
+            Tuple[int, int]:
+                Number of removed objects and number of bytes saved in the output
+    """
+    hasher = _ObjectHasher(writer)
+    canonical: Dict[bytes, int] = {}
+    replacements: Dict[int, IndirectObject] = {}
+    for idnum in range(1, len(writer._objects) + 1):
+        if writer._objects[idnum - 1] is None:
+            continue
+        digest = hasher.get_hash(idnum)
+        if digest is None:
+            continue
+        if digest in canonical:
+            replacements[idnum] = IndirectObject(canonical[digest], 0, writer)
+        else:
+            canonical[digest] = idnum
+    if len(replacements) == 0:
+        return 0, 0
+    bytes_saved = 0
+    for idnum in replacements:
+        stream = BytesIO()
+        writer._objects[idnum - 1].write_to_stream(stream)
+        bytes_saved += stream.tell()
+        # same approach as pypdf uses to drop objects
+        writer._objects[idnum - 1] = NullObject()
+    for obj in writer._objects:
+        _replace_references(obj, replacements)
+    return len(replacements), bytes_saved
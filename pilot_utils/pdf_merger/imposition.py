@@ -0,0 +1,276 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+try:
+    from pypdf import PdfWriter, PageObject, Transformation
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+from pilot_utils.pdf_merger.streaming import StreamingPdfWriter
+from pilot_utils.pdf_merger.xobject import FormXObjectPlacer, get_placement_operators, page_to_form_xobject
+
+# Portrait (width, height) in points
+SHEET_SIZES = {
+    'A3': (842, 1191),
+    'A4': (595, 842),
+    'A5': (420, 595),
+    'Letter': (612, 792),
+    'Legal': (612, 1008),
+}
+
+# Layout name -> (columns, rows)
+LAYOUTS = {
+    '2up': (2, 1),
+    '4up': (2, 2),
+    'booklet': (2, 1),
+}
+
+
+def parse_sheet_size(sheet_size: str) -> Tuple[float, float]:
+    """
+        Parses the name of a sheet size (see SHEET_SIZES) or a size in
+        points given as WIDTHxHEIGHT (e.g. 595x842).
+
+        Returns
+        -------
+            Tuple[float, float]:
+                Width and height of the sheet in points
+    """
+    if sheet_size in SHEET_SIZES:
+        return SHEET_SIZES[sheet_size]
+    try:
+        width, height = sheet_size.lower().split('x')
+        return float(width), float(height)
+    except ValueError:
+        raise ValueError(f"Invalid sheet size {sheet_size}. Use one of {list(SHEET_SIZES.keys())} "
+                         "or WIDTHxHEIGHT in points.")
+
+
+def get_booklet_order(num_pages: int) -> List[int]:
+    """
+        Returns the page indices in the order in which they have to be placed
+        onto consecutive 2-up sheet sides for saddle stitching. num_pages has
+        to be a multiple of 4.
+    """
+    order = []
+    for i in range(num_pages // 4):
+        # front side of the i-th sheet, then its back side
+        order += [num_pages - 1 - 2*i, 2*i, 2*i + 1, num_pages - 2 - 2*i]
+    return order
+
+
+class ImpositionEngine:
+    def __init__(self,
+                 layout: str = '2up',
+                 sheet_size: Tuple[float, float] = SHEET_SIZES['A4'],
+                 pad_blank_pages: bool = False,
+                 verbose: bool = True
+                 ):
+        """
+            Places multiple source pages onto each sheet of the output.
+            Pages are rotated if their orientation does not match the slot,
+            scaled to fit and centered within their slot.
+
+            Params
+            ------
+                layout (str):
+                    One of '2up', '4up' or 'booklet' (2-up with saddle-stitch
+                    page order). Defaults to '2up'
+                sheet_size (Tuple[float, float]):
+                    Size of the output sheets in points. The orientation is
+                    chosen automatically. Defaults to A4
+                pad_blank_pages (bool):
+                    Whether an incomplete last sheet should be filled with blank
+                    pages. Otherwise, the pages of an incomplete last sheet are
+                    ignored. Booklets are always padded. Defaults to False
+                verbose (bool):
+                    Whether a message should be printed if pages are ignored.
+                    Defaults to True
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout}, expected one of {list(LAYOUTS.keys())}")
+        self.layout = layout
+        self.columns, self.rows = LAYOUTS[layout]
+        short_side, long_side = sorted(sheet_size)
+        # Use landscape sheets if there are more columns than rows, such that the slots are portrait
+        if self.columns > self.rows:
+            self.sheet_width, self.sheet_height = long_side, short_side
+        else:
+            self.sheet_width, self.sheet_height = short_side, long_side
+        self.slot_width = self.sheet_width / self.columns
+        self.slot_height = self.sheet_height / self.rows
+        self.pages_per_sheet = self.columns * self.rows
+        self.pad_blank_pages = pad_blank_pages or layout == 'booklet'
+        self.verbose = verbose
+        self._transformations: Dict[Tuple, Transformation] = {}
+
+
+    def get_sheets(self,
+                   num_pages: int
+                   ) -> List[List[Optional[int]]]:
+        """
+            Returns, for each output sheet, the indices of the pages that are
+            placed onto its slots (None for blank slots).
+        """
+        block = 4 if self.layout == 'booklet' else self.pages_per_sheet
+        if self.pad_blank_pages:
+            num_slots = -(-num_pages // block) * block
+        else:
+            num_slots = num_pages - num_pages % block
+            if num_slots < num_pages and self.verbose:
+                print(f"{num_pages - num_slots} extra page(s) that do not fill a whole sheet ignored in "
+                      "arranged pdf (these are the last pages in the merged pdf)!")
+        if self.layout == 'booklet':
+            order = get_booklet_order(num_slots)
+        else:
+            order = list(range(num_slots))
+        order = [idx if idx < num_pages else None for idx in order]
+        return [order[i:i + self.pages_per_sheet] for i in range(0, num_slots, self.pages_per_sheet)]
+
+
+    def get_transformation(self,
+                           page: PageObject,
+                           slot: int
+                           ) -> Transformation:
+        """
+            Returns the transformation from the space of the given page to the
+            given slot of a sheet. Transformations are cached per page geometry,
+            so they are only computed once for all pages of the same size.
+        """
+        mediabox = page.mediabox
+        rotation = page.rotation % 360
+        key = (float(mediabox.left), float(mediabox.bottom), float(mediabox.right), float(mediabox.top), rotation, slot)
+        transformation = self._transformations.get(key)
+        if transformation is None:
+            transformation = self._compute_transformation(*key)
+            self._transformations[key] = transformation
+        return transformation
+
+
+    def _compute_transformation(self,
+                                left: float,
+                                bottom: float,
+                                right: float,
+                                top: float,
+                                rotation: int,
+                                slot: int
+                                ) -> Transformation:
+        width = right - left
+        height = top - bottom
+        transformation = Transformation().translate(tx=-left, ty=-bottom)
+        # Apply the page's /Rotate entry (clockwise), as a viewer would
+        if rotation == 90:
+            transformation = transformation.rotate(-90).translate(tx=0, ty=width)
+        elif rotation == 180:
+            transformation = transformation.rotate(180).translate(tx=width, ty=height)
+        elif rotation == 270:
+            transformation = transformation.rotate(90).translate(tx=height, ty=0)
+        if rotation in (90, 270):
+            width, height = height, width
+        # Rotate landscape pages into portrait slots and vice versa
+        if (width > height and self.slot_width < self.slot_height) or \
+           (width < height and self.slot_width > self.slot_height):
+            transformation = transformation.rotate(90).translate(tx=height, ty=0)
+            width, height = height, width
+        scale = min(self.slot_width / width, self.slot_height / height)
+        column = slot % self.columns
+        row = slot // self.columns
+        x_offset = column * self.slot_width + (self.slot_width - width * scale) / 2
+        # rows are counted from the top of the sheet
+        y_offset = self.sheet_height - (row + 1) * self.slot_height + (self.slot_height - height * scale) / 2
+        return transformation.scale(sx=scale, sy=scale).translate(tx=x_offset, ty=y_offset)
+
+
+    def impose(self,
+               pages: List[PageObject],
+               writer: PdfWriter,
+               use_xobjects: bool = False,
+               progress_callback: Optional[Callable[[int, int], None]] = None
+               ) -> int:
+        """
+            Places the given pages onto new sheets of the given writer.
+
+            Params
+            ------
+                pages (List[PageObject]):
+                    The pages that should be placed, in reading order
+                writer (PdfWriter):
+                    Writer to which the sheets are added
+                use_xobjects (bool):
+                    Whether pages should be placed as form XObjects instead of
+                    merging their transformed content streams. Defaults to False
+                progress_callback (Callable[[int, int], None]):
+                    Called with the number of created sheets and the total
+                    number of sheets after each sheet. Defaults to None
+
+            Returns
+            -------
+                int:
+                    Number of created sheets
+        """
+        placer = FormXObjectPlacer(writer) if use_xobjects else None
+        sheets = self.get_sheets(len(pages))
+        for n, sheet in enumerate(sheets):
+            new_page = writer.add_blank_page(width=self.sheet_width, height=self.sheet_height)
+            placements = [(pages[idx], self.get_transformation(pages[idx], slot))
+                          for slot, idx in enumerate(sheet) if idx is not None]
+            if placer is not None:
+                placer.place_pages(new_page, placements)
+            else:
+                for page, transformation in placements:
+                    new_page.merge_transformed_page(page, transformation)
+            if progress_callback is not None:
+                progress_callback(n + 1, len(sheets))
+        return len(sheets)
+
+
+    def impose_streaming(self,
+                         pages: Sequence[PageObject],
+                         writer: StreamingPdfWriter,
+                         progress_callback: Optional[Callable[[int, int], None]] = None
+                         ) -> int:
+        """
+            Places the given pages onto new sheets as form XObjects and writes
+            every sheet to the streaming writer as soon as it is complete. Pages
+            are only accessed when their sheet is created, so a lazy sequence
+            (see LazyPageList) only parses the pages of the current sheet.
+
+            Params
+            ------
+                pages (Sequence[PageObject]):
+                    The pages that should be placed, in reading order
+                writer (StreamingPdfWriter):
+                    Writer to which the sheets are written
+                progress_callback (Callable[[int, int], None]):
+                    Called with the number of written sheets and the total
+                    number of sheets after each sheet. Defaults to None
+
+            Returns
+            -------
+                int:
+                    Number of created sheets
+        """
+        sheets = self.get_sheets(len(pages))
+        for n, sheet in enumerate(sheets):
+            xobjects = DictionaryObject()
+            operators = []
+            for slot, idx in enumerate(sheet):
+                if idx is None:
+                    continue
+                page = pages[idx]
+                name = f"/P{slot}"
+                xobjects[NameObject(name)] = writer.add_object(page_to_form_xobject(page))
+                operators.append(get_placement_operators(name, self.get_transformation(page, slot)))
+            content = DecodedStreamObject()
+            content.set_data(b"\n".join(operators))
+            new_page = PageObject()
+            new_page.update({
+                NameObject('/Type'): NameObject('/Page'),
+                NameObject('/MediaBox'): ArrayObject([FloatObject(0), FloatObject(0),
+                                                      FloatObject(self.sheet_width), FloatObject(self.sheet_height)]),
+                NameObject('/Resources'): DictionaryObject({NameObject('/XObject'): xobjects}),
+                NameObject('/Contents'): writer.add_object(content.flate_encode()),
+            })
+            writer.add_page(new_page)
+            if progress_callback is not None:
+                progress_callback(n + 1, len(sheets))
+        return len(sheets)
@@ -0,0 +1,105 @@
+import os
+import json
+import time
+
+from os import path as osp
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+PHASE_LISTING = 'listing'
+PHASE_READING = 'reading'
+PHASE_TRANSFORMING = 'transforming'
+PHASE_DEDUPLICATING = 'deduplicating'
+PHASE_COMPRESSING = 'compressing'
+PHASE_WRITING = 'writing'
+
+# Called with the name of the current phase, the number of processed items
+# (input pdfs while reading, sheets while transforming) and their total number
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class BuildStatistics:
+    def __init__(self):
+        """
+            Collects the time spent in each phase of a build (see the PHASE_*
+            constants) together with the amount of processed data.
+        """
+        self.timings: Dict[str, float] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.pages_in = 0
+        self.sheets_out = 0
+
+
+    @contextmanager
+    def measure(self,
+                phase: str):
+        """Adds the wall time of the enclosed block to the given phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+    def add_input(self,
+                  fpath: str):
+        self.bytes_in += osp.getsize(fpath)
+
+
+    def add_output(self,
+                   fpath: str):
+        self.bytes_out += osp.getsize(fpath)
+
+
+    def add_step(self,
+                 other: 'BuildStatistics'):
+        """
+            Adds the timings and outputs of a subsequent step whose input is
+            an intermediate file (e.g. arranging the merged pdf), such that
+            inputs are not counted twice.
+        """
+        for phase, seconds in other.timings.items():
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+        self.bytes_out += other.bytes_out
+        self.sheets_out += other.sheets_out
+
+
+    def get_total_time(self) -> float:
+        return sum(self.timings.values())
+
+
+    def to_dict(self) -> Dict:
+        return {'timings': {phase: round(seconds, 6) for phase, seconds in self.timings.items()},
+                'total_seconds': round(self.get_total_time(), 6),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'pages_in': self.pages_in,
+                'sheets_out': self.sheets_out}
+
+
+def write_report(results: List,
+                 fpath: str,
+                 total_seconds: float):
+    """
+        Writes a json report of a whole run.
+
+        Params
+        ------
+            results (List[DirectoryResult]):
+                Results of all processed directories
+            fpath (str):
+                Path of the report
+            total_seconds (float):
+                Wall time of the whole run
+    """
+    report = {'created': datetime.now().isoformat(timespec='seconds'),
+              'total_seconds': round(total_seconds, 6),
+              'directories': [result.to_dict() for result in results]}
+    if osp.dirname(fpath):
+        os.makedirs(osp.dirname(fpath), exist_ok=True)
+    tmp_path = fpath + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(report, file, indent=1)
+    os.replace(tmp_path, fpath)
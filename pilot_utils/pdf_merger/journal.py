@@ -0,0 +1,115 @@
+import os
+import json
+
+from os import path as osp
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+JOURNAL_NAME = '.pdf_merger_journal.jsonl'
+JOURNAL_VERSION = 1
+
+
+class JobJournal:
+    def __init__(self,
+                 fpath: str,
+                 options: Dict,
+                 resume: bool = False
+                 ):
+        """
+            Append-only journal of a run over many directories. Every finished
+            directory is appended as one json line and flushed to disk right
+            away, so a crashed or interrupted run can be resumed without
+            processing the finished directories again.
+
+            Params
+            ------
+                fpath (str):
+                    Path of the journal file
+                options (Dict):
+                    Json serializable options of the run. A journal is only
+                    resumed if it was written with the same options
+                resume (bool):
+                    Whether the directories finished according to an existing
+                    journal should be skipped. Otherwise a new journal is
+                    started. Defaults to False
+        """
+        self.fpath = fpath
+        self.options = options
+        self.finished: Set[str] = set()
+        # whether the records of a previous run are continued
+        self.resumed = False
+        if resume and osp.isfile(fpath):
+            self._load()
+        else:
+            self._start()
+
+
+    def _load(self):
+        with open(self.fpath, 'r') as file:
+            lines = file.readlines()
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # the last line may be incomplete if the previous run crashed while writing it
+                continue
+        header = records[0] if len(records) > 0 else {}
+        if header.get('version') != JOURNAL_VERSION or header.get('options') != self.options:
+            print(f"Journal {self.fpath} was written with different options, starting from the beginning")
+            self._start()
+            return
+        self.finished = {record['directory'] for record in records[1:]
+                         if 'directory' in record and 'error' not in record}
+        self.resumed = True
+
+
+    def _start(self):
+        """Replaces the journal with one that only contains the header."""
+        if osp.dirname(self.fpath):
+            os.makedirs(osp.dirname(self.fpath), exist_ok=True)
+        tmp_path = self.fpath + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(json.dumps({'version': JOURNAL_VERSION,
+                                   'created': datetime.now().isoformat(timespec='seconds'),
+                                   'options': self.options}) + '\n')
+        os.replace(tmp_path, self.fpath)
+        self.finished = set()
+        self.resumed = False
+
+
+    @staticmethod
+    def get_key(directory: str) -> str:
+        return osp.normcase(osp.abspath(directory))
+
+
+    def is_finished(self,
+                    directory: str) -> bool:
+        return self.get_key(directory) in self.finished
+
+
+    def record(self,
+               directory: str,
+               status: str,
+               error: Optional[str] = None):
+        """
+            Appends a processed directory to the journal. Directories recorded
+            with an error are not considered finished and are retried when resuming.
+        """
+        entry = {'directory': self.get_key(directory),
+                 'status': status,
+                 'time': datetime.now().isoformat(timespec='seconds')}
+        if error is not None:
+            entry['error'] = error
+        else:
+            self.finished.add(entry['directory'])
+        with open(self.fpath, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+
+    def remove(self):
+        """Removes the journal after a run in which all directories were finished."""
+        if osp.isfile(self.fpath):
+            os.remove(self.fpath)
@@ -0,0 +1,87 @@
+from bisect import bisect_right
+from typing import Dict, List
+try:
+    from pypdf import PdfReader, PageObject
+    from pypdf.generic import DictionaryObject, IndirectObject, NameObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+# Attributes that pages inherit from their ancestors in the page tree
+INHERITABLE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+class LazyPageList:
+    def __init__(self,
+                 reader: PdfReader
+                 ):
+        """
+            Random access to the pages of a reader without flattening the page
+            tree. PdfReader.pages parses every page object of the document on
+            first access, whereas this class only descends along the path to the
+            requested page, using the /Count entries of the intermediate nodes.
+            Together with the lazy object loading of PdfReader (through the
+            cross-reference table), only the objects of the requested pages are
+            parsed.
+
+            Params
+            ------
+                reader (PdfReader):
+                    The reader whose pages should be accessed
+        """
+        self.reader = reader
+        self._root = reader.trailer['/Root']['/Pages'].get_object()
+        # id of page tree node -> cumulative page counts of its kids
+        self._offsets: Dict[int, List[int]] = {}
+
+
+    def __len__(self) -> int:
+        return int(self._root.get('/Count', 0))
+
+
+    def _get_kid_offsets(self,
+                         node: DictionaryObject
+                         ) -> List[int]:
+        offsets = self._offsets.get(id(node))
+        if offsets is None:
+            offsets = [0]
+            for kid in node['/Kids']:
+                kid = kid.get_object()
+                count = kid.get('/Count', 1) if kid.get('/Type') != '/Page' else 1
+                offsets.append(offsets[-1] + int(count))
+            self._offsets[id(node)] = offsets
+        return offsets
+
+
+    def __getitem__(self,
+                    index: int
+                    ) -> PageObject:
+        num_pages = len(self)
+        if index < 0:
+            index += num_pages
+        if not 0 <= index < num_pages:
+            raise IndexError("page index out of range")
+        node = self._root
+        reference = None
+        inherited = {}
+        while node.get('/Type') != '/Page' and '/Kids' in node:
+            for attr in INHERITABLE_ATTRIBUTES:
+                if attr in node:
+                    inherited[attr] = node.raw_get(attr)
+            # the offsets are computed once per node, the /Count of a node cannot be used to
+            # tell whether all kids are leaves, as empty intermediate nodes have a count of 0
+            offsets = self._get_kid_offsets(node)
+            kid_index = bisect_right(offsets, index) - 1
+            index -= offsets[kid_index]
+            reference = list.__getitem__(node['/Kids'], kid_index)
+            node = reference.get_object()
+        page = PageObject(self.reader, reference if isinstance(reference, IndirectObject) else None)
+        page.update(node)
+        for attr, value in inherited.items():
+            if attr not in page:
+                page[NameObject(attr)] = value
+        return page
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
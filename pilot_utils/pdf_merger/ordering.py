@@ -0,0 +1,169 @@
+import os
+import re
+import fnmatch
+
+from os import path as osp
+from typing import Dict, List, Optional, Sequence
+
+ORDER_MANIFEST_NAME = '.pdf_order'
+SORT_NATURAL = 'natural'
+SORT_NAME = 'name'
+
+_NUMBER = re.compile(r'(\d+)')
+
+
+def natural_sort_key(name: str) -> List:
+    """
+        Returns a sort key that compares the numbers contained in name by their
+        value, e.g. '2_x.pdf' < '10_x.pdf'. Letters are compared case-insensitively.
+    """
+    parts = _NUMBER.split(name.upper())
+    # chunks are tagged with their type, as names with a different number of chunks
+    # would otherwise compare a number with a text at the same position
+    chunks = [(0, int(part)) if n % 2 else (1, part) for n, part in enumerate(parts)]
+    # the original name breaks ties between names that only differ in case or leading zeros
+    return [chunks, name]
+
+
+def name_sort_key(name: str) -> List:
+    """Case-insensitive sort key, the order of previous versions."""
+    return [name.upper()]
+
+
+SORT_KEYS = {
+    SORT_NATURAL: natural_sort_key,
+    SORT_NAME: name_sort_key,
+}
+
+
+class InputFile:
+    def __init__(self,
+                 name: str,
+                 path: str,
+                 size: int,
+                 mtime_ns: int
+                 ):
+        """
+            A pdf found by scan_pdfs, together with the results of the single
+            stat call made while scanning.
+        """
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+
+class InputOrdering:
+    def __init__(self,
+                 sort: str = SORT_NATURAL,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 use_order_manifest: bool = True
+                 ):
+        """
+            Determines which pdfs of a directory are merged and in which order.
+
+            Params
+            ------
+                sort (str):
+                    SORT_NATURAL (numbers are compared by value) or SORT_NAME
+                    (case-insensitive alphabetical order). Defaults to SORT_NATURAL
+                include (Sequence[str]):
+                    Glob patterns, if given only pdfs whose name matches one of
+                    them are merged. Defaults to None
+                exclude (Sequence[str]):
+                    Glob patterns of pdfs that are never merged. Defaults to None
+                use_order_manifest (bool):
+                    Whether the order manifest (ORDER_MANIFEST_NAME) of a directory
+                    should be used if it exists. Each of its lines contains a file
+                    name or glob pattern; matching pdfs are merged first, in the
+                    order of the lines, followed by all remaining pdfs in sort
+                    order. Empty lines and lines starting with # are ignored.
+                    Defaults to True
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort order {sort}, expected one of {list(SORT_KEYS.keys())}")
+        self.sort = sort
+        self.include = list(include) if include else []
+        self.exclude = list(exclude) if exclude else []
+        self.use_order_manifest = use_order_manifest
+
+
+    def to_dict(self) -> Dict:
+        """Returns the settings as json serializable dictionary, e.g. for build manifests."""
+        return {'sort': self.sort,
+                'include': self.include,
+                'exclude': self.exclude,
+                'use_order_manifest': self.use_order_manifest}
+
+
+    def is_selected(self,
+                    name: str) -> bool:
+        """Returns whether a pdf with the given name passes the include and exclude patterns."""
+        if self.include and not any(fnmatch.fnmatch(name, pattern) for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude)
+
+
+def read_order_manifest(fpath: str) -> List[str]:
+    """Returns the file names and glob patterns of an order manifest."""
+    with open(fpath) as file:
+        lines = [line.strip() for line in file]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def scan_pdfs(input_dir: str,
+              ignored_names: Sequence[str] = (),
+              ordering: Optional[InputOrdering] = None,
+              verbose: bool = True) -> List[InputFile]:
+    """
+        Scans input_dir once and returns the pdfs that should be merged, in
+        merge order.
+
+        Params
+        ------
+            input_dir (str):
+                The directory that should be scanned
+            ignored_names (Sequence[str]):
+                Names of files that are never merged, e.g. previous outputs.
+                Defaults to ()
+            ordering (InputOrdering):
+                Selection and order of the pdfs. Defaults to None, which
+                uses natural sort order and the order manifest
+            verbose (bool):
+                Whether a warning should be printed for order manifest entries
+                that do not match any pdf. Defaults to True
+
+        Returns
+        -------
+            List[InputFile]:
+                The selected pdfs in merge order
+    """
+    if ordering is None:
+        ordering = InputOrdering()
+    files = {}
+    manifest_path = None
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if ordering.use_order_manifest and entry.name == ORDER_MANIFEST_NAME:
+                manifest_path = entry.path
+                continue
+            if osp.splitext(entry.name)[1] != '.pdf' or entry.name in ignored_names:
+                continue
+            if not entry.is_file() or not ordering.is_selected(entry.name):
+                continue
+            stat = entry.stat()
+            files[entry.name] = InputFile(entry.name, entry.path, stat.st_size, stat.st_mtime_ns)
+    sort_key = SORT_KEYS[ordering.sort]
+    # sort keys are computed once per file, the order manifest only selects from the sorted names
+    remaining = sorted(files, key=sort_key)
+    ordered = []
+    if manifest_path is not None:
+        for pattern in read_order_manifest(manifest_path):
+            matches = [name for name in remaining if fnmatch.fnmatch(name, pattern)]
+            if not matches and verbose:
+                print(f"Entry '{pattern}' of {manifest_path} does not match any remaining pdf")
+            ordered += matches
+            matched = set(matches)
+            remaining = [name for name in remaining if name not in matched]
+    return [files[name] for name in ordered + remaining]
@@ -1,10 +1,13 @@
 import os
+import sys
+import time
 import argparse
 
 from os import path as osp
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 try:
-    from pypdf import PdfWriter, PdfReader, Transformation
-    from pypdf.generic import RectangleObject
+    from pypdf import PdfWriter, PdfReader
 except ImportError:
     raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
 
@@ -14,103 +17,841 @@ try:
 except ImportError:
     tqdm_imported = False
 
+from pilot_utils.pdf_merger.dedup import deduplicate_objects
+from pilot_utils.pdf_merger.compression import compress_pdf
+from pilot_utils.pdf_merger.build_cache import BuildManifest, fingerprint_inputs, fingerprint_outputs, is_up_to_date
+from pilot_utils.pdf_merger.imposition import ImpositionEngine, parse_sheet_size
+from pilot_utils.pdf_merger.instrumentation import (BuildStatistics, ProgressCallback, write_report, PHASE_COMPRESSING,
+                                                    PHASE_DEDUPLICATING, PHASE_LISTING, PHASE_READING, PHASE_TRANSFORMING, PHASE_WRITING)
+from pilot_utils.pdf_merger.journal import JOURNAL_NAME, JobJournal
+from pilot_utils.pdf_merger.lazy_reader import LazyPageList
+from pilot_utils.pdf_merger.ordering import ORDER_MANIFEST_NAME, SORT_KEYS, InputFile, InputOrdering, scan_pdfs
+from pilot_utils.pdf_merger.streaming import StreamingPdfWriter, get_peak_rss
+from pilot_utils.pdf_merger.thumbnails import INDEX_NAME, THUMBNAIL_DIR_NAME, render_thumbnails, write_contact_sheet
+from pilot_utils.pdf_merger.watcher import STATUS_NAME, FolderWatcher, create_observer
+
+
+def _write_pdf(writer: PdfWriter,
+               output_file: str):
+    """
+        Writes to a temporary file that then replaces output_file, so an
+        interrupted run never leaves a truncated pdf behind.
+    """
+    tmp_path = output_file + '.tmp'
+    try:
+        writer.write(tmp_path)
+    except BaseException:
+        if osp.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_file)
+
+
+def _check_output_file(output_dir: str,
+                       output_name: str,
+                       overwrite_existing_pdf: bool,
+                       description: str):
+    if osp.isfile(osp.join(output_dir, output_name)) and not overwrite_existing_pdf:
+        raise ValueError(f"File {output_name} already exists at {output_dir}. "
+                         "Provide --allow-overwriting to allow overwriting of "
+                         f"existing {description} files.")
+
+
+def _deduplicate(writer: PdfWriter,
+                 verbose: bool = True):
+    n_removed, bytes_saved = deduplicate_objects(writer)
+    if verbose and n_removed > 0:
+        print(f"Removed {n_removed} duplicate objects, saving {bytes_saved / 1024:.1f} kB")
+
 
 def merge(input_dir: str,
           output_dir: str,
           output_name: str,
           arranged_output_name: str,
-          overwrite_existing_pdf: bool = False):
+          overwrite_existing_pdf: bool = False,
+          streaming: bool = False,
+          deduplicate: bool = False,
+          verbose: bool = True,
+          statistics: Optional[BuildStatistics] = None,
+          progress_callback: Optional[ProgressCallback] = None,
+          ordering: Optional[InputOrdering] = None,
+          files: Optional[List[InputFile]] = None) -> bool:
+    """
+        Merges all pdfs of input_dir, ordered by name, into a single pdf.
+
+        Params
+        ------
+            input_dir (str):
+                Directory in which the to-be-merged pdf files are located
+            output_dir (str):
+                Directory to which the merged pdf is written
+            output_name (str):
+                File name of the merged pdf
+            arranged_output_name (str):
+                File name of the arranged pdf, which is never used as input
+            overwrite_existing_pdf (bool):
+                Whether an existing output file may be overwritten. Defaults to False
+            streaming (bool):
+                Whether the merged pdf should be written with bounded memory
+                usage, see StreamingPdfWriter. Defaults to False
+            deduplicate (bool):
+                Whether identical objects should only be written once. Not
+                supported in streaming mode. Defaults to False
+            verbose (bool):
+                Whether progress messages should be printed. Defaults to True
+            statistics (BuildStatistics):
+                If given, timings and sizes are added to it. Defaults to None
+            progress_callback (ProgressCallback):
+                Called with the current phase, the number of processed items and
+                their total number, see ProgressCallback. Defaults to None
+            ordering (InputOrdering):
+                Selection and order of the input pdfs. Defaults to None, which
+                uses natural sort order and the order manifest of input_dir
+            files (List[InputFile]):
+                Input pdfs that have already been scanned with scan_pdfs, in
+                which case input_dir is not scanned again and ordering is
+                ignored. Defaults to None
+
+        Returns
+        -------
+            bool:
+                False if the directory did not contain any pdfs, True otherwise
+    """
     if not osp.isdir(input_dir):
         raise ValueError(f"Not a valid directory: {input_dir}")
-    if osp.isfile(osp.join(output_dir, output_name)) and not overwrite_existing_pdf:
-        raise ValueError(f"File {output_name} already exists at {output_dir}. "
-                         "Provide --allow-overwriting to allow overwriting of "
-                         "existing merged files.")
+    _check_output_file(output_dir, output_name, overwrite_existing_pdf, "merged")
     os.makedirs(output_dir, exist_ok=True)
-    pdfs = sorted(
-        [
-            file for file in os.listdir(input_dir) \
-                if osp.splitext(file)[1] == '.pdf' and file != output_name and file != arranged_output_name
-        ],
-        key=lambda v: v.upper()
-        )
+    if statistics is None:
+        statistics = BuildStatistics()
+    if files is None:
+        with statistics.measure(PHASE_LISTING):
+            files = scan_pdfs(input_dir, (output_name, arranged_output_name), ordering, verbose)
+    statistics.bytes_in += sum(file.size for file in files)
+    pdfs = [file.name for file in files]
     n_pdfs = len(pdfs)
     if n_pdfs == 0:
         return False
-    merger = PdfWriter()
-    for pdf in pdfs:
-        merger.append(osp.join(input_dir, pdf))
-    merger.write(osp.join(output_dir, output_name))
-    merger.close()
-    print(f"Done merging {n_pdfs} pdf files: {pdfs}")
-    print(f"Merged pdf location: {osp.join(output_dir, output_name)}")
+    output_file = osp.join(output_dir, output_name)
+    if streaming:
+        # Pages are written as soon as they are read and every reader is
+        # dropped after its last page, so memory usage does not grow with
+        # the number of inputs
+        with StreamingPdfWriter(output_file) as merger:
+            for n, file in enumerate(files):
+                with statistics.measure(PHASE_READING):
+                    reader = PdfReader(file.path)
+                    statistics.pages_in += len(reader.pages)
+                with statistics.measure(PHASE_WRITING):
+                    merger.add_reader(reader)
+                if progress_callback is not None:
+                    progress_callback(PHASE_READING, n + 1, n_pdfs)
+            with statistics.measure(PHASE_WRITING):
+                merger.close()
+        peak_rss = get_peak_rss()
+        if peak_rss is not None and verbose:
+            print(f"Peak memory usage while merging: {peak_rss / 2**20:.1f} MB")
+    else:
+        merger = PdfWriter()
+        for n, file in enumerate(files):
+            with statistics.measure(PHASE_READING):
+                merger.append(file.path)
+            if progress_callback is not None:
+                progress_callback(PHASE_READING, n + 1, n_pdfs)
+        statistics.pages_in += len(merger.pages)
+        if deduplicate:
+            with statistics.measure(PHASE_DEDUPLICATING):
+                _deduplicate(merger, verbose)
+        with statistics.measure(PHASE_WRITING):
+            _write_pdf(merger, output_file)
+        merger.close()
+    statistics.add_output(output_file)
+    if verbose:
+        print(f"Done merging {n_pdfs} pdf files: {pdfs}")
+        print(f"Merged pdf location: {output_file}")
     return True
 
 
 def arrange(input_file: str,
             output_dir: str,
             output_name: str,
-            overwrite_existing_pdf: bool = False):
-    a4_width = 595
-    a4_height = 842
+            overwrite_existing_pdf: bool = False,
+            use_xobjects: bool = False,
+            layout: str = '2up',
+            sheet_size: str = 'A4',
+            pad_blank_pages: bool = False,
+            lazy: bool = False,
+            verbose: bool = True,
+            statistics: Optional[BuildStatistics] = None,
+            progress_callback: Optional[ProgressCallback] = None) -> int:
+    """
+        Places the pages of input_file onto the sheets of a new pdf, see
+        ImpositionEngine.
+
+        Params
+        ------
+            input_file (str):
+                The pdf that should be arranged, usually the merged pdf
+            output_dir (str):
+                Directory to which the arranged pdf is written
+            output_name (str):
+                File name of the arranged pdf
+            overwrite_existing_pdf (bool):
+                Whether an existing output file may be overwritten. Defaults to False
+            use_xobjects (bool):
+                Whether pages should be placed as form XObjects. Defaults to False
+            layout (str):
+                Imposition layout, one of '2up', '4up' and 'booklet'. Defaults to '2up'
+            sheet_size (str):
+                Size of the arranged sheets, see parse_sheet_size. Defaults to 'A4'
+            pad_blank_pages (bool):
+                Whether an incomplete last sheet should be filled with blank pages
+                instead of being ignored. Defaults to False
+            lazy (bool):
+                Whether only the pages of the current sheet should be parsed
+                (random access through the cross-reference table instead of
+                loading the whole page tree) and every sheet should be written
+                as soon as it is complete, using object streams and a
+                cross-reference stream. Implies use_xobjects. Reading and
+                writing are then part of the transforming phase. Defaults to False
+            verbose (bool):
+                Whether progress messages should be printed. Defaults to True
+            statistics (BuildStatistics):
+                If given, timings and sizes are added to it. Defaults to None
+            progress_callback (ProgressCallback):
+                Called with the current phase, the number of processed items and
+                their total number, see ProgressCallback. Defaults to None
+
+        Returns
+        -------
+            int:
+                Number of sheets of the arranged pdf
+    """
     if not osp.isfile(input_file):
         raise ValueError(f"The provided input file is not valid: {input_file}")
-    if osp.isfile(osp.join(output_dir, output_name)) and not overwrite_existing_pdf:
-        raise ValueError(f"File {output_name} already exists at {output_dir}. "
-                         "Provide --allow-overwriting to allow overwriting of "
-                         "existing arranged files.")
+    _check_output_file(output_dir, output_name, overwrite_existing_pdf, "arranged")
+    os.makedirs(output_dir, exist_ok=True)
+    if statistics is None:
+        statistics = BuildStatistics()
+    statistics.add_input(input_file)
+    with statistics.measure(PHASE_READING):
+        reader = PdfReader(input_file)
+    engine = ImpositionEngine(layout, parse_sheet_size(sheet_size), pad_blank_pages, verbose)
+    on_sheet = None
+    if progress_callback is not None:
+        on_sheet = lambda done, total: progress_callback(PHASE_TRANSFORMING, done, total)
+    output_file = osp.join(output_dir, output_name)
+    if lazy:
+        # Pages are parsed on demand and every sheet is written as soon as it is complete
+        with statistics.measure(PHASE_TRANSFORMING):
+            with StreamingPdfWriter(output_file, use_object_streams=True) as writer:
+                pages = LazyPageList(reader)
+                n_sheets = engine.impose_streaming(pages, writer, on_sheet)
+    else:
+        with statistics.measure(PHASE_READING):
+            pages = reader.pages
+            # flattens the page tree
+            len(pages)
+        writer = PdfWriter()
+        with statistics.measure(PHASE_TRANSFORMING):
+            n_sheets = engine.impose(pages, writer, use_xobjects, on_sheet)
+        with statistics.measure(PHASE_WRITING):
+            _write_pdf(writer, output_file)
+    statistics.pages_in += len(pages)
+    statistics.sheets_out += n_sheets
+    statistics.add_output(output_file)
+    if verbose:
+        print(f"Finished arranging pdf. Saved to {output_file}")
+    return n_sheets
+
+
+def merge_and_arrange(input_dir: str,
+                      output_dir: str,
+                      merged_output_name: str,
+                      arranged_output_name: str,
+                      overwrite_existing_pdf: bool = False,
+                      write_merged: bool = False,
+                      use_xobjects: bool = False,
+                      layout: str = '2up',
+                      sheet_size: str = 'A4',
+                      pad_blank_pages: bool = False,
+                      deduplicate: bool = False,
+                      verbose: bool = True,
+                      statistics: Optional[BuildStatistics] = None,
+                      progress_callback: Optional[ProgressCallback] = None,
+                      ordering: Optional[InputOrdering] = None,
+                      files: Optional[List[InputFile]] = None) -> bool:
+    """
+        Single-pass alternative to calling merge() followed by arrange().
+        The pages of the input pdfs are arranged straight from the input
+        readers, so no intermediate merged pdf has to be written and parsed
+        again.
+
+        Params
+        ------
+            input_dir (str):
+                Directory in which the to-be-merged pdf files are located
+            output_dir (str):
+                Directory to which the output pdfs are written
+            merged_output_name (str):
+                File name of the merged pdf. Files with this name are never
+                used as input, even if write_merged is False
+            arranged_output_name (str):
+                File name of the arranged pdf
+            overwrite_existing_pdf (bool):
+                Whether existing output files may be overwritten. Defaults to False
+            write_merged (bool):
+                Whether the merged pdf should be written as well. Defaults to False
+            use_xobjects (bool):
+                Whether pages should be placed as form XObjects. Defaults to False
+            layout (str):
+                Imposition layout, one of '2up', '4up' and 'booklet'. Defaults to '2up'
+            sheet_size (str):
+                Size of the arranged sheets, see parse_sheet_size. Defaults to 'A4'
+            pad_blank_pages (bool):
+                Whether an incomplete last sheet should be filled with blank pages
+                instead of being ignored. Defaults to False
+            deduplicate (bool):
+                Whether identical objects (content streams, images, fonts, ...)
+                should only be written once. Defaults to False
+            verbose (bool):
+                Whether progress messages should be printed. Defaults to True
+            statistics (BuildStatistics):
+                If given, timings and sizes are added to it. Defaults to None
+            progress_callback (ProgressCallback):
+                Called with the current phase, the number of processed items and
+                their total number, see ProgressCallback. Defaults to None
+            ordering (InputOrdering):
+                Selection and order of the input pdfs. Defaults to None, which
+                uses natural sort order and the order manifest of input_dir
+            files (List[InputFile]):
+                Input pdfs that have already been scanned with scan_pdfs, in
+                which case input_dir is not scanned again and ordering is
+                ignored. Defaults to None
+
+        Returns
+        -------
+            bool:
+                False if the directory did not contain any pdfs, True otherwise
+    """
+    if not osp.isdir(input_dir):
+        raise ValueError(f"Not a valid directory: {input_dir}")
+    if write_merged:
+        _check_output_file(output_dir, merged_output_name, overwrite_existing_pdf, "merged")
+    _check_output_file(output_dir, arranged_output_name, overwrite_existing_pdf, "arranged")
     os.makedirs(output_dir, exist_ok=True)
+    if statistics is None:
+        statistics = BuildStatistics()
+    if files is None:
+        with statistics.measure(PHASE_LISTING):
+            files = scan_pdfs(input_dir, (merged_output_name, arranged_output_name), ordering, verbose)
+    statistics.bytes_in += sum(file.size for file in files)
+    pdfs = [file.name for file in files]
+    n_pdfs = len(pdfs)
+    if n_pdfs == 0:
+        return False
+    readers = []
+    for n, file in enumerate(files):
+        with statistics.measure(PHASE_READING):
+            readers.append(PdfReader(file.path))
+        if progress_callback is not None:
+            progress_callback(PHASE_READING, n + 1, n_pdfs)
+    with statistics.measure(PHASE_READING):
+        pages = [page for reader in readers for page in reader.pages]
+    statistics.pages_in += len(pages)
+    if write_merged:
+        merged_file = osp.join(output_dir, merged_output_name)
+        merger = PdfWriter()
+        with statistics.measure(PHASE_READING):
+            for reader in readers:
+                merger.append(reader)
+        if deduplicate:
+            with statistics.measure(PHASE_DEDUPLICATING):
+                _deduplicate(merger, verbose)
+        with statistics.measure(PHASE_WRITING):
+            _write_pdf(merger, merged_file)
+        merger.close()
+        statistics.add_output(merged_file)
+        if verbose:
+            print(f"Merged pdf location: {merged_file}")
+    arranged_file = osp.join(output_dir, arranged_output_name)
     writer = PdfWriter()
-    reader = PdfReader(input_file)
-    num_pages = len(reader.pages)
-    i = 0
-    while i < num_pages:
-        if i+1 < num_pages:
-            first_page = reader.pages[i]
-            second_page = reader.pages[i+1]
-            # Create blanked A4 page
-            new_page = writer.add_blank_page(width=a4_height, height=a4_width)
-
-            for n, page in enumerate([first_page, second_page]):
-                transformation = Transformation()
-                mediabox = page.mediabox
-                # check if the provided page is in landscape format.
-                is_landscape = mediabox.width > mediabox.height
-
-                # if landscape, we also have to rotate during merging
-                if is_landscape:
-                    transformation = transformation.rotate(90)
-                    # determine scaling necessary to print original in portrait
-                    # orientation to new page in landscape orientation
-                    scale = a4_width / mediabox.width
-                else:
-                    # determine scaling necessary to print original in portrait
-                    # orientation to new page in landscape orientation
-                    scale = a4_width / mediabox.height
-                transformation = transformation.scale(sx=scale, sy=scale)
-
-                # Second page needs to be moved to 2nd halve of the landscape-oriented A4 page
-                if n == 1:
-                    transformation = transformation.translate(tx=a4_height/2,
-                                                              ty=0)
-                if is_landscape:
-                    transformation = transformation.translate(tx=mediabox.height*scale,
-                                                              ty=0)
-                new_page.merge_transformed_page(page, transformation)
-
-            i += 2
-        else:
-            print("One extra page (due to uneven number of pages) ignored in "
-                  "arranged pdf (this is the last page in the merged pdf)!")
-            i += 1
-    writer.write(osp.join(output_dir, output_name))
-    print(f"Finished arranging pdf. Saved to {osp.join(output_dir, output_name)}")
+    engine = ImpositionEngine(layout, parse_sheet_size(sheet_size), pad_blank_pages, verbose)
+    on_sheet = None
+    if progress_callback is not None:
+        on_sheet = lambda done, total: progress_callback(PHASE_TRANSFORMING, done, total)
+    with statistics.measure(PHASE_TRANSFORMING):
+        statistics.sheets_out += engine.impose(pages, writer, use_xobjects, on_sheet)
+    if deduplicate:
+        with statistics.measure(PHASE_DEDUPLICATING):
+            _deduplicate(writer, verbose)
+    with statistics.measure(PHASE_WRITING):
+        _write_pdf(writer, arranged_file)
+    statistics.add_output(arranged_file)
+    if verbose:
+        print(f"Done merging and arranging {n_pdfs} pdf files: {pdfs}")
+        print(f"Arranged pdf location: {arranged_file}")
+    return True
+
+
+STATUS_BUILT = 'built'
+STATUS_SKIPPED = 'skipped'
+STATUS_EMPTY = 'empty'
+STATUS_FAILED = 'failed'
+
+
+class DirectoryResult:
+    def __init__(self,
+                 directory: str,
+                 status: str,
+                 error: Optional[str] = None,
+                 cache_entry: Optional[Dict] = None,
+                 statistics: Optional[BuildStatistics] = None
+                 ):
+        """
+            Result of processing a single directory.
+
+            Params
+            ------
+                directory (str):
+                    The processed input directory
+                status (str):
+                    One of STATUS_BUILT, STATUS_SKIPPED (outputs were up to date),
+                    STATUS_EMPTY (no pdfs found) or STATUS_FAILED
+                error (str):
+                    Error message if status is STATUS_FAILED. Defaults to None
+                cache_entry (Dict):
+                    Build manifest entry describing the outputs, only set if
+                    the build cache is used. Defaults to None
+                statistics (BuildStatistics):
+                    Timings and sizes of processing the directory. Defaults to None
+        """
+        self.directory = directory
+        self.status = status
+        self.error = error
+        self.cache_entry = cache_entry
+        self.statistics = statistics
+
+
+    def to_dict(self) -> Dict:
+        """Returns the result as json serializable dictionary, e.g. for reports."""
+        return {'directory': self.directory,
+                'status': self.status,
+                'error': self.error,
+                'statistics': self.statistics.to_dict() if self.statistics is not None else None}
+
+
+def _get_written_output_names(merged_name: str,
+                              arranged_name: str,
+                              no_arrange: bool,
+                              remove_temp_files: bool,
+                              single_pass: bool,
+                              write_merged: bool) -> List[str]:
+    """Returns the names of the files that remain after processing a directory."""
+    output_names = []
+    if single_pass and not no_arrange:
+        if write_merged:
+            output_names.append(merged_name)
+    elif not remove_temp_files:
+        output_names.append(merged_name)
+    if not no_arrange:
+        output_names.append(arranged_name)
+    return output_names
+
+
+def _compress_output(fpath: str,
+                     arrangement: Optional[Tuple[str, str]],
+                     max_image_dpi: int,
+                     jpeg_quality: int,
+                     verbose: bool,
+                     statistics: BuildStatistics):
+    """
+        Compresses an output pdf in place. arrangement is (layout, sheet_size)
+        for arranged pdfs, images are then downsampled relative to the slot
+        size of a page on the sheet, otherwise relative to the largest page.
+    """
+    display_size = None
+    if arrangement is not None:
+        engine = ImpositionEngine(arrangement[0], parse_sheet_size(arrangement[1]), verbose=False)
+        display_size = (engine.slot_width, engine.slot_height)
+    with statistics.measure(PHASE_COMPRESSING):
+        result = compress_pdf(fpath, fpath, display_size, max_image_dpi, jpeg_quality)
+    statistics.bytes_out += result.bytes_after - result.bytes_before
+    if verbose and result.bytes_after == result.bytes_before:
+        print(f"Kept {fpath} at {result.bytes_before / 1024:.1f} kB, compressing it gave no reduction")
+    elif verbose:
+        print(f"Compressed {fpath} from {result.bytes_before / 1024:.1f} kB to {result.bytes_after / 1024:.1f} kB "
+              f"({-result.get_reduction():+.1%}, {result.n_images_downsampled} images downsampled, "
+              f"{result.n_streams_compressed} streams compressed)")
+
+
+def process_directory(directory: str,
+                      output_dir: str,
+                      merged_name: str,
+                      arranged_name: str,
+                      overwrite_existing_pdf: bool = False,
+                      no_arrange: bool = False,
+                      remove_temp_files: bool = False,
+                      single_pass: bool = False,
+                      write_merged: bool = False,
+                      use_cache: bool = False,
+                      cache_entry: Optional[Dict] = None,
+                      use_xobjects: bool = False,
+                      streaming: bool = False,
+                      layout: str = '2up',
+                      sheet_size: str = 'A4',
+                      pad_blank_pages: bool = False,
+                      deduplicate: bool = False,
+                      lazy_arrange: bool = False,
+                      compress: bool = False,
+                      max_image_dpi: int = 150,
+                      jpeg_quality: int = 85,
+                      verbose: bool = True,
+                      progress_callback: Optional[ProgressCallback] = None,
+                      ordering: Optional[InputOrdering] = None) -> DirectoryResult:
+    """
+        Merges (and arranges) all pdfs of a single directory.
+
+        Params
+        ------
+            directory (str):
+                Directory in which the to-be-merged pdf files are located
+            output_dir (str):
+                Directory to which the merged and arranged pdfs are written
+            merged_name (str):
+                File name of the merged pdf
+            arranged_name (str):
+                File name of the arranged pdf
+            overwrite_existing_pdf (bool):
+                Whether existing output files may be overwritten. Defaults to False
+            no_arrange (bool):
+                Whether arranging should be skipped. Defaults to False
+            remove_temp_files (bool):
+                Whether the merged pdf should be removed afterwards. Defaults to False
+            single_pass (bool):
+                Whether merge_and_arrange should be used instead of merge() and
+                arrange(). Defaults to False
+            write_merged (bool):
+                In single-pass mode, whether the merged pdf should be written.
+                Defaults to False
+            use_cache (bool):
+                Whether inputs should be fingerprinted, such that the directory
+                is skipped if its outputs are still valid for cache_entry and
+                a new cache entry is returned. Defaults to False
+            cache_entry (Dict):
+                Build manifest entry of the previous run. If None, the directory
+                is always rebuilt. Defaults to None
+            use_xobjects (bool):
+                Whether pages should be arranged as form XObjects. Defaults to False
+            streaming (bool):
+                Whether the merged pdf should be written with bounded memory
+                usage. Not used in single-pass mode. Defaults to False
+            layout (str):
+                Imposition layout, one of '2up', '4up' and 'booklet'. Defaults to '2up'
+            sheet_size (str):
+                Size of the arranged sheets, see parse_sheet_size. Defaults to 'A4'
+            pad_blank_pages (bool):
+                Whether an incomplete last sheet should be filled with blank pages
+                instead of being ignored. Defaults to False
+            deduplicate (bool):
+                Whether identical objects should only be written once. Not
+                supported in streaming mode. Defaults to False
+            lazy_arrange (bool):
+                Whether the merged pdf should be arranged with random page access
+                and written sheet by sheet with object streams, see arrange().
+                Not used in single-pass mode. Defaults to False
+            compress (bool):
+                Whether the final pdf (the arranged pdf, or the merged pdf if
+                arranging is skipped) should be compressed, see compress_pdf.
+                Defaults to False
+            max_image_dpi (int):
+                Resolution to which images are downsampled when compressing,
+                relative to the size of a page on the arranged sheet. Defaults to 150
+            jpeg_quality (int):
+                Quality of images re-encoded when compressing. Defaults to 85
+            verbose (bool):
+                Whether progress messages should be printed. Defaults to True
+            progress_callback (ProgressCallback):
+                Called with the current phase, the number of processed items and
+                their total number, see ProgressCallback. Defaults to None
+            ordering (InputOrdering):
+                Selection and order of the input pdfs. Defaults to None, which
+                uses natural sort order and the order manifest of the directory
+
+        Returns
+        -------
+            DirectoryResult:
+                The result of processing the directory
+    """
+    if not osp.isdir(directory):
+        raise ValueError(f"Not a valid directory: {directory}")
+    if ordering is None:
+        ordering = InputOrdering()
+    statistics = BuildStatistics()
+    # The directory is scanned only once, the results are reused for fingerprinting and merging
+    with statistics.measure(PHASE_LISTING):
+        files = scan_pdfs(directory, (merged_name, arranged_name), ordering, verbose)
+    if len(files) == 0:
+        return DirectoryResult(directory, STATUS_EMPTY, statistics=statistics)
+    if use_cache:
+        options = {'merged_name': merged_name,
+                   'arranged_name': arranged_name,
+                   'no_arrange': no_arrange,
+                   'remove_temp_files': remove_temp_files,
+                   'single_pass': single_pass,
+                   'write_merged': write_merged,
+                   'use_xobjects': use_xobjects,
+                   'streaming': streaming,
+                   'layout': layout,
+                   'sheet_size': sheet_size,
+                   'pad_blank_pages': pad_blank_pages,
+                   'deduplicate': deduplicate,
+                   'lazy_arrange': lazy_arrange,
+                   'compress': compress,
+                   'max_image_dpi': max_image_dpi,
+                   'jpeg_quality': jpeg_quality,
+                   'ordering': ordering.to_dict()}
+        output_names = _get_written_output_names(merged_name, arranged_name, no_arrange,
+                                                 remove_temp_files, single_pass, write_merged)
+        with statistics.measure(PHASE_LISTING):
+            inputs = fingerprint_inputs(files, cache_entry['inputs'] if cache_entry is not None else None)
+        if is_up_to_date(cache_entry, inputs, options, output_dir, output_names):
+            cache_entry['inputs'] = inputs
+            return DirectoryResult(directory, STATUS_SKIPPED, cache_entry=cache_entry, statistics=statistics)
+
+    if single_pass and not no_arrange:
+        success = merge_and_arrange(directory, output_dir, merged_name, arranged_name,
+                                    overwrite_existing_pdf, write_merged, use_xobjects,
+                                    layout, sheet_size, pad_blank_pages, deduplicate,
+                                    verbose, statistics, progress_callback, files=files)
+    else:
+        success = merge(directory, output_dir, merged_name, arranged_name,
+                        overwrite_existing_pdf, streaming, deduplicate,
+                        verbose, statistics, progress_callback, files=files)
+        if success and not no_arrange:
+            # The timings and outputs of arranging are added to those of merging,
+            # the merged pdf is only counted as output if it is kept (see below)
+            arrange_statistics = BuildStatistics()
+            arrange(osp.join(output_dir, merged_name), output_dir,
+                    arranged_name, overwrite_existing_pdf, use_xobjects,
+                    layout, sheet_size, pad_blank_pages, lazy_arrange,
+                    verbose, arrange_statistics, progress_callback)
+            statistics.add_step(arrange_statistics)
+        if success and remove_temp_files:
+            merged_file = osp.join(output_dir, merged_name)
+            if osp.isfile(merged_file):
+                statistics.bytes_out -= osp.getsize(merged_file)
+                os.remove(merged_file)
+                if verbose:
+                    print(f"Removed merged file at {merged_file}")
+    if not success:
+        return DirectoryResult(directory, STATUS_EMPTY, statistics=statistics)
+    final_file = osp.join(output_dir, merged_name if no_arrange else arranged_name)
+    if compress and osp.isfile(final_file):
+        _compress_output(final_file, None if no_arrange else (layout, sheet_size),
+                         max_image_dpi, jpeg_quality, verbose, statistics)
+    if not use_cache:
+        return DirectoryResult(directory, STATUS_BUILT, statistics=statistics)
+    cache_entry = {'options': options,
+                   'inputs': inputs,
+                   'outputs': fingerprint_outputs(output_dir, output_names)}
+    return DirectoryResult(directory, STATUS_BUILT, cache_entry=cache_entry, statistics=statistics)
+
+
+def _process_directory_job(job: Dict) -> DirectoryResult:
+    """
+        Process pool entry point. Runs process_directory with the given
+        arguments and reports errors through the returned result instead of
+        raising, so that one faulty directory does not abort the remaining ones.
+    """
+    try:
+        return process_directory(**job)
+    except Exception as e:
+        return DirectoryResult(job['directory'], STATUS_FAILED, error=f"{type(e).__name__}: {e}")
+
+
+def process_directories(jobs: List[Dict],
+                        n_jobs: int = 1,
+                        raise_errors: bool = True,
+                        on_result: Optional[Callable[[Dict, DirectoryResult], None]] = None) -> List[DirectoryResult]:
+    """
+        Runs process_directory for every job, optionally spread over a pool
+        of worker processes.
+
+        Params
+        ------
+            jobs (List[Dict]):
+                Keyword arguments for process_directory, one per directory
+            n_jobs (int):
+                Number of worker processes. With 1, directories are processed
+                one after another in the current process. Defaults to 1
+            raise_errors (bool):
+                Whether errors are raised immediately when processing directories
+                one after another. Otherwise, and always with multiple worker
+                processes, they are reported through the returned results.
+                Defaults to True
+            on_result (Callable[[Dict, DirectoryResult], None]):
+                Called with each job and its result as soon as the job is
+                finished, e.g. to journal the progress of a run. Defaults to None
+
+        Returns
+        -------
+            List[DirectoryResult]:
+                The result of process_directory for each job, in the order of jobs
+    """
+    results = [None] * len(jobs)
+    if n_jobs <= 1:
+        for idx, job in enumerate(tqdm(jobs) if tqdm_imported else jobs):
+            if raise_errors:
+                results[idx] = process_directory(**job)
+            else:
+                results[idx] = _process_directory_job(job)
+            if on_result is not None:
+                on_result(job, results[idx])
+        return results
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {executor.submit(_process_directory_job, job): idx for idx, job in enumerate(jobs)}
+        completed = as_completed(futures)
+        for future in tqdm(completed, total=len(futures)) if tqdm_imported else completed:
+            idx = futures[future]
+            results[idx] = future.result()
+            if on_result is not None:
+                on_result(jobs[idx], results[idx])
+    return results
+
+
+def _create_job(directory: str,
+                args: argparse.Namespace,
+                manifests: Dict[str, BuildManifest]) -> Dict:
+    """Returns the keyword arguments of process_directory for a directory according to the command line arguments."""
+    output_dir = args.output_dir
+    merged_name = args.merged_name
+    arranged_name = args.arranged_name
+    if output_dir is None:
+        output_dir = directory
+    if merged_name is None:
+        merged_name = osp.basename(osp.normpath(directory)) + '_merged'
+    if osp.splitext(merged_name)[1] != '.pdf':
+        merged_name += '.pdf'
+    if arranged_name is None:
+        arranged_name = osp.basename(osp.normpath(directory)) + '_arranged'
+    if osp.splitext(arranged_name)[1] != '.pdf':
+        arranged_name += '.pdf'
+    cache_entry = None
+    if args.incremental:
+        if output_dir not in manifests:
+            manifests[output_dir] = BuildManifest(output_dir)
+        if not args.force:
+            cache_entry = manifests[output_dir].get_entry(directory)
+    return {'directory': directory,
+            'output_dir': output_dir,
+            'merged_name': merged_name,
+            'arranged_name': arranged_name,
+            'overwrite_existing_pdf': args.allow_overwriting,
+            'no_arrange': args.no_arrange,
+            'remove_temp_files': args.remove_temp_files,
+            'single_pass': args.single_pass,
+            'write_merged': args.write_merged,
+            'use_cache': args.incremental,
+            'cache_entry': cache_entry,
+            'use_xobjects': args.xobjects,
+            'streaming': args.streaming,
+            'layout': args.layout,
+            'sheet_size': args.sheet_size,
+            'pad_blank_pages': args.pad,
+            'deduplicate': args.deduplicate,
+            'lazy_arrange': args.lazy,
+            'compress': args.compress,
+            'max_image_dpi': args.max_image_dpi,
+            'jpeg_quality': args.jpeg_quality,
+            'ordering': InputOrdering(args.sort, args.include, args.exclude, not args.no_order_manifest)}
+
+
+def _record_results(jobs: List[Dict],
+                    results: List[DirectoryResult],
+                    manifests: Dict[str, BuildManifest]) -> int:
+    """Reports failed and empty directories, updates the build manifests and returns the number of failures."""
+    n_errors = 0
+    for job, result in zip(jobs, results):
+        if result.status == STATUS_FAILED:
+            n_errors += 1
+            print(f"Failed to process directory {result.directory}: {result.error}")
+        elif result.status == STATUS_EMPTY:
+            print(f"No PDFs found in directory {result.directory}, skipping...")
+        if result.cache_entry is not None:
+            manifests[job['output_dir']].set_entry(result.directory, result.cache_entry)
+    for manifest in manifests.values():
+        manifest.save()
+    return n_errors
+
+
+def _update_thumbnails(args: argparse.Namespace,
+                       jobs: List[Dict],
+                       results: List[DirectoryResult],
+                       thumbnails: Dict[str, List[str]]):
+    """
+        Renders the thumbnails of the arranged pdfs (merged pdfs with --no-arrange)
+        of all built or up-to-date directories, adds them to thumbnails and
+        writes the contact sheet with all entries of thumbnails.
+    """
+    thumbnail_dir = args.thumbnail_dir
+    if thumbnail_dir is None:
+        thumbnail_dir = osp.join(args.output_dir if args.output_dir is not None else args.input_dir, THUMBNAIL_DIR_NAME)
+    n_pages = 0
+    n_rendered = 0
+    for job, result in zip(jobs, results):
+        pdf_path = osp.join(job['output_dir'], job['merged_name'] if job['no_arrange'] else job['arranged_name'])
+        if result.status not in (STATUS_BUILT, STATUS_SKIPPED) or not osp.isfile(pdf_path):
+            thumbnails.pop(pdf_path, None)
+            continue
+        thumbnails[pdf_path], n_pdf_rendered = render_thumbnails(pdf_path, thumbnail_dir, args.thumbnail_dpi)
+        n_pages += len(thumbnails[pdf_path])
+        n_rendered += n_pdf_rendered
+    contact_sheet = osp.join(thumbnail_dir, INDEX_NAME)
+    write_contact_sheet(thumbnails, contact_sheet)
+    print(f"Rendered {n_rendered} of {n_pages} thumbnails ({n_pages - n_rendered} unchanged). "
+          f"Contact sheet: {contact_sheet}")
+
+
+def _watch(args: argparse.Namespace,
+           jobs: List[Dict],
+           results: List[DirectoryResult],
+           manifests: Dict[str, BuildManifest],
+           thumbnails: Dict[str, List[str]]):
+    """Rebuilds directories whenever their pdfs change, until interrupted."""
+    output_names = {job['directory']: (job['merged_name'], job['arranged_name']) for job in jobs}
+
+    def is_relevant(directory: str, file_name: str) -> bool:
+        if directory not in output_names:
+            # new sub-directory in recursive mode
+            job = _create_job(directory, args, manifests)
+            output_names[directory] = (job['merged_name'], job['arranged_name'])
+        if file_name == ORDER_MANIFEST_NAME:
+            return True
+        return osp.splitext(file_name)[1] == '.pdf' and file_name not in output_names[directory]
+
+    def build_directories(directories: List[str]) -> List[DirectoryResult]:
+        # jobs are created again to pick up the latest build manifest entries
+        rebuild_jobs = [_create_job(directory, args, manifests) for directory in directories]
+        rebuild_results = process_directories(rebuild_jobs, args.jobs, raise_errors=False)
+        _record_results(rebuild_jobs, rebuild_results, manifests)
+        if args.thumbnails:
+            _update_thumbnails(args, rebuild_jobs, rebuild_results, thumbnails)
+        return rebuild_results
+
+    status_file = args.status_file
+    if status_file is None:
+        status_file = osp.join(args.input_dir, STATUS_NAME)
+    observer = create_observer([job['directory'] for job in jobs], is_relevant,
+                               args.input_dir if args.recursive else None, args.poll_interval)
+    watcher = FolderWatcher(observer, build_directories, status_file, args.debounce)
+    watcher.record_results([job['directory'] for job in jobs], results)
+    watcher.run()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Merges all pdf files in the "
                                      "provided directory (order according to "
-                                     "name) and arranges them for dual-side use"
+                                     "name, see --sort) and arranges them for dual-side use"
                                      " (e.g. for a kneeboard). The provided "
                                      "pdfs have to be in portrait format.")
     parser.add_argument('-i', '--input-dir', type=str, required=True,
@@ -136,6 +877,111 @@ if __name__ == '__main__':
                         "In this case, naming options will be ignored "
                          "and inferred from the sub-directory"
                         " name.")
+    parser.add_argument('--sort', type=str, default='natural', choices=list(SORT_KEYS.keys()),
+                        help="Order of the merged pdfs: natural compares numbers "
+                        "by value (2_x.pdf before 10_x.pdf), name is the "
+                        "case-insensitive alphabetical order. Defaults to natural")
+    parser.add_argument('--include', type=str, action='append', default=None,
+                        help="Only merge pdfs whose name matches this glob pattern. "
+                        "Can be given multiple times.")
+    parser.add_argument('--exclude', type=str, action='append', default=None,
+                        help="Do not merge pdfs whose name matches this glob pattern. "
+                        "Can be given multiple times.")
+    parser.add_argument('--no-order-manifest', action='store_true',
+                        help=f"Ignore the order manifest files ({ORDER_MANIFEST_NAME}) "
+                        "of the input directories.")
+    parser.add_argument('--single-pass', action='store_true',
+                        help="Arrange the pages directly from the input pdfs "
+                        "without writing and re-reading an intermediate merged "
+                        "pdf. The merged pdf is only written if --write-merged "
+                        "is provided.")
+    parser.add_argument('--write-merged', action='store_true',
+                        help="In combination with --single-pass, also write "
+                        "the merged pdf.")
+    parser.add_argument('--layout', type=str, default='2up', choices=['2up', '4up', 'booklet'],
+                        help="How pages are arranged: two pages side by side "
+                        "(2up), four pages per sheet (4up) or two pages per sheet "
+                        "side in saddle-stitch order (booklet). Defaults to 2up")
+    parser.add_argument('--sheet-size', type=str, default='A4',
+                        help="Size of the arranged sheets, either A3, A4, A5, "
+                        "Letter, Legal or WIDTHxHEIGHT in points. Defaults to A4")
+    parser.add_argument('--pad', action='store_true',
+                        help="Fill an incomplete last sheet with blank pages "
+                        "instead of ignoring the remaining pages.")
+    parser.add_argument('--xobjects', action='store_true',
+                        help="Place the pages of the arranged pdf as shared form "
+                        "XObjects instead of copying their content, which "
+                        "usually results in smaller files and faster writing.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Write the merged pdf page by page, keeping only one "
+                        "input pdf in memory at a time. Outlines and forms of the "
+                        "inputs are not copied in this mode.")
+    parser.add_argument('--lazy', action='store_true',
+                        help="Arrange the merged pdf by parsing only the pages "
+                        "of the current sheet and write each sheet right away, "
+                        "using object and cross-reference streams. Pages are "
+                        "always placed as form XObjects in this mode. Not used "
+                        "together with --single-pass.")
+    parser.add_argument('--deduplicate', action='store_true',
+                        help="Write identical content streams, images, fonts and "
+                        "other resources only once, e.g. if the same pdf or cover "
+                        "page is contained multiple times. Not supported together "
+                        "with --streaming.")
+    parser.add_argument('--compress', action='store_true',
+                        help="Compress the final pdf (arranged, or merged with "
+                        "--no-arrange): uncompressed streams are compressed, images "
+                        "are downsampled to --max-image-dpi at the size of a page on "
+                        "the sheet and identical objects such as fonts are only kept once.")
+    parser.add_argument('--max-image-dpi', type=int, default=150,
+                        help="Resolution to which images are downsampled with --compress. Defaults to 150")
+    parser.add_argument('--jpeg-quality', type=int, default=85,
+                        help="JPEG quality of downsampled images with --compress (1 - 95). Defaults to 85")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep a build manifest in each output directory "
+                        "and skip directories whose inputs, options and outputs "
+                        "did not change since the last run.")
+    parser.add_argument('--force', action='store_true',
+                        help="In combination with --incremental, rebuild all "
+                        "directories regardless of the build manifest.")
+    parser.add_argument('--resume', action='store_true',
+                        help="In recursive mode, continue a run that crashed or was "
+                        "interrupted: directories finished according to its journal "
+                        "are skipped. Without --resume, every recursive run starts a "
+                        "new journal, which is removed once all directories succeeded.")
+    parser.add_argument('--report', type=str, default=None,
+                        help="Write a json report with status, per-phase timings "
+                        "(listing, reading, transforming, deduplicating, writing), "
+                        "page counts and bytes in/out of each directory to this file.")
+    parser.add_argument('--thumbnails', action='store_true',
+                        help="Render low-resolution png thumbnails of all arranged "
+                        "sheets (requires pymupdf) and write an html contact sheet. "
+                        "Thumbnails are cached by page content, so unchanged "
+                        "sheets are never rendered again.")
+    parser.add_argument('--thumbnail-dpi', type=int, default=30,
+                        help="Resolution of the thumbnails. Defaults to 30")
+    parser.add_argument('--thumbnail-dir', type=str, default=None,
+                        help="Directory of the thumbnail cache and the contact sheet "
+                        f"({INDEX_NAME}). Defaults to {THUMBNAIL_DIR_NAME} in the "
+                        "output directory or, if not given, the input directory.")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running after the first build and rebuild "
+                        "directories whenever their pdfs change. Uses inotify "
+                        "if the package inotify_simple is installed and polling "
+                        "otherwise. Implies --allow-overwriting.")
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help="In watch mode, number of seconds without further "
+                        "changes before a directory is rebuilt. Defaults to 2")
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help="In watch mode without inotify, number of seconds "
+                        "between two scans of the input directories. Defaults to 2")
+    parser.add_argument('--status-file', type=str, default=None,
+                        help="In watch mode, json file to which the queue length "
+                        "and the last build of each directory are written. "
+                        f"Defaults to {STATUS_NAME} in the input directory.")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes used to process "
+                        "sub-directories in parallel (only useful together "
+                        "with --recursive). Defaults to 1")
     args = parser.parse_args()
     dirs_to_process = []
     if not args.recursive:
@@ -145,33 +991,50 @@ if __name__ == '__main__':
         if args.arranged_name is None:
             args.arranged_name = 'arranged'
     else:
-        dirs_to_process = [osp.join(args.input_dir, element) for element in os.listdir(args.input_dir) if osp.isdir(osp.join(args.input_dir, element))]
+        # hidden directories (e.g. the thumbnail cache) are never processed
+        dirs_to_process = [osp.join(args.input_dir, element) for element in os.listdir(args.input_dir)
+                           if osp.isdir(osp.join(args.input_dir, element)) and not element.startswith('.')]
         args.merged_name = None
         args.arranged_name = None
 
-    for directory in tqdm(dirs_to_process) if tqdm_imported else dirs_to_process:
-        output_dir = args.output_dir
-        merged_name = args.merged_name
-        arranged_name = args.arranged_name
-        if output_dir is None:
-            output_dir = directory
-        if merged_name is None:
-            merged_name = osp.basename(osp.normpath(directory)) + '_merged'
-        if osp.splitext(merged_name)[1] != '.pdf':
-            merged_name += '.pdf'
-        if arranged_name is None:
-            arranged_name = osp.basename(osp.normpath(directory)) + '_arranged'
-        if osp.splitext(arranged_name)[1] != '.pdf':
-            arranged_name += '.pdf'
-        success = merge(directory, output_dir, merged_name, arranged_name, args.allow_overwriting)
-        if not success:
-            print(f"No PDFs found in directory {directory}, skipping...")
-            continue
-        if not args.no_arrange:
-            arrange(osp.join(output_dir, merged_name), output_dir,
-                    arranged_name, args.allow_overwriting)
-        if args.remove_temp_files:
-            merged_file = osp.join(output_dir, merged_name)
-            if osp.isfile(merged_file):
-                os.remove(merged_file)
-                print(f"Removed merged file at {merged_file}")
+    if args.watch:
+        # outputs of previous builds are replaced whenever their inputs change
+        args.allow_overwriting = True
+    manifests = {}
+    jobs = [_create_job(directory, args, manifests) for directory in dirs_to_process]
+    journal = None
+    on_result = None
+    if args.recursive:
+        # options that do not influence the outputs may change between a run and its resumption
+        options = {key: value for key, value in vars(args).items()
+                   if key not in ('resume', 'allow_overwriting', 'jobs', 'report', 'watch', 'debounce', 'poll_interval', 'status_file')}
+        journal_dir = args.output_dir if args.output_dir is not None else args.input_dir
+        journal = JobJournal(osp.join(journal_dir, JOURNAL_NAME), options, args.resume)
+        n_finished = sum(journal.is_finished(job['directory']) for job in jobs)
+        if n_finished > 0:
+            print(f"Resuming previous run, skipping {n_finished} finished directories.")
+            jobs = [job for job in jobs if not journal.is_finished(job['directory'])]
+        if journal.resumed:
+            # the interrupted run may have left outputs of the unfinished directories behind
+            for job in jobs:
+                job['overwrite_existing_pdf'] = True
+        on_result = lambda job, result: journal.record(result.directory, result.status, result.error)
+    start = time.perf_counter()
+    results = process_directories(jobs, args.jobs, raise_errors=not args.watch, on_result=on_result)
+    if args.report is not None:
+        write_report(results, args.report, time.perf_counter() - start)
+    n_errors = _record_results(jobs, results, manifests)
+    if journal is not None and n_errors == 0:
+        journal.remove()
+    thumbnails = {}
+    if args.thumbnails:
+        _update_thumbnails(args, jobs, results, thumbnails)
+    if args.incremental:
+        n_built = sum(result.status == STATUS_BUILT for result in results)
+        n_skipped = sum(result.status == STATUS_SKIPPED for result in results)
+        print(f"Rebuilt {n_built} and skipped {n_skipped} up-to-date directories.")
+    if args.watch:
+        _watch(args, jobs, results, manifests, thumbnails)
+    elif n_errors > 0:
+        print(f"{n_errors} of {len(dirs_to_process)} directories could not be processed.")
+        sys.exit(1)
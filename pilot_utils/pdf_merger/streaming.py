@@ -0,0 +1,341 @@
+import os
+import sys
+import zlib
+
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+try:
+    from pypdf import PdfReader, PageObject
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+try:
+    import resource
+    resource_imported = True
+except ImportError:
+    # not available on Windows
+    resource_imported = False
+
+CATALOG_ID = 1
+PAGES_ID = 2
+# Maximum number of objects that are packed into one object stream
+OBJECT_STREAM_SIZE = 100
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+        Returns the peak resident set size of the current process in bytes
+        or None if it cannot be determined on this platform.
+    """
+    if not resource_imported:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StreamingPdfWriter:
+    def __init__(self,
+                 fpath: str,
+                 use_object_streams: bool = False
+                 ):
+        """
+            Minimal pdf writer that serializes every page together with the
+            objects it references as soon as the page is added. Contrary to
+            PdfWriter, which keeps all objects in memory until write() is called,
+            memory usage only depends on the currently processed source document.
+            Outlines, forms and other document-level structures of the sources
+            are not copied.
+
+            Params
+            ------
+                fpath (str):
+                    Path of the output pdf
+                use_object_streams (bool):
+                    Whether objects other than streams should be packed into
+                    compressed object streams, together with a cross-reference
+                    stream instead of a cross-reference table. This results in
+                    considerably smaller files. Defaults to False
+        """
+        self.fpath = fpath
+        # written to a temporary file that replaces fpath on close(), so a
+        # crash never leaves a truncated pdf at fpath
+        self._tmp_path = fpath + '.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(b"%PDF-1.7\n%\xE2\xE3\xCF\xD3\n")
+        self._offsets: Dict[int, int] = {}
+        self._next_id = PAGES_ID + 1
+        self._page_ids: List[int] = []
+        # (id of source document, object number) -> object number in output,
+        # separately for each source document such that it can be released
+        self._translations: Dict[int, Dict[Tuple[int, int], int]] = {}
+        self._pending: List[Tuple[int, IndirectObject]] = []
+        self.use_object_streams = use_object_streams
+        # object number -> (number of the object stream, index within it)
+        self._compressed: Dict[int, Tuple[int, int]] = {}
+        self._object_stream: List[Tuple[int, bytes]] = []
+        self.bytes_written = 0
+
+
+    def __enter__(self) -> 'StreamingPdfWriter':
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+
+    def _allocate_id(self) -> int:
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+
+    def _translate_reference(self,
+                             reference: IndirectObject
+                             ) -> IndirectObject:
+        """Returns the output reference of the given source reference, scheduling the object for writing if new."""
+        translations = self._translations.setdefault(id(reference.pdf), {})
+        key = (reference.idnum, reference.generation)
+        new_id = translations.get(key)
+        if new_id is None:
+            new_id = self._allocate_id()
+            translations[key] = new_id
+            self._pending.append((new_id, reference))
+        return IndirectObject(new_id, 0, None)
+
+
+    def _copy(self, obj, skip_parent: bool = False):
+        """
+            Returns a copy of obj in which all indirect references are replaced
+            by references into the output document.
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is self:
+                # already refers to the output, see add_object
+                return obj
+            return self._translate_reference(obj)
+        if isinstance(obj, StreamObject):
+            if isinstance(obj, EncodedStreamObject):
+                new_obj = EncodedStreamObject()
+                new_obj._data = obj._data
+            else:
+                new_obj = DecodedStreamObject()
+                new_obj.set_data(obj.get_data())
+            for key, value in dict.items(obj):
+                # the length is recalculated on writing
+                if key != '/Length':
+                    new_obj[key] = self._copy(value)
+            return new_obj
+        if isinstance(obj, DictionaryObject):
+            new_obj = DictionaryObject()
+            for key, value in dict.items(obj):
+                if skip_parent and key == '/Parent':
+                    continue
+                new_obj[key] = self._copy(value)
+            return new_obj
+        if isinstance(obj, ArrayObject):
+            return ArrayObject([self._copy(value) for value in obj])
+        return obj
+
+
+    def _write_object(self,
+                      idnum: int,
+                      obj
+                      ):
+        if self.use_object_streams and not isinstance(obj, StreamObject):
+            serialized = BytesIO()
+            obj.write_to_stream(serialized)
+            self._object_stream.append((idnum, serialized.getvalue()))
+            if len(self._object_stream) >= OBJECT_STREAM_SIZE:
+                self._flush_object_stream()
+            return
+        self._offsets[idnum] = self._file.tell()
+        self._file.write(f"{idnum} 0 obj\n".encode())
+        obj.write_to_stream(self._file)
+        self._file.write(b"\nendobj\n")
+
+
+    def _flush_object_stream(self):
+        """Writes all buffered objects as one compressed object stream."""
+        if len(self._object_stream) == 0:
+            return
+        stream_id = self._allocate_id()
+        header = []
+        body = BytesIO()
+        for index, (idnum, serialized) in enumerate(self._object_stream):
+            header.append(f"{idnum} {body.tell()}")
+            body.write(serialized)
+            body.write(b"\n")
+            self._compressed[idnum] = (stream_id, index)
+        header = ' '.join(header).encode() + b"\n"
+        object_stream = DecodedStreamObject()
+        object_stream.set_data(header + body.getvalue())
+        object_stream.update({
+            NameObject('/Type'): NameObject('/ObjStm'),
+            NameObject('/N'): NumberObject(len(self._object_stream)),
+            NameObject('/First'): NumberObject(len(header)),
+        })
+        self._object_stream = []
+        self._offsets[stream_id] = self._file.tell()
+        self._file.write(f"{stream_id} 0 obj\n".encode())
+        object_stream.flate_encode().write_to_stream(self._file)
+        self._file.write(b"\nendobj\n")
+
+
+    def _write_pending(self):
+        """Writes all objects that have been referenced but not written yet."""
+        while self._pending:
+            idnum, reference = self._pending.pop()
+            obj = reference.get_object()
+            # Never follow references into the page tree of the source
+            # (e.g. from link annotations), that would copy the whole document
+            if isinstance(obj, DictionaryObject) and obj.get('/Type') in ('/Page', '/Pages', '/Catalog'):
+                obj = NullObject()
+            self._write_object(idnum, self._copy(obj))
+
+
+    def add_object(self,
+                   obj
+                   ) -> IndirectObject:
+        """
+            Writes the given (direct) object together with all objects it
+            references to the output and returns a reference to it. Can be
+            used for objects that are not part of a source document, like
+            newly created streams.
+        """
+        idnum = self._allocate_id()
+        self._write_object(idnum, self._copy(obj))
+        self._write_pending()
+        return IndirectObject(idnum, 0, self)
+
+
+    def add_page(self,
+                 page: PageObject
+                 ):
+        """
+            Writes the given page and all objects it references to the output.
+            Inherited page attributes have to be present on the page itself,
+            which is the case for pages obtained from PdfReader.pages.
+        """
+        if page.indirect_reference is not None:
+            translations = self._translations.setdefault(id(page.indirect_reference.pdf), {})
+            key = (page.indirect_reference.idnum, page.indirect_reference.generation)
+            if key not in translations:
+                translations[key] = self._allocate_id()
+            page_id = translations[key]
+        else:
+            page_id = self._allocate_id()
+        new_page = self._copy(page, skip_parent=True)
+        new_page[NameObject('/Parent')] = IndirectObject(PAGES_ID, 0, None)
+        self._write_object(page_id, new_page)
+        self._page_ids.append(page_id)
+        self._write_pending()
+
+
+    def add_reader(self,
+                   reader: PdfReader
+                   ):
+        """
+            Writes all pages of the given reader to the output and releases
+            all bookkeeping that refers to the reader afterwards.
+        """
+        pages = reader.pages
+        # Reserve the object numbers of all pages first, so that references
+        # between pages of the same document (e.g. links) stay intact
+        translations = self._translations.setdefault(id(reader), {})
+        for page in pages:
+            key = (page.indirect_reference.idnum, page.indirect_reference.generation)
+            if key not in translations:
+                translations[key] = self._allocate_id()
+        for page in pages:
+            self.add_page(page)
+        self.release(reader)
+
+
+    def release(self,
+                reader: PdfReader
+                ):
+        """
+            Forgets which objects of the given reader have already been written.
+            Afterwards, the reader can be garbage collected.
+        """
+        self._translations.pop(id(reader), None)
+
+
+    def close(self):
+        """Writes the page tree, cross-reference table and trailer, closes the file and moves it to fpath."""
+        if self._file.closed:
+            return
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject([IndirectObject(idnum, 0, None) for idnum in self._page_ids]),
+            NameObject('/Count'): NumberObject(len(self._page_ids)),
+        })
+        self._write_object(PAGES_ID, pages)
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(PAGES_ID, 0, None),
+        })
+        self._write_object(CATALOG_ID, catalog)
+        if self.use_object_streams:
+            self._flush_object_stream()
+            self._write_xref_stream()
+        else:
+            self._write_xref_table()
+        self.bytes_written = self._file.tell()
+        self._file.close()
+        os.replace(self._tmp_path, self.fpath)
+
+
+    def _write_xref_table(self):
+        xref_location = self._file.tell()
+        self._file.write(f"xref\n0 {self._next_id}\n".encode())
+        self._file.write(b"0000000000 65535 f \n")
+        for idnum in range(1, self._next_id):
+            if idnum in self._offsets:
+                self._file.write(f"{self._offsets[idnum]:010d} 00000 n \n".encode())
+            else:
+                # reserved for a page that was never added
+                self._file.write(b"0000000000 00001 f \n")
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(self._next_id),
+            NameObject('/Root'): IndirectObject(CATALOG_ID, 0, None),
+        })
+        self._file.write(b"trailer\n")
+        trailer.write_to_stream(self._file)
+        self._file.write(f"\nstartxref\n{xref_location}\n%%EOF\n".encode())
+
+
+    def _write_xref_stream(self):
+        xref_id = self._allocate_id()
+        xref_location = self._file.tell()
+        self._offsets[xref_id] = xref_location
+        offset_width = max(1, (xref_location.bit_length() + 7) // 8)
+        entries = [b"\x00" + (0).to_bytes(offset_width, 'big') + b"\xff\xff"]
+        for idnum in range(1, self._next_id):
+            if idnum in self._offsets:
+                entries.append(b"\x01" + self._offsets[idnum].to_bytes(offset_width, 'big') + b"\x00\x00")
+            elif idnum in self._compressed:
+                stream_id, index = self._compressed[idnum]
+                entries.append(b"\x02" + stream_id.to_bytes(offset_width, 'big') + index.to_bytes(2, 'big'))
+            else:
+                # reserved for a page that was never added
+                entries.append(b"\x00" + (0).to_bytes(offset_width, 'big') + b"\x00\x01")
+        xref_stream = DecodedStreamObject()
+        xref_stream.set_data(zlib.compress(b"".join(entries)))
+        xref_stream.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/Size'): NumberObject(self._next_id),
+            NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)]),
+            NameObject('/Root'): IndirectObject(CATALOG_ID, 0, None),
+            NameObject('/Filter'): NameObject('/FlateDecode'),
+        })
+        self._file.write(f"{xref_id} 0 obj\n".encode())
+        xref_stream.write_to_stream(self._file)
+        self._file.write(f"\nendobj\nstartxref\n{xref_location}\n%%EOF\n".encode())
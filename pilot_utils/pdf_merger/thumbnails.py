@@ -0,0 +1,145 @@
+import os
+import re
+import html
+import hashlib
+
+from os import path as osp
+from collections import deque
+from typing import Dict, List, Tuple
+
+try:
+    import pymupdf
+    pymupdf_imported = True
+except ImportError:
+    pymupdf_imported = False
+
+THUMBNAIL_DIR_NAME = '.pdf_merger_thumbnails'
+INDEX_NAME = 'index.html'
+# Bumped whenever the hashing or rendering changes, invalidating all cached thumbnails
+THUMBNAIL_VERSION = 1
+
+_REFERENCE = re.compile(r"(\d+) 0 R")
+_PARENT = re.compile(r"/Parent\s+\d+ 0 R")
+
+
+def get_page_hash(doc,
+                  page_number: int,
+                  dpi: int) -> str:
+    """
+        Returns a hash of everything that determines how the given page is
+        rendered: the page object and all objects it (indirectly) references,
+        except for the page tree. References are numbered in the order in which
+        they are encountered, so the hash does not change if the objects of
+        the page are renumbered, e.g. because preceding pages changed.
+
+        Params
+        ------
+            doc (pymupdf.Document):
+                The document containing the page
+            page_number (int):
+                Index of the page
+            dpi (int):
+                Resolution of the thumbnail, which is part of the hash
+
+        Returns
+        -------
+            str:
+                Hex digest of the page
+    """
+    sha = hashlib.sha256(f"{THUMBNAIL_VERSION} {dpi}".encode())
+    page_xref = doc[page_number].xref
+    order = {page_xref: 0}
+    queue = deque([page_xref])
+
+    def replace_reference(match: re.Match) -> str:
+        xref = int(match.group(1))
+        if xref not in order:
+            order[xref] = len(order)
+            queue.append(xref)
+        return f"#{order[xref]} R"
+
+    while queue:
+        xref = queue.popleft()
+        source = _PARENT.sub('', doc.xref_object(xref, compressed=True))
+        sha.update(_REFERENCE.sub(replace_reference, source).encode())
+        if doc.xref_is_stream(xref):
+            sha.update(doc.xref_stream_raw(xref))
+    return sha.hexdigest()
+
+
+def render_thumbnails(pdf_path: str,
+                      cache_dir: str,
+                      dpi: int = 30) -> Tuple[List[str], int]:
+    """
+        Renders a png thumbnail of every page of the given pdf into a content
+        addressed cache. Pages whose hash (see get_page_hash) already has a
+        thumbnail in the cache are not rendered again.
+
+        Params
+        ------
+            pdf_path (str):
+                The pdf, usually an arranged pdf
+            cache_dir (str):
+                Directory of the thumbnail cache
+            dpi (int):
+                Resolution of the thumbnails. Defaults to 30
+
+        Returns
+        -------
+            Tuple[List[str], int]:
+                Paths of the thumbnails of all pages, in page order, and the
+                number of thumbnails that had to be rendered
+    """
+    if not pymupdf_imported:
+        raise ImportError("Could not import pymupdf, which is required for thumbnails. Please install it "
+                          "using the command 'pip install pymupdf', then run the script again")
+    thumbnails = []
+    n_rendered = 0
+    with pymupdf.open(pdf_path) as doc:
+        for page_number in range(doc.page_count):
+            digest = get_page_hash(doc, page_number, dpi)
+            # two-level layout to keep directories small
+            thumbnail = osp.join(cache_dir, digest[:2], digest + '.png')
+            if not osp.isfile(thumbnail):
+                os.makedirs(osp.dirname(thumbnail), exist_ok=True)
+                tmp_path = thumbnail + '.tmp'
+                doc[page_number].get_pixmap(dpi=dpi).save(tmp_path, output='png')
+                os.replace(tmp_path, thumbnail)
+                n_rendered += 1
+            thumbnails.append(thumbnail)
+    return thumbnails, n_rendered
+
+
+def write_contact_sheet(thumbnails: Dict[str, List[str]],
+                        fpath: str):
+    """
+        Writes an html page that shows the thumbnails of several pdfs, one
+        section per pdf.
+
+        Params
+        ------
+            thumbnails (Dict[str, List[str]]):
+                Path of each pdf -> paths of the thumbnails of its pages
+            fpath (str):
+                Path of the html file. Thumbnails are referenced relative to it
+    """
+    base_dir = osp.dirname(osp.abspath(fpath))
+    sections = []
+    for pdf_path in sorted(thumbnails):
+        figures = []
+        for page_number, thumbnail in enumerate(thumbnails[pdf_path]):
+            source = osp.relpath(osp.abspath(thumbnail), base_dir).replace(os.sep, '/')
+            figures.append(f'<figure><img src="{html.escape(source)}" loading="lazy" '
+                           f'alt="Sheet {page_number + 1}"><figcaption>{page_number + 1}</figcaption></figure>')
+        sections.append(f'<section><h2>{html.escape(pdf_path)}</h2>\n<div class="sheets">\n'
+                        + '\n'.join(figures) + '\n</div></section>')
+    document = ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Arranged pdfs</title>\n'
+                '<style>body{font-family:sans-serif;margin:1em}h2{font-size:1em}'
+                '.sheets{display:flex;flex-wrap:wrap;gap:8px}figure{margin:0;text-align:center;font-size:.8em}'
+                'img{border:1px solid #999;display:block}</style></head><body>\n'
+                + '\n'.join(sections) + '\n</body></html>\n')
+    os.makedirs(base_dir, exist_ok=True)
+    tmp_path = fpath + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(document)
+    os.replace(tmp_path, fpath)
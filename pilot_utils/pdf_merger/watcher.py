@@ -0,0 +1,269 @@
+import os
+import json
+import time
+
+from os import path as osp
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from inotify_simple import INotify, flags
+    inotify_imported = True
+except ImportError:
+    # only available on Linux, the polling observer is used instead
+    inotify_imported = False
+
+STATUS_NAME = '.pdf_merger_status.json'
+# Maximum time in seconds an observer blocks while waiting for events
+EVENT_TIMEOUT = 0.5
+
+
+def _snapshot(directory: str,
+              is_relevant: Callable[[str, str], bool]) -> Dict[str, Tuple[int, int]]:
+    """Returns size and mtime of all relevant files in directory."""
+    snapshot = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and is_relevant(directory, entry.name):
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return snapshot
+
+
+def _list_subdirectories(root: str) -> Set[str]:
+    return {entry.path for entry in os.scandir(root) if entry.is_dir() and not entry.name.startswith('.')}
+
+
+class PollingObserver:
+    def __init__(self,
+                 directories: List[str],
+                 is_relevant: Callable[[str, str], bool],
+                 root: Optional[str] = None,
+                 interval: float = 2.0
+                 ):
+        """
+            Detects changes of the relevant files in the given directories by
+            comparing their size and mtime every interval seconds. Used if
+            inotify is not available.
+
+            Params
+            ------
+                directories (List[str]):
+                    The directories that should be watched
+                is_relevant (Callable[[str, str], bool]):
+                    Called with a directory and a file name, returns whether
+                    changes of the file should be reported
+                root (str):
+                    If given, new sub-directories of root are watched as well
+                    and reported as changed. Defaults to None
+                interval (float):
+                    Time between two scans in seconds. Defaults to 2.0
+        """
+        self.is_relevant = is_relevant
+        self.root = root
+        self.interval = interval
+        self._snapshots = {directory: _snapshot(directory, is_relevant) for directory in directories}
+        self._last_scan = time.monotonic()
+
+
+    def read_events(self) -> Set[str]:
+        """Blocks for a short time and returns the directories that changed in the meantime."""
+        time.sleep(EVENT_TIMEOUT)
+        if time.monotonic() - self._last_scan < self.interval:
+            return set()
+        self._last_scan = time.monotonic()
+        changed = set()
+        if self.root is not None:
+            for directory in _list_subdirectories(self.root) - set(self._snapshots):
+                self._snapshots[directory] = {}
+        for directory, snapshot in self._snapshots.items():
+            new_snapshot = _snapshot(directory, self.is_relevant)
+            if new_snapshot != snapshot:
+                self._snapshots[directory] = new_snapshot
+                changed.add(directory)
+        return changed
+
+
+    def close(self):
+        pass
+
+
+class InotifyObserver:
+    def __init__(self,
+                 directories: List[str],
+                 is_relevant: Callable[[str, str], bool],
+                 root: Optional[str] = None
+                 ):
+        """
+            Detects changes of the relevant files in the given directories
+            through inotify. Same interface as PollingObserver.
+        """
+        self.is_relevant = is_relevant
+        self.root = root
+        self._inotify = INotify()
+        self._file_flags = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.DELETE_SELF
+        # watch descriptor -> directory
+        self._directories: Dict[int, str] = {}
+        for directory in directories:
+            self._add_watch(directory)
+        self._root_descriptor = None
+        if root is not None:
+            self._root_descriptor = self._inotify.add_watch(root, flags.CREATE | flags.MOVED_TO)
+
+
+    def _add_watch(self,
+                   directory: str):
+        self._directories[self._inotify.add_watch(directory, self._file_flags)] = directory
+
+
+    def read_events(self) -> Set[str]:
+        """Blocks for a short time and returns the directories that changed in the meantime."""
+        changed = set()
+        for event in self._inotify.read(timeout=int(EVENT_TIMEOUT * 1000)):
+            if event.wd == self._root_descriptor:
+                if event.mask & flags.ISDIR and not event.name.startswith('.'):
+                    directory = osp.join(self.root, event.name)
+                    self._add_watch(directory)
+                    changed.add(directory)
+                continue
+            directory = self._directories.get(event.wd)
+            if directory is None:
+                continue
+            if event.mask & (flags.DELETE_SELF | flags.IGNORED):
+                self._directories.pop(event.wd)
+                changed.add(directory)
+            elif self.is_relevant(directory, event.name):
+                changed.add(directory)
+        return changed
+
+
+    def close(self):
+        self._inotify.close()
+
+
+def create_observer(directories: List[str],
+                    is_relevant: Callable[[str, str], bool],
+                    root: Optional[str] = None,
+                    interval: float = 2.0):
+    """Returns an InotifyObserver if inotify is available and a PollingObserver otherwise."""
+    if inotify_imported:
+        try:
+            return InotifyObserver(directories, is_relevant, root)
+        except OSError as e:
+            # e.g. if the inotify watch limit is reached
+            print(f"Could not use inotify ({e}), falling back to polling")
+    return PollingObserver(directories, is_relevant, root, interval)
+
+
+class FolderWatcher:
+    def __init__(self,
+                 observer,
+                 build_directories: Callable[[List[str]], List],
+                 status_file: str,
+                 debounce: float = 2.0
+                 ):
+        """
+            Rebuilds directories once their files stopped changing and reports
+            the state of all directories in a status file.
+
+            Params
+            ------
+                observer (PollingObserver or InotifyObserver):
+                    Observer that reports changed directories
+                build_directories (Callable[[List[str]], List]):
+                    Rebuilds the given directories and returns one result per
+                    directory with the attributes status and error, like
+                    DirectoryResult. Must not raise
+                status_file (str):
+                    Path of the json status file, which contains the number of
+                    queued directories as well as the last build time and
+                    status of each directory
+                debounce (float):
+                    A directory is only rebuilt if none of its files changed
+                    for this many seconds, such that a burst of events (e.g.
+                    copying many charts) results in a single rebuild. Defaults to 2.0
+        """
+        self.observer = observer
+        self.build_directories = build_directories
+        self.status_file = status_file
+        self.debounce = debounce
+        # directory -> time of the last event
+        self._queue: Dict[str, float] = {}
+        self._building: List[str] = []
+        self._folders: Dict[str, Dict] = {}
+
+
+    def record_results(self,
+                       directories: List[str],
+                       results: List,
+                       duration: Optional[float] = None):
+        """
+            Records the results of building the given directories and updates
+            the status file. duration is the time it took to build all of them.
+        """
+        last_build = datetime.now().isoformat(timespec='seconds')
+        for directory, result in zip(directories, results):
+            self._folders[directory] = {'last_build': last_build,
+                                        'status': result.status,
+                                        'error': result.error,
+                                        'batch_duration': duration}
+        self.write_status()
+
+
+    def write_status(self):
+        """Writes the status file, replacing the previous file atomically."""
+        status = {'updated': datetime.now().isoformat(timespec='seconds'),
+                  'queue_length': len(self._queue),
+                  'queued': sorted(self._queue),
+                  'building': self._building,
+                  'folders': self._folders}
+        tmp_path = self.status_file + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(status, file, indent=1)
+        os.replace(tmp_path, self.status_file)
+
+
+    def poll(self):
+        """Processes pending events once and rebuilds all directories that are settled."""
+        changed = self.observer.read_events()
+        now = time.monotonic()
+        for directory in changed:
+            self._queue[directory] = now
+        ready = sorted(directory for directory, last_event in self._queue.items()
+                       if now - last_event >= self.debounce)
+        if len(ready) == 0:
+            if changed:
+                self.write_status()
+            return
+        for directory in ready:
+            del self._queue[directory]
+        removed = [directory for directory in ready if not osp.isdir(directory)]
+        for directory in removed:
+            self._folders.pop(directory, None)
+        self._building = [directory for directory in ready if directory not in removed]
+        if len(self._building) == 0:
+            self.write_status()
+            return
+        self.write_status()
+        print(f"Rebuilding {len(self._building)} changed director{'y' if len(self._building) == 1 else 'ies'}: {self._building}")
+        start = time.perf_counter()
+        results = self.build_directories(self._building)
+        duration = time.perf_counter() - start
+        directories, self._building = self._building, []
+        self.record_results(directories, results, round(duration, 3))
+
+
+    def run(self):
+        """Watches for changes until interrupted (Ctrl+C)."""
+        self.write_status()
+        print(f"Watching for changes, status is written to {self.status_file}. Press Ctrl+C to stop.")
+        try:
+            while True:
+                self.poll()
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        finally:
+            self.observer.close()
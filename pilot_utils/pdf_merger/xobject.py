@@ -0,0 +1,113 @@
+from typing import List, Tuple
+try:
+    from pypdf import PdfWriter, PageObject, Transformation
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, IndirectObject, NameObject, NumberObject, StreamObject
+except ImportError:
+    raise ImportError("Could not import pypdf, please install it using the command 'pip install pypdf', then run the script again")
+
+
+def _format_number(value: float) -> str:
+    return f"{value:.5f}".rstrip('0').rstrip('.')
+
+
+def page_to_form_xobject(page: PageObject) -> StreamObject:
+    """
+        Wraps the content of the given page into a (compressed) form XObject.
+        The page's resources are referenced, not copied, so resources that are
+        shared between several pages of the same document (e.g. fonts and images)
+        stay shared once the form XObjects are added to a writer.
+
+        Params
+        ------
+            page (PageObject):
+                The page that should be converted
+
+        Returns
+        -------
+            StreamObject:
+                The form XObject, not yet added to any writer
+    """
+    contents = page.get_contents()
+    form = DecodedStreamObject()
+    form.set_data(contents.get_data() if contents is not None else b"")
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/FormType'): NumberObject(1),
+        NameObject('/BBox'): ArrayObject([FloatObject(value) for value in page.mediabox]),
+    })
+    # raw_get keeps indirect references instead of resolving them
+    resources = page.raw_get('/Resources') if '/Resources' in page else None
+    if resources is not None:
+        form[NameObject('/Resources')] = resources
+    return form.flate_encode()
+
+
+def get_placement_operators(name: str,
+                            transformation: Transformation) -> bytes:
+    """Returns the content stream operators that draw the named XObject with the given transformation."""
+    matrix = ' '.join(_format_number(value) for value in transformation.ctm)
+    return f"q {matrix} cm {name} Do Q".encode()
+
+
+class FormXObjectPlacer:
+    def __init__(self,
+                 writer: PdfWriter
+                 ):
+        """
+            Places source pages onto pages of the given writer by means of form
+            XObjects. Each source page is converted to a form XObject only once
+            and then referenced by a transformation matrix, instead of copying
+            and transforming its content stream for every placement like
+            PageObject.merge_transformed_page does.
+
+            Params
+            ------
+                writer (PdfWriter):
+                    Writer that contains the target pages
+        """
+        self.writer = writer
+        self._forms = {}
+
+
+    def get_form(self,
+                 page: PageObject
+                 ) -> IndirectObject:
+        """Returns a reference to the form XObject of the given page, creating it if necessary."""
+        if page.indirect_reference is not None:
+            key = (id(page.indirect_reference.pdf), page.indirect_reference.idnum)
+        else:
+            key = id(page)
+        form_reference = self._forms.get(key)
+        if form_reference is None:
+            form = page_to_form_xobject(page).clone(self.writer)
+            form_reference = self.writer._add_object(form)
+            self._forms[key] = form_reference
+        return form_reference
+
+
+    def place_pages(self,
+                    target_page: PageObject,
+                    placements: List[Tuple[PageObject, Transformation]]
+                    ):
+        """
+            Draws the given pages onto the (blank) target page.
+
+            Params
+            ------
+                target_page (PageObject):
+                    A blank page of the writer
+                placements (List[Tuple[PageObject, Transformation]]):
+                    Pages that should be drawn, together with the transformation
+                    from page space to target page space
+        """
+        xobjects = DictionaryObject()
+        operators = []
+        for n, (page, transformation) in enumerate(placements):
+            name = f"/P{n}"
+            xobjects[NameObject(name)] = self.get_form(page)
+            operators.append(get_placement_operators(name, transformation))
+        target_page[NameObject('/Resources')] = DictionaryObject({NameObject('/XObject'): xobjects})
+        content = DecodedStreamObject()
+        content.set_data(b"\n".join(operators))
+        target_page[NameObject('/Contents')] = self.writer._add_object(content)